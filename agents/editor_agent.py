@@ -0,0 +1,175 @@
+from swarm import Agent
+from utils.config import (
+    EDITOR_MIN_WORDS, EDITOR_MAX_WORDS, EDITOR_MIN_SECTIONS, EDITOR_MIN_REFERENCES, EDITOR_MIN_READABILITY
+)
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Sections every article must have, by heading text
+REQUIRED_SECTIONS = ["Practical Exercise", "References"]
+
+_SECTION_HEADING = re.compile(r"^##\s+(.+?)\s*$", re.MULTILINE)
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_SENTENCE = re.compile(r"[.!?]+(?:\s|$)")
+_MARKDOWN = re.compile(r"`[^`]*`|!?\[([^\]]*)\]\([^)]*\)|^#+\s*|[*_>|]", re.MULTILINE)
+_URL = re.compile(r"https?://[^\s,;)\]]+")
+# The date of an APA reference: (2023), (2023, May 4) or (n.d.)
+_APA_DATE = re.compile(r"\((?:\d{4}[a-z]?(?:, [^)]*)?|n\.d\.)\)")
+
+def _heading_key(heading):
+    return re.sub(r"[^a-z0-9 ]", "", heading.lower()).strip()
+
+def split_sections(article_text):
+    """
+    Split an article into its preamble and '## ' sections.
+
+    Returns:
+        tuple: (preamble text including the H1, list of (heading, section text)
+        pairs where the section text starts with its '## ' line).
+    """
+    matches = list(_SECTION_HEADING.finditer(article_text))
+    if not matches:
+        return article_text.strip(), []
+    preamble = article_text[:matches[0].start()].strip()
+    sections = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(article_text)
+        sections.append((match.group(1), article_text[match.start():end].strip()))
+    return preamble, sections
+
+def join_sections(preamble, sections):
+    return "\n\n".join([preamble] + [text for _, text in sections] if preamble else [text for _, text in sections])
+
+def count_references(section_text):
+    """
+    Count the references in a References section, whatever their layout.
+
+    References may be one per line, a list, a single APA paragraph or a
+    comma-separated list of URLs, so the count is the largest of the
+    non-empty lines, the URLs and the APA dates.
+    """
+    lines = [line for line in section_text.splitlines()[1:] if line.strip()]
+    body = "\n".join(lines)
+    return max(len(lines), len(_URL.findall(body)), len(_APA_DATE.findall(body)))
+
+def _count_syllables(word):
+    word = word.lower()
+    groups = len(re.findall(r"[aeiouy]+", word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and groups > 1:
+        groups -= 1
+    return max(1, groups)
+
+def flesch_reading_ease(text):
+    """Flesch reading ease of text with markdown stripped; higher is easier (60-70 is plain English)."""
+    plain = _MARKDOWN.sub(lambda match: match.group(1) or "", text)
+    words = _WORD.findall(plain)
+    if not words:
+        return 0.0
+    sentences = max(1, len(_SENTENCE.findall(plain)))
+    syllables = sum(_count_syllables(word) for word in words)
+    return 206.835 - 1.015 * len(words) / sentences - 84.6 * syllables / len(words)
+
+def check_article(article_text):
+    """
+    Run the local quality checks on an article.
+
+    Checks for an H1 title, enough '## ' sections, the required sections, a
+    word count within bounds, enough references and a minimum Flesch
+    reading ease. None of this calls a model.
+
+    Returns:
+        list: Issues as dicts with 'check', 'section' (heading to patch, or
+        None for the whole article) and 'message'. Empty if the article passes.
+    """
+    issues = []
+    preamble, sections = split_sections(article_text)
+    headings = {_heading_key(heading): heading for heading, _ in sections}
+
+    if not preamble.startswith("# "):
+        issues.append({"check": "structure", "section": None, "message": "The article must start with a '# ' title."})
+    if len(sections) < EDITOR_MIN_SECTIONS:
+        issues.append({
+            "check": "structure", "section": None,
+            "message": f"The article has {len(sections)} '## ' sections; it needs at least {EDITOR_MIN_SECTIONS}."
+        })
+    for required in REQUIRED_SECTIONS:
+        if _heading_key(required) not in headings:
+            issues.append({"check": "required_section", "section": required, "message": f"The '## {required}' section is missing."})
+
+    words = len(_WORD.findall(article_text))
+    if words < EDITOR_MIN_WORDS:
+        issues.append({"check": "length", "section": None, "message": f"The article has {words} words; it needs at least {EDITOR_MIN_WORDS}."})
+    elif words > EDITOR_MAX_WORDS:
+        issues.append({"check": "length", "section": None, "message": f"The article has {words} words; it must stay under {EDITOR_MAX_WORDS}."})
+
+    references = next((text for heading, text in sections if _heading_key(heading) == "references"), None)
+    if references is not None:
+        count = count_references(references)
+        if count < EDITOR_MIN_REFERENCES:
+            issues.append({
+                "check": "references", "section": "References",
+                "message": f"The References section lists {count} references; it needs at least {EDITOR_MIN_REFERENCES}."
+            })
+
+    readability = flesch_reading_ease(article_text)
+    if readability < EDITOR_MIN_READABILITY:
+        issues.append({
+            "check": "readability", "section": None,
+            "message": f"Flesch reading ease is {readability:.0f}; it needs at least {EDITOR_MIN_READABILITY}. Use shorter sentences and simpler words."
+        })
+    return issues
+
+def apply_patches(article_text, patches):
+    """
+    Apply section patches to an article.
+
+    A patch replaces the section with the same heading, or is added as a new
+    section before the References section when no section matches. Content
+    starting with a '# ' title replaces the title and introduction. Patches
+    without content are ignored.
+
+    Args:
+        article_text (str): The article.
+        patches (list): Dicts with 'section' (heading text) and 'content'
+            (the full replacement markdown of the section, '## ' line included).
+
+    Returns:
+        tuple: (patched article text, number of patches applied).
+    """
+    preamble, sections = split_sections(article_text)
+    applied = 0
+    for patch in patches:
+        heading, content = str(patch.get("section") or "").strip().lstrip("#").strip(), str(patch.get("content") or "").strip()
+        if not content:
+            continue
+        if content.startswith("# "):
+            # A new title and introduction
+            preamble = content
+            applied += 1
+            continue
+        if not heading:
+            continue
+        if not content.startswith("## "):
+            content = f"## {heading}\n{content}"
+        key = _heading_key(heading)
+        positions = [index for index, (title, _) in enumerate(sections) if _heading_key(title) == key]
+        if positions:
+            sections[positions[0]] = (heading, content)
+        else:
+            references = [index for index, (title, _) in enumerate(sections) if _heading_key(title) == "references"]
+            sections.insert(references[0] if references else len(sections), (heading, content))
+        applied += 1
+    return join_sections(preamble, sections), applied
+
+editor_agent = Agent(
+    name="Editor Agent",
+    instructions="You are an article editor. You are given a markdown article and the problems found in it. "
+    "Fix only those problems by rewriting the affected '## ' sections or adding missing ones; never rewrite the whole article. "
+    "To change the title or introduction, patch the section \"Title\" with content starting with the '# ' title. "
+    "Respond strictly in this JSON format:\n"
+    '{ "patches": [ { "section": "<section heading without ##>", "content": "<full markdown of the section, starting with its ## heading>" } ] }. '
+    "Use double quotes as JSON requires, escape newlines as \\n, and respond with the JSON object only.",
+    functions=[],
+)
@@ -1,24 +1,10 @@
 from swarm import Agent
 from utils.embedding_utils import generate_embedding
-from supabase import create_client
-from datetime import datetime
-import os
+from database.db_utils import insert_idea_with_embedding
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Initialize Supabase client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 def save_idea_to_db(context_variables):
     """
     Save the idea to the Supabase 'ideation' table.
@@ -30,22 +16,11 @@ def save_idea_to_db(context_variables):
         logger.error("Idea title or description is missing.")
         return "Failed to save idea: Missing title or description."
 
-    # Generate embeddings
     logger.info("Generating embeddings for idea title and description...")
     try:
         embedding = generate_embedding(description)
-
-        # Insert into the database
-        data = {
-            "idea_title": idea_title,
-            "description": description,
-            "embedding": embedding,
-            "date_created": datetime.utcnow().isoformat()
-        }
-
-        response = supabase.table("ideation").insert(data).execute()
-        if response.get("error"):
-            raise Exception(response["error"]["message"])
+        if insert_idea_with_embedding(idea_title, description, embedding) is None:
+            raise Exception("insert into the ideation table failed")
         logger.info("Idea successfully saved to the database.")
         return "Idea successfully saved to the database."
     except Exception as e:
@@ -56,7 +31,19 @@ def save_idea_to_db(context_variables):
 ideation_agent = Agent(
     name="Ideation Agent",
     instructions="You are an ideation agent. Generate a single article idea and respond with a JSON object in the following format:\n"
-                 "{ 'idea_title': '<title>', 'description': '<description>' }. "
+                 '{ "idea_title": "<title>", "description": "<description>" }. '
+                 "Use double quotes as JSON requires and respond with the JSON object only. "
                  "Ensure the response is clear and concise.",
     functions=[save_idea_to_db]
 )
+
+# Proposes several candidate ideas in one completion for the pipeline to rank
+ideation_candidates_agent = Agent(
+    name="Ideation Candidates Agent",
+    instructions="You are an ideation agent. Generate the requested number of distinct article ideas, each taking a clearly different angle, "
+                 "and respond with a JSON object in the following format:\n"
+                 '{ "ideas": [ { "idea_title": "<title>", "description": "<description>" } ] }. '
+                 "Use double quotes as JSON requires and respond with the JSON object only. "
+                 "Keep each description clear and concise.",
+    functions=[]
+)
@@ -0,0 +1,157 @@
+"""
+Dependency-graph orchestration of pipeline stages.
+
+A pipeline is declared as stages that name the stages whose results they
+need. Each stage starts as soon as its dependencies are done, so work that
+is off the critical path, such as embedding and saving a result, runs in a
+thread pool alongside the next LLM stage instead of delaying it.
+"""
+from utils.config import PIPELINE_MAX_WORKERS
+from utils.metrics import record_retry
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable
+import contextvars
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class StageCancelled(Exception):
+    """Raised when a run is cancelled before all of its stages have completed."""
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a pipeline.
+
+    fn is called with the result of each dependency as a keyword argument
+    named after it. A stage that raises is retried up to retries more times.
+    Inline stages run on the thread that called Dag.run, in dependency
+    order; the others run in the pool. Keeping the LLM stages inline leaves
+    their logs, progress events and streaming on the caller's thread.
+    """
+    name: str
+    fn: Callable
+    deps: tuple = ()
+    retries: int = 0
+    inline: bool = False
+
+class Dag:
+    """
+    Runs a set of stages in dependency order, concurrently where the dependencies allow.
+
+    The first stage to fail for good cancels the run. Stages that have not
+    started are skipped, and running ones finish but are not retried.
+    cancel() does the same from any thread.
+    """
+
+    def __init__(self, stages, max_workers=PIPELINE_MAX_WORKERS):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage '{stage.name}'.")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {', '.join(unknown)}.")
+        self._check_acyclic()
+        self.max_workers = max_workers
+        self.failed = None
+        self._futures = {name: Future() for name in self.stages}
+        self._cancelled = threading.Event()
+
+    def _check_acyclic(self):
+        visiting, visited = set(), set()
+
+        def visit(name, path):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Stages form a cycle: {' -> '.join(path + [name])}.")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+    def future(self, name):
+        """Return the future of a stage's result, e.g. to hand a stage a value it does not wait for."""
+        return self._futures[name]
+
+    def cancel(self):
+        """Stop starting stages and retries; run() raises StageCancelled."""
+        self._cancelled.set()
+
+    def _execute(self, stage):
+        """Run a stage with its retries and settle its future; never raises."""
+        future = self._futures[stage.name]
+        try:
+            inputs = {dep: self._futures[dep].result() for dep in stage.deps}
+            for attempt in range(stage.retries + 1):
+                if self._cancelled.is_set():
+                    raise StageCancelled(f"Stage '{stage.name}' was cancelled.")
+                try:
+                    result = stage.fn(**inputs)
+                    break
+                except Exception as e:
+                    if attempt == stage.retries or self._cancelled.is_set():
+                        raise
+                    record_retry()
+                    logger.warning(f"Stage '{stage.name}' failed ({type(e).__name__}: {str(e)}); retry {attempt + 1} of {stage.retries}...")
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _first_failure(self):
+        return next((name for name, future in self._futures.items() if future.done() and future.exception() is not None), None)
+
+    def run(self):
+        """
+        Run every stage and return their results.
+
+        Returns:
+            dict: Result of each stage, by name.
+
+        Raises:
+            Exception: The error of the first stage that failed after its retries.
+            StageCancelled: If the run was cancelled.
+        """
+        pending = dict(self.stages)
+        running = set()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        try:
+            while pending or running:
+                self.failed = self._first_failure()
+                if self.failed or self._cancelled.is_set():
+                    self._cancelled.set()
+                    break
+                ready = [stage for stage in pending.values() if all(self._futures[dep].done() for dep in stage.deps)]
+                for stage in ready:
+                    if not stage.inline:
+                        del pending[stage.name]
+                        running.add(self._futures[stage.name])
+                        # Pool stages see the caller's context variables, such as the current metrics span
+                        executor.submit(contextvars.copy_context().run, self._execute, stage)
+                inline = next((stage for stage in ready if stage.inline), None)
+                if inline is not None:
+                    del pending[inline.name]
+                    self._execute(inline)
+                elif running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    running -= done
+        finally:
+            # Stages still queued are dropped; running ones are waited for so none outlive the run
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        self.failed = self.failed or self._first_failure()
+        if self.failed:
+            raise self._futures[self.failed].exception()
+        if self._cancelled.is_set():
+            raise StageCancelled("The run was cancelled.")
+        return {name: future.result() for name, future in self._futures.items()}
@@ -1,37 +1,123 @@
 from swarm import Agent
 from utils.embedding_utils import generate_embedding
 from database.db_utils import insert_research_with_embedding
-import requests
+from utils.http_cache import CachedJsonClient
+from utils import clients
+from utils.rate_limit import call_with_limits
+from utils.metrics import span
+from utils.config import (
+    SERPAPI_API_KEY, SERPAPI_CACHE_PATH, SERPAPI_CACHE_TTL, SERPAPI_CACHE_STALE_TTL, SERPAPI_TIMEOUT,
+    RESEARCH_SUBQUERIES, RESEARCH_MAX_RESULTS
+)
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import contextvars
+from urllib.parse import urlsplit
 import logging
-import os
+import re
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 SERPAPI_URL = "https://serpapi.com/search"
 
-def perform_research(context_variables, idea_title):
-    """Perform research using SerpAPI based on the idea title."""
-    query = idea_title
+# Response cache for SerpAPI searches over the shared keep-alive HTTP session
+clients.register("serpapi", lambda: CachedJsonClient(
+    clients.get_http_session(),
+    SERPAPI_CACHE_PATH,
+    ttl=SERPAPI_CACHE_TTL,
+    stale_ttl=SERPAPI_CACHE_STALE_TTL,
+    timeout=SERPAPI_TIMEOUT,
+    call=partial(call_with_limits, "serpapi")
+))
+
+# Angles appended to the idea title to broaden search coverage; the bare title always runs first
+SUBQUERY_SUFFIXES = ["research findings", "practical examples", "best practices", "statistics", "challenges"]
+
+# Constant of reciprocal rank fusion; larger values flatten the weight of top positions
+RRF_K = 60
+
+def build_subqueries(idea_title, count=RESEARCH_SUBQUERIES):
+    """Build up to count search queries covering different angles of the idea."""
+    queries = [idea_title] + [f"{idea_title} {suffix}" for suffix in SUBQUERY_SUFFIXES]
+    return queries[:max(1, count)]
+
+def _normalize_url(url):
+    """Normalize a URL for deduplication: drop scheme, www, fragment, tracking params and trailing slash."""
+    parts = urlsplit(url.strip())
+    query = "&".join(sorted(
+        pair for pair in parts.query.split("&")
+        if pair and not pair.lower().startswith("utm_")
+    ))
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}?{query}"
+
+def _normalize_snippet(snippet):
+    return re.sub(r"\W+", " ", snippet.lower()).strip()
+
+def merge_results(result_lists, limit=RESEARCH_MAX_RESULTS):
+    """
+    Merge organic results from several queries into one ranked, deduplicated list.
+
+    Results are deduplicated by normalized URL and normalized snippet, and
+    ranked by reciprocal rank fusion, so pages several queries agree on
+    come first.
+
+    Args:
+        result_lists (list): One list of SerpAPI organic results per query.
+        limit (int): Maximum number of merged results.
+
+    Returns:
+        list: Merged results, best first.
+    """
+    merged = {}
+    snippet_keys = {}
+    for results in result_lists:
+        for position, result in enumerate(results):
+            link = result.get("link")
+            if not link:
+                continue
+            key = _normalize_url(link)
+            snippet = result.get("snippet")
+            if key not in merged and snippet:
+                # A page syndicated under another URL carries the same snippet
+                key = snippet_keys.setdefault(_normalize_snippet(snippet), key)
+            entry = merged.setdefault(key, {"result": result, "score": 0.0})
+            entry["score"] += 1.0 / (RRF_K + position + 1)
+    ranked = sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)
+    return [entry["result"] for entry in ranked[:limit]]
+
+def _search(query):
     params = {
         "q": query,
         "engine": "google",
         "api_key": SERPAPI_API_KEY,
         "num": 5,  # Limit the number of results to avoid excessive data
     }
+    with span("serpapi", query=query):
+        return clients.get("serpapi").get_json(SERPAPI_URL, params).get("organic_results", [])
+
+def perform_research(context_variables, idea_title):
+    """Perform research using SerpAPI based on the idea title."""
+    queries = build_subqueries(idea_title)
     try:
-        logger.info("Performing search on SerpAPI...")
-        response = requests.get(SERPAPI_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
+        logger.info(f"Performing {len(queries)} searches on SerpAPI...")
+        # Sub-queries run concurrently, so wall time tracks the slowest single search
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            # Copy the context so each search's span is attributed to the current run
+            futures = [executor.submit(contextvars.copy_context().run, _search, query) for query in queries]
+        result_lists = []
+        for query, future in zip(queries, futures):
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                logger.warning(f"SerpAPI search for '{query}' failed: {str(e)}")
+        if not result_lists:
+            raise RuntimeError("All SerpAPI searches failed.")
 
         # Extract titles and snippets of the search results
-        results = data.get("organic_results", [])
+        results = merge_results(result_lists)
         summaries = [
             f"{result.get('title')}: {result.get('snippet')}"
             for result in results
@@ -43,7 +129,7 @@ def perform_research(context_variables, idea_title):
             [result.get("link") for result in results if result.get("link")]
         )
 
-        logger.info("Search completed successfully.")
+        logger.info(f"Search completed successfully with {len(results)} unique results.")
         return research_text, references_urls
 
     except Exception as e:
@@ -74,7 +160,18 @@ research_agent = Agent(
     name="Research Agent",
     instructions="You are a research assistant. Based on the idea title provided, conduct research using SerpAPI. "
     "Summarize the findings and respond strictly in this JSON format:\n"
-    "{ 'research_title': '<researc_title>', 'research_description': '<research_text>', 'references': '<comma-separated-links>' }."
-    "Ensure the response is valid JSON, concise, and accurate.",
+    '{ "research_title": "<research_title>", "research_description": "<research_text>", "references": "<comma-separated-links>" }. '
+    "Use double quotes as JSON requires. Ensure the response is valid JSON, concise, and accurate.",
     functions=[perform_research],
 )
+
+# Adapts research stored by earlier runs to a closely related idea, without searching again
+research_synthesis_agent = Agent(
+    name="Research Synthesis Agent",
+    instructions="You are a research assistant. Adapt the stored research you are given to the idea title, "
+    "keeping what is relevant and only the references it came from. "
+    "Summarize the findings and respond strictly in this JSON format:\n"
+    '{ "research_title": "<research_title>", "research_description": "<research_text>", "references": "<comma-separated-links>" }. '
+    "Use double quotes as JSON requires. Ensure the response is valid JSON, concise, and accurate.",
+    functions=[],
+)
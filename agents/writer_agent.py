@@ -1,14 +1,8 @@
 from swarm import Agent
 from utils.embedding_utils import generate_embedding
-from supabase import create_client
-from datetime import datetime
-import os
+from database.db_utils import insert_article_with_embedding
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 def save_article_to_db(context_variables):
@@ -36,15 +30,8 @@ def save_article_to_db(context_variables):
         research_id = int(research_id)
 
         embedding = generate_embedding(article_text)
-        data = {
-            "ideation_id": ideation_id,
-            "research_id": research_id,
-            "article_text": article_text,
-            "embedding": embedding,
-            "date_created": datetime.utcnow().isoformat()
-        }
-
-        response = supabase.table("writer").insert(data).execute()
+        if insert_article_with_embedding(article_text, embedding, ideation_id, research_id) is None:
+            raise Exception("insert into the writer table failed")
         logger.info("Article successfully saved to the database.")
         return "Article successfully saved to the database."
     except ValueError as e:
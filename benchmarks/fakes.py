@@ -0,0 +1,376 @@
+"""
+Local stand-ins for OpenAI, SerpAPI and Supabase used by the offline benchmark.
+
+Each fake sleeps for a latency drawn from a configurable lognormal
+distribution and can fail with transient errors or 429s at configurable
+rates. Every call is recorded so the harness can report per-service latency.
+"""
+from dataclasses import dataclass
+from openai.types import CreateEmbeddingResponse, Embedding
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import httpx
+import numpy as np
+import openai
+import requests
+
+EMBEDDING_DIM = 1536
+# Characters of content per streamed chunk, about what the API sends
+STREAM_CHUNK_CHARS = 16
+
+@dataclass
+class ServiceProfile:
+    """Latency and failure behaviour of one fake endpoint."""
+    median_ms: float
+    sigma: float = 0.4
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_s: float = 1.0
+
+# Rough medians observed for the real services
+DEFAULT_PROFILES = {
+    "openai.chat": ServiceProfile(median_ms=2500, sigma=0.5),
+    "openai.embeddings": ServiceProfile(median_ms=150, sigma=0.3),
+    "serpapi.search": ServiceProfile(median_ms=900, sigma=0.5),
+    "supabase.insert": ServiceProfile(median_ms=60, sigma=0.3),
+    "supabase.select": ServiceProfile(median_ms=40, sigma=0.3),
+    "supabase.update": ServiceProfile(median_ms=50, sigma=0.3),
+}
+
+class CallRecorder:
+    """Thread-safe record of (service, latency, outcome) for every fake call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def record(self, service, seconds, outcome):
+        with self._lock:
+            self.calls.append((service, seconds, outcome))
+
+class FakeService:
+    """Samples latency and failures for one endpoint from its profile."""
+
+    def __init__(self, name, profile, recorder, time_scale=1.0, seed=0):
+        self.name = name
+        self.profile = profile
+        self.recorder = recorder
+        self.time_scale = time_scale
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+
+    def call(self):
+        """
+        Sleep for one sampled latency.
+
+        Returns:
+            str: 'ok', 'error' or 'throttled'.
+        """
+        with self._lock:
+            latency = self._rng.lognormvariate(0, self.profile.sigma) * self.profile.median_ms / 1000
+            roll = self._rng.random()
+        if roll < self.profile.throttle_rate:
+            outcome, latency = "throttled", latency * 0.1
+        elif roll < self.profile.throttle_rate + self.profile.error_rate:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        time.sleep(latency * self.time_scale)
+        self.recorder.record(self.name, latency * self.time_scale, outcome)
+        return outcome
+
+def _openai_error(outcome, service, path, retry_after):
+    request = httpx.Request("POST", f"https://api.openai.com/v1/{path}")
+    if outcome == "throttled":
+        response = httpx.Response(429, request=request, headers={"retry-after": str(retry_after)})
+        return openai.RateLimitError(f"Rate limit reached for {service}", response=response, body=None)
+    response = httpx.Response(500, request=request)
+    return openai.InternalServerError(f"Injected failure in {service}", response=response, body=None)
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+def fake_embedding(text):
+    """Deterministic unit vector for text, so identical texts embed identically."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).normal(size=EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+class _Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class FakeOpenAI:
+    """Fake OpenAI client covering embeddings.create and chat.completions.create with tool calls."""
+
+    def __init__(self, services, article_words=900):
+        self.services = services
+        self.article_words = article_words
+        self._ids = itertools.count(1)
+        self.embeddings = _Namespace(create=self._create_embeddings)
+        self.chat = _Namespace(completions=_Namespace(create=self._create_chat_completion))
+
+    def _create_embeddings(self, input, model, **kwargs):
+        service = self.services["openai.embeddings"]
+        outcome = service.call()
+        if outcome != "ok":
+            raise _openai_error(outcome, service.name, "embeddings", service.profile.retry_after_s)
+        texts = input if isinstance(input, list) else [input]
+        return CreateEmbeddingResponse(
+            object="list",
+            model=model,
+            data=[Embedding(object="embedding", index=index, embedding=fake_embedding(text)) for index, text in enumerate(texts)],
+            usage={"prompt_tokens": sum(map(_estimate_tokens, texts)), "total_tokens": sum(map(_estimate_tokens, texts))}
+        )
+
+    def _reply(self, messages, tools):
+        """Pick a canned reply based on which agent is talking."""
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        conversation = " ".join(str(message.get("content") or "") for message in messages[1:])
+        called_tool = any(message.get("role") == "tool" for message in messages)
+        if "ideation agent" in system:
+            candidates = re.search(r"(\d+) distinct candidate", conversation)
+            if candidates:
+                numbers = [next(self._ids) for _ in range(int(candidates.group(1)))]
+                return json.dumps({"ideas": [
+                    {"idea_title": f"Idea {number}", "description": f"A practical look at angle {number} of the topic."} for number in numbers
+                ]}), None
+            number = next(self._ids)
+            return json.dumps({"idea_title": f"Idea {number}", "description": f"A practical look at angle {number} of the topic."}), None
+        if "research assistant" in system:
+            if tools and not called_tool:
+                title = re.search(r"Research the following idea: (.*)", conversation)
+                arguments = json.dumps({"idea_title": title.group(1) if title else "topic"})
+                return None, [{"id": f"call_{next(self._ids)}", "type": "function", "function": {"name": "perform_research", "arguments": arguments}}]
+            return json.dumps({
+                "research_title": "Research summary",
+                "research_description": " ".join(["Findings from the collected sources."] * 40),
+                "references": ", ".join(f"https://example.com/source/{index}" for index in range(5))
+            }), None
+        if "article editor" in system:
+            references = "\n".join(f"[{index + 1}] https://example.com/source/{index}" for index in range(5))
+            return json.dumps({"patches": [{"section": "References", "content": f"## References\n{references}"}]}), None
+        if "Convert the user's text" in system:
+            return conversation[conversation.find("{"):], None
+        body = " ".join(["Practical guidance for readers."] * (self.article_words // 4))
+        article_text = f"# Article\n\n## Introduction\n{body}\n\n## Practical Exercise\nTry it.\n\n## References\n[1] https://example.com/source/0"
+        return json.dumps({"article_title": "Article", "article_text": article_text}), None
+
+    def _create_chat_completion(self, model, messages, tools=None, stream=False, **kwargs):
+        service = self.services["openai.chat"]
+        outcome = service.call()
+        if outcome != "ok":
+            raise _openai_error(outcome, service.name, "chat/completions", service.profile.retry_after_s)
+        content, tool_calls = self._reply(messages, tools)
+        prompt_tokens = sum(_estimate_tokens(str(message.get("content") or "")) for message in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _estimate_tokens(content or ""),
+            "total_tokens": prompt_tokens + _estimate_tokens(content or "")
+        }
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage")
+            return self._stream_chunks(model, content, tool_calls, usage if include_usage else None)
+        return ChatCompletion(
+            id=f"chatcmpl-{next(self._ids)}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[{
+                "index": 0,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+                "message": {"role": "assistant", "content": content, "tool_calls": tool_calls}
+            }],
+            usage=usage
+        )
+
+    def _stream_chunks(self, model, content, tool_calls, usage=None, chunk_chars=STREAM_CHUNK_CHARS):
+        """
+        Yield a reply as ChatCompletionChunks, the content a few characters at a time, like a streamed completion.
+
+        With usage, a last chunk without choices carries it, as the API sends
+        for stream_options={"include_usage": True}.
+        """
+        completion_id, created = f"chatcmpl-{next(self._ids)}", int(time.time())
+
+        def chunk(delta, finish_reason=None, usage=None):
+            return ChatCompletionChunk(
+                id=completion_id,
+                object="chat.completion.chunk",
+                created=created,
+                model=model,
+                choices=[] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                usage=usage
+            )
+
+        yield chunk({"role": "assistant"})
+        for start in range(0, len(content or ""), chunk_chars):
+            yield chunk({"content": content[start:start + chunk_chars]})
+        for index, tool_call in enumerate(tool_calls or []):
+            yield chunk({"tool_calls": [dict(tool_call, index=index)]})
+        yield chunk({}, "tool_calls" if tool_calls else "stop")
+        if usage:
+            yield chunk(None, usage=usage)
+
+class FakeSerpSession:
+    """Fake requests session answering SerpAPI searches."""
+
+    def __init__(self, services, results_per_query=5):
+        self.services = services
+        self.results_per_query = results_per_query
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        service = self.services["serpapi.search"]
+        outcome = service.call()
+        response = requests.Response()
+        response.url = url
+        if outcome == "throttled":
+            response.status_code = 429
+            response.headers["Retry-After"] = str(service.profile.retry_after_s)
+            response._content = b'{"error": "Too many requests"}'
+            return response
+        if outcome == "error":
+            response.status_code = 503
+            response._content = b'{"error": "Service unavailable"}'
+            return response
+        query = (params or {}).get("q", "")
+        slug = re.sub(r"\W+", "-", query.lower())
+        response.status_code = 200
+        response._content = json.dumps({"organic_results": [
+            {
+                "position": index + 1,
+                "title": f"{query} result {index}",
+                "link": f"https://example.com/{slug}/{index}",
+                "snippet": f"Snippet {index} about {query}."
+            }
+            for index in range(self.results_per_query)
+        ]}).encode("utf-8")
+        return response
+
+class _FakeQuery:
+    """Chainable subset of the postgrest query builder."""
+
+    def __init__(self, database, table, action, payload=None):
+        self.database = database
+        self.table = table
+        self.action = action
+        self.payload = payload
+        self.filters = []
+        self.order_column = None
+        self.descending = False
+        self.row_limit = None
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def _filter(self, predicate):
+        self.filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def is_(self, column, value):
+        return self._filter(lambda row: row.get(column) is None)
+
+    def order(self, column, desc=False, **kwargs):
+        self.order_column, self.descending = column, desc
+        return self
+
+    def limit(self, count, **kwargs):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        service = self.database.services[f"supabase.{self.action}"]
+        outcome = service.call()
+        if outcome != "ok":
+            raise RuntimeError(f"Injected {outcome} failure in {service.name}")
+        return _Namespace(data=self.database.apply(self))
+
+class FakeSupabase:
+    """In-memory fake of the Supabase client's table API."""
+
+    def __init__(self, services):
+        self.services = services
+        self.tables = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def table(self, name):
+        return _FakeTable(self, name)
+
+    def apply(self, query):
+        with self._lock:
+            rows = self.tables.setdefault(query.table, [])
+            if query.action == "insert":
+                inserted = [dict(row, id=next(self._ids)) for row in query.payload]
+                rows.extend(inserted)
+                return inserted
+            matched = [row for row in rows if all(predicate(row) for predicate in query.filters)]
+            if query.action == "update":
+                for row in matched:
+                    row.update(query.payload)
+                return matched
+            if query.order_column:
+                matched.sort(key=lambda row: row.get(query.order_column), reverse=query.descending)
+            return [dict(row) for row in matched[:query.row_limit]]
+
+class _FakeTable:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    def insert(self, rows, **kwargs):
+        return _FakeQuery(self.database, self.name, "insert", rows if isinstance(rows, list) else [rows])
+
+    def select(self, *columns, **kwargs):
+        return _FakeQuery(self.database, self.name, "select")
+
+    def update(self, values, **kwargs):
+        return _FakeQuery(self.database, self.name, "update", values)
+
+def build_fakes(profiles=None, time_scale=1.0, seed=0, article_words=900):
+    """
+    Build the fake clients sharing one call recorder.
+
+    Args:
+        profiles (dict): ServiceProfile overrides by service name.
+        time_scale (float): Multiplier applied to every sampled latency.
+        seed (int): Seed for latency and failure sampling.
+        article_words (int): Approximate length of generated articles.
+
+    Returns:
+        dict: 'openai', 'serpapi_session', 'supabase' and 'recorder'.
+    """
+    recorder = CallRecorder()
+    profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+    services = {
+        name: FakeService(name, profile, recorder, time_scale, seed)
+        for name, profile in profiles.items()
+    }
+    return {
+        "openai": FakeOpenAI(services, article_words),
+        "serpapi_session": FakeSerpSession(services),
+        "supabase": FakeSupabase(services),
+        "recorder": recorder
+    }
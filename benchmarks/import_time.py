@@ -0,0 +1,70 @@
+"""
+Import-time budget check for the pipeline entry points.
+
+Imports each module in a fresh interpreter, takes the best of several
+runs, and exits non-zero when any of them exceeds its budget. Importing
+must not create clients or open connections, so this runs offline.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 800 --runs 5 --show 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported on a cold start and their budgets in milliseconds
+BUDGETS_MS = {
+    "main": 1000,
+    "database.db_utils": 300,
+    "utils.embedding_utils": 300,
+}
+
+def measure(module):
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        tuple: (total import time in ms, list of (cumulative ms, module) from -X importtime).
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative) / 1000, name.rstrip()))
+    total = next((ms for ms, name in entries if name.strip() == module), None)
+    return total if total is not None else sum(ms for ms, name in entries if not name.startswith("  ")), entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that importing the pipeline stays within its time budget.")
+    parser.add_argument("--budget-ms", type=float, help="Budget for every module, overriding the defaults.")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the fastest counts.")
+    parser.add_argument("--show", type=int, default=10, help="Slowest top-level imports to list per module.")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module, budget in BUDGETS_MS.items():
+        budget = args.budget_ms or budget
+        total, entries = min((measure(module) for _ in range(args.runs)), key=lambda measured: measured[0])
+        status = "ok" if total <= budget else "OVER BUDGET"
+        print(f"{module}: {total:.0f} ms (budget {budget:.0f} ms) {status}")
+        # Direct dependencies are indented by two spaces in -X importtime output
+        direct = [(ms, name.strip()) for ms, name in entries if name.startswith("   ") and not name.startswith("    ")]
+        for ms, name in sorted(direct, reverse=True)[:args.show]:
+            print(f"  {ms:8.1f} ms  {name}")
+        if total > budget:
+            over_budget.append(module)
+
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,253 @@
+"""
+Offline benchmark of the article pipeline against local fakes.
+
+Runs main.main (one topic at a time) or main.run_batch with OpenAI, SerpAPI
+and Supabase replaced by the injected clients from benchmarks.fakes, then
+reports per-stage and per-service latency percentiles, throughput and peak
+memory. Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python -m benchmarks.run_benchmark --topics 20 --mode batch --concurrency 8 --time-scale 0.05
+    python -m benchmarks.run_benchmark --latency openai.chat=4000 --error-rate serpapi.search=0.05
+    python -m benchmarks.run_benchmark --compare benchmarks/results/<earlier>.json
+"""
+from datetime import datetime
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Pipeline functions timed as stages, by the name they are reported under
+STAGES = {
+    "run_unique_ideation": "ideation",
+    "save_idea": "idea_save",
+    "run_research": "research",
+    "save_research": "research_save",
+    "compact_for_writer": "compaction",
+    "run_writer": "writer",
+    "run_editor": "editing",
+    "save_article": "article_save",
+}
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def summarize(values):
+    """Summarize latencies in seconds as count, mean, p50, p95 and p99 in milliseconds."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(1000 * sum(values) / len(values), 2),
+        "p50_ms": round(1000 * percentile(values, 0.50), 2),
+        "p95_ms": round(1000 * percentile(values, 0.95), 2),
+        "p99_ms": round(1000 * percentile(values, 0.99), 2),
+    }
+
+def _isolate_environment(workdir):
+    """Point every cache and checkpoint at a scratch directory so runs start cold and stay offline."""
+    os.environ.update({
+        "SUPABASE_URL": os.environ.get("SUPABASE_URL") or "http://localhost:54321",
+        "SUPABASE_KEY": os.environ.get("SUPABASE_KEY") or "bench.bench.bench",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-bench",
+        "SERPAPI_API_KEY": os.environ.get("SERPAPI_API_KEY") or "bench",
+        "EMBEDDING_CACHE_PATH": "",
+        "SERPAPI_CACHE_PATH": "",
+        "LLM_CACHE_MODE": "off",
+        "CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+    })
+    # Fakes have no quotas; keep the limiters' retries but not their pacing unless limits are given
+    for name in ("OPENAI_CHAT_RPM", "OPENAI_CHAT_TPM", "OPENAI_EMBEDDING_RPM", "OPENAI_EMBEDDING_TPM", "SERPAPI_RPM"):
+        os.environ.setdefault(name, "0")
+
+def _install_fakes(fakes):
+    """Inject the fake clients into the shared client registry."""
+    from utils import clients
+    import main
+
+    clients.reset()
+    clients.set_client("openai", fakes["openai"])
+    clients.set_client("supabase", fakes["supabase"])
+    clients.set_client("http", fakes["serpapi_session"])
+    return main
+
+def _time_stages(main, timings):
+    """Wrap the pipeline's stage functions so each call's wall time is recorded."""
+    lock = threading.Lock()
+
+    def wrap(function, stage):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with lock:
+                    timings.setdefault(stage, []).append(time.perf_counter() - started)
+        return timed
+
+    for name, stage in STAGES.items():
+        setattr(main, name, wrap(getattr(main, name), stage))
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def _parse_overrides(pairs, cast=float):
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        overrides[name] = cast(value)
+    return overrides
+
+def run_benchmark(topics=10, mode="batch", concurrency=4, time_scale=0.05, latency=None,
+                  error_rate=None, throttle_rate=None, seed=0, article_words=900, stream=False):
+    """
+    Run the pipeline against fakes and return the benchmark report.
+
+    Args:
+        topics (int): Number of topics to generate articles for.
+        mode (str): 'single' runs main.main per topic in sequence; 'batch' uses run_batch.
+        concurrency (int): Concurrency limit for batch mode.
+        time_scale (float): Multiplier on every fake latency; keeps long runs short.
+        latency (dict): Median latency overrides in ms by service name.
+        error_rate (dict): Transient error rate overrides by service name.
+        throttle_rate (dict): 429 rate overrides by service name.
+        seed (int): Seed for latency and failure sampling.
+        article_words (int): Approximate length of generated articles.
+        stream (bool): Stream the writer completions, as a run with a progress
+            subscriber does, instead of waiting for whole responses.
+
+    Returns:
+        dict: The report.
+    """
+    from benchmarks.fakes import DEFAULT_PROFILES, ServiceProfile, build_fakes
+
+    profiles = {}
+    for name, base in DEFAULT_PROFILES.items():
+        profiles[name] = ServiceProfile(
+            median_ms=(latency or {}).get(name, base.median_ms),
+            sigma=base.sigma,
+            error_rate=(error_rate or {}).get(name, base.error_rate),
+            throttle_rate=(throttle_rate or {}).get(name, base.throttle_rate),
+            retry_after_s=base.retry_after_s,
+        )
+
+    workdir = tempfile.mkdtemp(prefix="article-bench-")
+    _isolate_environment(workdir)
+    fakes = build_fakes(profiles, time_scale=time_scale, seed=seed, article_words=article_words)
+    main = _install_fakes(fakes)
+    timings = {}
+    _time_stages(main, timings)
+    topic_list = [f"Benchmark topic {index}" for index in range(topics)]
+    if stream:
+        from utils.events import progress_events
+        # Any subscriber makes the pipeline stream the writer
+        unsubscribe = progress_events.subscribe(lambda event: None)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == "single":
+        outcomes = [main.main(topic) is not None for topic in topic_list]
+    else:
+        outcomes = [result["error"] is None for result in main.run_batch(topic_list, max_concurrency=concurrency)]
+    wall_time = time.perf_counter() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if stream:
+        unsubscribe()
+
+    services = {}
+    for service, seconds, outcome in fakes["recorder"].calls:
+        entry = services.setdefault(service, {"latencies": [], "errors": 0, "throttled": 0})
+        entry["latencies"].append(seconds)
+        if outcome == "error":
+            entry["errors"] += 1
+        elif outcome == "throttled":
+            entry["throttled"] += 1
+
+    succeeded = sum(outcomes)
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "topics": topics, "mode": mode, "concurrency": concurrency, "time_scale": time_scale,
+            "seed": seed, "article_words": article_words, "stream": stream,
+            "profiles": {name: vars(profile) for name, profile in profiles.items()},
+        },
+        "wall_time_s": round(wall_time, 3),
+        "succeeded": succeeded,
+        "failed": len(outcomes) - succeeded,
+        "articles_per_minute": round(60 * succeeded / wall_time, 2) if wall_time else None,
+        "peak_memory_mb": round(peak_memory / 2 ** 20, 2),
+        "stages": {stage: summarize(values) for stage, values in timings.items()},
+        "services": {
+            service: {**summarize(entry["latencies"]), "errors": entry["errors"], "throttled": entry["throttled"]}
+            for service, entry in sorted(services.items())
+        },
+    }
+
+def compare(report, baseline):
+    """Return lines comparing headline numbers and stage p95s of report against baseline."""
+    lines = [f"Comparing {report['commit']} against {baseline['commit']}:"]
+    for key in ("articles_per_minute", "wall_time_s", "peak_memory_mb"):
+        lines.append(f"  {key}: {baseline.get(key)} -> {report.get(key)}")
+    for stage, summary in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage, {}).get("p95_ms")
+        lines.append(f"  {stage} p95_ms: {before} -> {summary.get('p95_ms')}")
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the article pipeline offline against local fakes.")
+    parser.add_argument("--topics", type=int, default=10)
+    parser.add_argument("--mode", choices=["single", "batch"], default="batch")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Multiplier on all fake latencies.")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=MS", help="Median latency override.")
+    parser.add_argument("--error-rate", action="append", metavar="SERVICE=RATE", help="Transient error rate override.")
+    parser.add_argument("--throttle-rate", action="append", metavar="SERVICE=RATE", help="429 rate override.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--article-words", type=int, default=900)
+    parser.add_argument("--stream", action="store_true", help="Stream the writer completions.")
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/).")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against.")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        topics=args.topics, mode=args.mode, concurrency=args.concurrency, time_scale=args.time_scale,
+        latency=_parse_overrides(args.latency), error_rate=_parse_overrides(args.error_rate),
+        throttle_rate=_parse_overrides(args.throttle_rate), seed=args.seed, article_words=args.article_words,
+        stream=args.stream,
+    )
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{report['commit']}-{args.mode}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps({key: report[key] for key in ("wall_time_s", "succeeded", "failed", "articles_per_minute", "peak_memory_mb")}, indent=2))
+    for stage, summary in report["stages"].items():
+        print(f"{stage:>14}: p50 {summary.get('p50_ms')} ms  p95 {summary.get('p95_ms')} ms  p99 {summary.get('p99_ms')} ms")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(report, json.load(f))))
+    print(f"Report written to {output}")
+    sys.exit(0 if report["succeeded"] else 1)
@@ -0,0 +1,15 @@
+-- Chunk embeddings of research and article rows, written by
+-- database.db_utils.insert_chunks when CHUNK_EMBEDDINGS is on.
+-- Run once in the Supabase SQL editor.
+create table if not exists chunks (
+    id bigint generated by default as identity primary key,
+    parent_table text not null check (parent_table in ('research', 'writer')),
+    parent_id bigint not null,
+    chunk_index integer not null,
+    content text not null,
+    -- Use text instead when EMBEDDING_STORAGE_FORMAT is a compact format
+    embedding vector(1536),
+    date_created timestamp not null default now()
+);
+
+create index if not exists chunks_parent_idx on chunks (parent_table, parent_id, chunk_index);
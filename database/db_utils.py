@@ -1,18 +1,11 @@
-from supabase import create_client
-import os
-from dotenv import load_dotenv
 from datetime import datetime
+from utils.embedding_utils import generate_embeddings
+from utils.embedding_codec import encode_embedding
+from utils.config import EMBEDDING_STORAGE_FORMAT
+from utils.metrics import span
+from utils.clients import get_supabase
 import logging
 
-# Load environment variables
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Initialize Supabase client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 logger = logging.getLogger(__name__)
 
 def insert_idea_with_embedding(idea_title, description, embedding):
@@ -28,11 +21,13 @@ def insert_idea_with_embedding(idea_title, description, embedding):
         dict: Response from Supabase.
     """
     try:
-        response = supabase.table("ideation").insert({
-            "idea_title": idea_title,
-            "description": description,
-            "embedding": embedding
-        }).execute()
+        with span("db_insert", table="ideation"):
+            response = get_supabase().table("ideation").insert({
+                "idea_title": idea_title,
+                "description": description,
+                "embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+                "date_created": datetime.utcnow().isoformat()
+            }).execute()
         return response.data
     except Exception as e:
         print(f"Error inserting data into ideation table: {e}")
@@ -72,13 +67,15 @@ def insert_research_with_embedding(research_title, research_text, reference_urls
             raise ValueError("Embedding must be a list of floats or integers.")
 
         # Insert data into the research table
-        response = supabase.table("research").insert({
-            "research_title": research_title,
-            "research_text": research_text,
-            "references_urls": reference_urls,
-            "embedding": embedding,
-            "ideation_id": ideation_id
-        }).execute()
+        with span("db_insert", table="research"):
+            response = get_supabase().table("research").insert({
+                "research_title": research_title,
+                "research_text": research_text,
+                "references_urls": reference_urls,
+                "embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+                "ideation_id": ideation_id,
+                "date_created": datetime.utcnow().isoformat()
+            }).execute()
         
         # Return the ID of the inserted research
         if response.data and len(response.data) > 0:
@@ -106,13 +103,14 @@ def insert_article_with_embedding(article_text, embedding, ideation_id, research
                 research_id = research_id[0]["id"]
         research_id = int(research_id)
 
-        response = supabase.table("writer").insert({
-            "article_text": article_text,
-            "embedding": embedding,
-            "ideation_id": ideation_id,
-            "research_id": research_id,
-            "date_created": datetime.utcnow().isoformat()
-        }).execute()
+        with span("db_insert", table="writer"):
+            response = get_supabase().table("writer").insert({
+                "article_text": article_text,
+                "embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+                "ideation_id": ideation_id,
+                "research_id": research_id,
+                "date_created": datetime.utcnow().isoformat()
+            }).execute()
         
         if response.data and len(response.data) > 0:
             return response.data[0].get('id')
@@ -122,3 +120,175 @@ def insert_article_with_embedding(article_text, embedding, ideation_id, research
         logger.error(f"Error inserting data into writer table: {e}")
         return None
 
+def insert_rows(table, rows):
+    """
+    Bulk insert rows into a table in a single request.
+
+    Args:
+        table (str): Table name.
+        rows (list): Row dicts.
+
+    Returns:
+        list: The inserted rows, including their IDs, in input order.
+
+    Raises:
+        Exception: If the insert fails; callers decide whether to retry.
+    """
+    with span("db_insert", table=table, rows=len(rows)):
+        response = get_supabase().table(table).insert(rows).execute()
+    return response.data or []
+
+def queue_idea_with_embedding(queue, idea_title, description, embedding):
+    """Queue an idea insert on a WriteBehindQueue and return its PendingId."""
+    return queue.submit("ideation", {
+        "idea_title": idea_title,
+        "description": description,
+        "embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+        "date_created": datetime.utcnow().isoformat()
+    })
+
+def queue_research_with_embedding(queue, research_title, research_text, reference_urls, embedding, ideation_id):
+    """Queue a research insert on a WriteBehindQueue; ideation_id may be a PendingId."""
+    return queue.submit("research", {
+        "research_title": research_title,
+        "research_text": research_text,
+        "references_urls": reference_urls,
+        "embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+        "ideation_id": ideation_id,
+        "date_created": datetime.utcnow().isoformat()
+    })
+
+def queue_article_with_embedding(queue, article_text, embedding, ideation_id, research_id):
+    """Queue an article insert on a WriteBehindQueue; the IDs may be PendingIds."""
+    return queue.submit("writer", {
+        "article_text": article_text,
+        "embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+        "ideation_id": ideation_id,
+        "research_id": research_id,
+        "date_created": datetime.utcnow().isoformat()
+    })
+
+def _chunk_rows(parent_table, parent_id, chunks):
+    return [
+        {
+            "parent_table": parent_table,
+            "parent_id": parent_id,
+            "chunk_index": chunk["chunk_index"],
+            "content": chunk["content"],
+            "embedding": encode_embedding(chunk["embedding"], EMBEDDING_STORAGE_FORMAT)
+        }
+        for chunk in chunks
+        if chunk["embedding"] is not None
+    ]
+
+def insert_chunks(parent_table, parent_id, chunks):
+    """
+    Insert the embedded chunks of a research or article row into the 'chunks' table.
+
+    The table has the columns parent_table, parent_id, chunk_index,
+    content and embedding. Chunks whose embedding failed are skipped.
+
+    Args:
+        parent_table (str): 'research' or 'writer'.
+        parent_id (int): ID of the row the chunks belong to.
+        chunks (list): Chunk dicts from utils.chunking.embed_chunks.
+
+    Returns:
+        int: Number of chunks inserted, or None on error.
+    """
+    rows = _chunk_rows(parent_table, parent_id, chunks)
+    if not rows:
+        return 0
+    try:
+        return len(insert_rows("chunks", rows))
+    except Exception as e:
+        logger.error(f"Error inserting chunks of {parent_table} row {parent_id}: {e}")
+        return None
+
+def queue_chunks(queue, parent_table, parent_id, chunks):
+    """Queue chunk inserts on a WriteBehindQueue; parent_id may be a PendingId."""
+    return [queue.submit("chunks", row) for row in _chunk_rows(parent_table, parent_id, chunks)]
+
+def fetch_embeddings_since(table, last_id, limit=1000, columns="id, embedding"):
+    """
+    Fetch a page of rows with embeddings from a table, in ID order.
+
+    Args:
+        table (str): Table name.
+        last_id (int): Only rows with an ID greater than this are returned.
+        limit (int): Maximum number of rows.
+        columns (str): Columns to select; must include 'id' and 'embedding'.
+
+    Returns:
+        list: Row dicts, or an empty list on error.
+    """
+    try:
+        response = get_supabase().table(table).select(columns).gt("id", last_id).order("id").limit(limit).execute()
+        return response.data or []
+    except Exception as e:
+        logger.error(f"Error fetching embeddings from {table} table: {e}")
+        return []
+
+def fetch_rows(table, ids, columns="*"):
+    """
+    Fetch rows of a table by ID in one request.
+
+    Args:
+        table (str): Table name.
+        ids (list): Row IDs.
+        columns (str): Columns to select; include 'id' to match rows back to IDs.
+
+    Returns:
+        list: Row dicts in no particular order, or an empty list on error.
+    """
+    if not ids:
+        return []
+    try:
+        response = get_supabase().table(table).select(columns).in_("id", list(ids)).execute()
+        return response.data or []
+    except Exception as e:
+        logger.error(f"Error fetching rows from {table} table: {e}")
+        return []
+
+# Text each table's embedding is computed from, matching what the pipeline embeds
+EMBEDDING_SOURCES = {
+    "ideation": lambda row: row.get("description"),
+    "research": lambda row: f"{row.get('research_title')} {row.get('research_text')}",
+    "writer": lambda row: row.get("article_text"),
+}
+
+def backfill_embeddings(table, page_size=500):
+    """
+    Compute missing embeddings for rows of a table, one batched request per page.
+
+    Args:
+        table (str): One of 'ideation', 'research' or 'writer'.
+        page_size (int): Rows fetched and embedded per round-trip.
+
+    Returns:
+        int: Number of rows updated.
+    """
+    source = EMBEDDING_SOURCES[table]
+    updated = 0
+    last_id = 0
+    while True:
+        try:
+            response = get_supabase().table(table).select("*").is_("embedding", "null").gt("id", last_id).order("id").limit(page_size).execute()
+        except Exception as e:
+            logger.error(f"Error reading rows to backfill from {table} table: {e}")
+            break
+        rows = response.data or []
+        if not rows:
+            break
+        embeddings = generate_embeddings([source(row) for row in rows])
+        for row, embedding in zip(rows, embeddings):
+            if embedding is None:
+                continue
+            try:
+                get_supabase().table(table).update({"embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT)}).eq("id", row["id"]).execute()
+                updated += 1
+            except Exception as e:
+                logger.error(f"Error updating embedding for {table} row {row['id']}: {e}")
+        last_id = rows[-1]["id"]
+    logger.info(f"Backfilled {updated} embeddings in {table} table.")
+    return updated
@@ -0,0 +1,278 @@
+"""
+Streaming export of the article corpus to JSONL or Parquet.
+
+Articles are read from the 'writer' table in ID order with keyset
+pagination, each page is joined to its ideation and research rows with one
+batched lookup per table, and the page is written before the next is
+fetched, so memory use depends on the page size, not the corpus size.
+
+Usage:
+    python -m database.export --out corpus.parquet --embeddings float16
+    python -m database.export --out new_articles.jsonl --watermark .cache/export_watermark.json
+"""
+from utils.clients import get_supabase
+from utils.embedding_codec import decode_embedding, encode_embedding, pack_embedding
+from utils.metrics import span
+from utils.config import EXPORT_PAGE_SIZE
+from datetime import datetime
+import argparse
+import json
+import logging
+import os
+import uuid
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; only Parquet export needs it
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+class ExportError(Exception):
+    """Raised when rows an export needs are missing, so it stops instead of writing incomplete records."""
+
+# Embedding formats an export can write; 'json' is a list of floats, the others are binary
+EMBEDDING_FORMATS = ["json", "float32", "float16", "int8"]
+
+# Columns read from each table, without the embedding
+ARTICLE_COLUMNS = "id, article_text, ideation_id, research_id, date_created"
+IDEA_COLUMNS = "id, idea_title, description, date_created"
+RESEARCH_COLUMNS = "id, research_title, research_text, references_urls, date_created"
+
+# Column names and types of an exported record; embedding columns are added when requested
+RECORD_FIELDS = [
+    ("article_id", "int64"), ("article_text", "string"), ("article_created", "string"),
+    ("idea_id", "int64"), ("idea_title", "string"), ("idea_description", "string"), ("idea_created", "string"),
+    ("research_id", "int64"), ("research_title", "string"), ("research_text", "string"),
+    ("references_urls", "string"), ("research_created", "string"),
+]
+EMBEDDING_FIELDS = ["article_embedding", "idea_embedding", "research_embedding"]
+
+def iter_pages(table, columns="*", after_id=0, page_size=EXPORT_PAGE_SIZE):
+    """
+    Yield the rows of a table in ID order, a page at a time.
+
+    Each page is selected with id > the last ID seen, so a page costs the
+    same however deep into the table it is, and rows inserted during the
+    export are picked up rather than shifting the pages.
+
+    Args:
+        table (str): Table name.
+        columns (str): Columns to select; must include 'id'.
+        after_id (int): Only rows with an ID greater than this are read.
+        page_size (int): Rows per request.
+
+    Yields:
+        list: Row dicts of one page.
+
+    Raises:
+        Exception: If a page cannot be read, so an export never silently stops short.
+    """
+    last_id = after_id
+    while True:
+        with span("db_select", table=table):
+            response = get_supabase().table(table).select(columns).gt("id", last_id).order("id").limit(page_size).execute()
+        rows = response.data or []
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+        if len(rows) < page_size:
+            return
+
+def _by_id(table, ids, columns):
+    """
+    Fetch rows by ID in one request, keyed by ID.
+
+    Unlike db_utils.fetch_rows, errors are raised rather than logged, and
+    every requested row must come back.
+
+    Raises:
+        ExportError: If some requested rows do not exist.
+    """
+    ids = sorted({row_id for row_id in ids if row_id is not None})
+    if not ids:
+        return {}
+    with span("db_select", table=table):
+        response = get_supabase().table(table).select(columns).in_("id", ids).execute()
+    rows = {row["id"]: row for row in response.data or []}
+    missing = [row_id for row_id in ids if row_id not in rows]
+    if missing:
+        raise ExportError(f"{len(missing)} {table} rows referenced by articles were not found: {missing[:10]}")
+    return rows
+
+def _convert_embedding(value, embedding_format, binary):
+    if value is None:
+        return None
+    vector = decode_embedding(value)
+    if embedding_format == "json":
+        return encode_embedding(vector, "json")
+    # JSON cannot hold bytes, so JSONL gets the self-describing base64 string
+    return pack_embedding(vector, embedding_format) if binary else encode_embedding(vector, embedding_format)
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+def iter_article_pages(after_id=0, page_size=EXPORT_PAGE_SIZE, embedding_format=None, binary=False):
+    """
+    Yield pages of articles joined to their idea and research rows.
+
+    Args:
+        after_id (int): Only articles with an ID greater than this are exported.
+        page_size (int): Articles per page.
+        embedding_format (str): One of EMBEDDING_FORMATS to include the
+            embeddings, or None to leave them out (and not read them).
+        binary (bool): Give binary embedding formats as bytes rather than
+            '<format>:<base64>' strings.
+
+    Yields:
+        list: Record dicts with the RECORD_FIELDS keys, plus EMBEDDING_FIELDS
+        when embeddings are included.
+    """
+    suffix = ", embedding" if embedding_format else ""
+    for articles in iter_pages("writer", ARTICLE_COLUMNS + suffix, after_id, page_size):
+        ideas = _by_id("ideation", (article.get("ideation_id") for article in articles), IDEA_COLUMNS + suffix)
+        research = _by_id("research", (article.get("research_id") for article in articles), RESEARCH_COLUMNS + suffix)
+        records = []
+        for article in articles:
+            idea = ideas.get(article.get("ideation_id")) or {}
+            study = research.get(article.get("research_id")) or {}
+            record = {
+                "article_id": article["id"],
+                "article_text": article.get("article_text"),
+                "article_created": article.get("date_created"),
+                "idea_id": article.get("ideation_id"),
+                "idea_title": idea.get("idea_title"),
+                "idea_description": idea.get("description"),
+                "idea_created": idea.get("date_created"),
+                "research_id": article.get("research_id"),
+                "research_title": study.get("research_title"),
+                "research_text": study.get("research_text"),
+                "references_urls": _text(study.get("references_urls")),
+                "research_created": study.get("date_created"),
+            }
+            if embedding_format:
+                for field, row in zip(EMBEDDING_FIELDS, (article, idea, study)):
+                    record[field] = _convert_embedding(row.get("embedding"), embedding_format, binary)
+            records.append(record)
+        yield records
+
+class JsonlWriter:
+    """Writes records as JSON lines."""
+
+    binary = False
+
+    def __init__(self, path, embedding_format=None):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, records):
+        self._file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def close(self):
+        self._file.close()
+
+class ParquetWriter:
+    """Writes records to a Parquet file, one row group per page."""
+
+    binary = True
+
+    def __init__(self, path, embedding_format=None):
+        if pyarrow is None:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        types = {"int64": pyarrow.int64(), "string": pyarrow.string()}
+        fields = [pyarrow.field(name, types[kind]) for name, kind in RECORD_FIELDS]
+        if embedding_format:
+            kind = pyarrow.list_(pyarrow.float32()) if embedding_format == "json" else pyarrow.binary()
+            fields += [pyarrow.field(name, kind) for name in EMBEDDING_FIELDS]
+        metadata = {"embedding_format": embedding_format or ""}
+        self.schema = pyarrow.schema(fields, metadata=metadata)
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        if records:
+            self._writer.write_table(pyarrow.Table.from_pylist(records, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+WRITERS = {"jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+def load_watermark(path):
+    """Return the ID of the last article exported according to the watermark file, or 0."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(json.load(f).get("last_article_id", 0))
+    except FileNotFoundError:
+        return 0
+
+def save_watermark(path, last_article_id):
+    """Record the last exported article ID, replacing the watermark file atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_article_id": last_article_id, "exported_at": datetime.utcnow().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+def export_corpus(path, fmt=None, embedding_format=None, watermark_path=None, page_size=EXPORT_PAGE_SIZE):
+    """
+    Export articles with their ideas and research to a JSONL or Parquet file.
+
+    With a watermark file only articles after the last exported one are
+    written, and the watermark moves forward once the export has finished.
+    A page or join that cannot be read aborts the export without moving
+    the watermark, leaving a partial output file, so a failed export is
+    simply rerun.
+
+    Args:
+        path (str): Output file; overwritten.
+        fmt (str): 'jsonl' or 'parquet'; inferred from the file extension if omitted.
+        embedding_format (str): One of EMBEDDING_FORMATS to include embeddings, or None.
+        watermark_path (str): JSON file holding the last exported article ID.
+        page_size (int): Articles read, joined and written per page.
+
+    Returns:
+        dict: 'articles' written and 'last_article_id'.
+
+    Raises:
+        ExportError: If an article's idea or research row is missing.
+    """
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "jsonl")
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if embedding_format is not None and embedding_format not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown embedding format: {embedding_format}")
+    after_id = load_watermark(watermark_path) if watermark_path else 0
+    if after_id:
+        logger.info(f"Exporting articles after ID {after_id}...")
+
+    writer = WRITERS[fmt](path, embedding_format)
+    count, last_id = 0, after_id
+    try:
+        for records in iter_article_pages(after_id, page_size, embedding_format, writer.binary):
+            writer.write(records)
+            count += len(records)
+            last_id = records[-1]["article_id"]
+            logger.info(f"Exported {count} articles (through ID {last_id})...")
+    finally:
+        writer.close()
+
+    if watermark_path and last_id != after_id:
+        save_watermark(watermark_path, last_id)
+    logger.info(f"Exported {count} articles to {path}.")
+    return {"articles": count, "last_article_id": last_id}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Export articles joined to their ideas and research as JSONL or Parquet.")
+    parser.add_argument("--out", required=True, help="Output file (.jsonl or .parquet).")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="Output format (default: from the file extension).")
+    parser.add_argument("--embeddings", choices=EMBEDDING_FORMATS, help="Include embeddings in this format.")
+    parser.add_argument("--watermark", help="Export only articles after the one recorded in this file, then update it.")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE, help="Articles per page.")
+    args = parser.parse_args()
+    print(json.dumps(export_corpus(args.out, args.format, args.embeddings, args.watermark, max(1, args.page_size))))
@@ -0,0 +1,171 @@
+from concurrent.futures import Future
+from utils.metrics import record_retry
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tables are flushed in this order so foreign keys always point at rows already inserted
+TABLE_ORDER = ["ideation", "research", "writer", "chunks"]
+
+class PendingId:
+    """
+    ID of a row that is queued but not yet inserted.
+
+    int() blocks until the row is flushed, so code that only occasionally
+    needs the real ID (such as agent tools reading context variables) keeps
+    working unchanged. Rows queued with a PendingId as a foreign key have it
+    resolved at flush time.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.future = Future()
+
+    def result(self, timeout=None):
+        """Block until the row is inserted and return its ID."""
+        return self.future.result(timeout)
+
+    def done(self):
+        return self.future.done()
+
+    def add_done_callback(self, callback):
+        """Call callback(row_id) once the row is inserted; failures are not reported."""
+        self.future.add_done_callback(lambda future: future.exception() is None and callback(future.result()))
+
+    def __int__(self):
+        return int(self.result())
+
+    def __deepcopy__(self, memo):
+        # Swarm deep-copies context variables; the pending ID must stay shared
+        return self
+
+    def __repr__(self):
+        state = self.future.result() if self.future.done() and not self.future.exception() else "pending"
+        return f"PendingId({self.table}, {state})"
+
+def resolve_id(value, timeout=None):
+    """Return the real ID behind value, waiting for its insert if it is still pending."""
+    return value.result(timeout) if isinstance(value, PendingId) else value
+
+class WriteBehindQueue:
+    """
+    Buffers inserts per table and writes them as bulk inserts off the request path.
+
+    A buffer is flushed when it reaches max_batch rows or when flush_interval
+    seconds have passed since its oldest row arrived. Failed bulk inserts are
+    retried with exponential backoff. submit() blocks once max_pending rows
+    are waiting, which applies backpressure to producers that outrun the
+    database.
+    """
+
+    def __init__(self, insert_rows, max_batch=50, flush_interval=0.5, max_pending=1000, max_retries=3):
+        self.insert_rows = insert_rows
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._buffers = {table: [] for table in TABLE_ORDER}
+        self._oldest = {}
+        self._pending = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+
+    def submit(self, table, row):
+        """
+        Queue a row for insertion.
+
+        Args:
+            table (str): One of the tables in TABLE_ORDER.
+            row (dict): Column values; PendingId values are resolved before insert.
+
+        Returns:
+            PendingId: Resolves to the inserted row's ID.
+        """
+        pending_id = PendingId(table)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed.")
+            while self._pending >= self.max_pending:
+                self._condition.wait()
+            self._buffers[table].append((row, pending_id))
+            self._oldest.setdefault(table, time.monotonic())
+            self._pending += 1
+            self._condition.notify_all()
+        return pending_id
+
+    def _due(self):
+        now = time.monotonic()
+        return self._closed or any(
+            len(self._buffers[table]) >= self.max_batch or now - self._oldest[table] >= self.flush_interval
+            for table in self._oldest
+        )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due():
+                    self._condition.wait(self.flush_interval)
+                if self._closed and self._pending == 0:
+                    return
+                batches = {table: self._buffers[table] for table in TABLE_ORDER if self._buffers[table]}
+                for table in batches:
+                    self._buffers[table] = []
+                self._oldest.clear()
+            for table in TABLE_ORDER:
+                if table in batches:
+                    self._flush_table(table, batches[table])
+            with self._condition:
+                self._pending -= sum(len(batch) for batch in batches.values())
+                self._condition.notify_all()
+
+    def _flush_table(self, table, batch):
+        rows, pending_ids = [], []
+        for row, pending_id in batch:
+            try:
+                rows.append({column: resolve_id(value) for column, value in row.items()})
+                pending_ids.append(pending_id)
+            except Exception as e:
+                # The row this one references failed to insert
+                pending_id.future.set_exception(e)
+
+        for attempt in range(self.max_retries + 1):
+            if not rows:
+                return
+            try:
+                inserted = self.insert_rows(table, rows)
+                if len(inserted) != len(rows):
+                    raise RuntimeError(f"Expected {len(rows)} inserted rows, got {len(inserted)}.")
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Giving up on bulk insert of {len(rows)} rows into {table} table: {e}")
+                    for pending_id in pending_ids:
+                        pending_id.future.set_exception(e)
+                    return
+                record_retry()
+                delay = 0.5 * 2 ** attempt
+                logger.warning(f"Bulk insert into {table} table failed ({e}); retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+        for pending_id, inserted_row in zip(pending_ids, inserted):
+            pending_id.future.set_result(inserted_row.get("id"))
+        logger.info(f"Flushed {len(rows)} rows into {table} table.")
+
+    def flush(self):
+        """Block until every row queued so far has been written or has failed."""
+        with self._condition:
+            self._oldest = {table: float("-inf") for table in TABLE_ORDER if self._buffers[table]}
+            self._condition.notify_all()
+            while self._pending > 0:
+                self._condition.wait()
+
+    def close(self):
+        """Flush remaining rows and stop the worker thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
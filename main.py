@@ -1,11 +1,47 @@
-from swarm import Swarm
-from agents.ideation_agent import ideation_agent
-from agents.research_agent import research_agent
+from agents.ideation_agent import ideation_agent, ideation_candidates_agent
+from agents.research_agent import research_agent, research_synthesis_agent
 from agents.writer_agent import writer_agent
-from utils.embedding_utils import generate_embedding
-from database.db_utils import insert_idea_with_embedding, insert_research_with_embedding, insert_article_with_embedding
-import logging
+from agents.editor_agent import editor_agent, check_article, apply_patches
+from agents.orchestration_agent import Dag, Stage
+from utils.embedding_utils import generate_embedding, generate_embeddings
+from database.db_utils import (
+    insert_idea_with_embedding, insert_research_with_embedding, insert_article_with_embedding, fetch_embeddings_since,
+    queue_idea_with_embedding, queue_research_with_embedding, queue_article_with_embedding, insert_rows,
+    insert_chunks, queue_chunks, fetch_rows
+)
+from database.write_behind import WriteBehindQueue, PendingId, resolve_id
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from utils.partial_json import PartialStringField
+from utils.structured_output import (
+    IdeaResult, ResearchResult, ArticleResult, StructuredOutputError, parse_structured, repair_with_llm, loads_tolerant,
+    validate
+)
+from utils.checkpoint import CheckpointStore, new_run_id
+from utils.chunking import embed_document
+from utils.compaction import compact_research
+from utils.idea_selection import select_diverse
+from utils.vector_index import VectorIndex
+from utils.disk_cache import DiskCache
+from utils.llm_cache import CachedSwarm, discard_on_failure
+from utils.clients import get_swarm
+from utils.rate_limit import limit_openai_client
+from utils.metrics import span, annotate_span, record_retry, instrument_openai_client, start_metrics_server
+from utils.events import progress_events, STAGE_STARTED, STAGE_COMPLETED, PARTIAL_OUTPUT, ERROR
+from utils.config import (
+    BATCH_CONCURRENCY, IDEA_SIMILARITY_THRESHOLD, IDEA_MAX_REGENERATIONS, VECTOR_INDEX_APPROXIMATE,
+    LLM_CACHE_MODE, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_IGNORE_CONTEXT_KEYS, LLM_CACHE_MAX_ENTRIES, METRICS_PORT, CHUNK_EMBEDDINGS,
+    RESEARCH_REUSE_ENABLED, RESEARCH_REUSE_THRESHOLD, RESEARCH_AUGMENT_THRESHOLD, RESEARCH_REUSE_MAX_AGE_DAYS,
+    RESEARCH_REUSE_CANDIDATES, EDITOR_ENABLED, EDITOR_MAX_ROUNDS, PIPELINE_STAGE_RETRIES,
+    IDEA_CANDIDATES, IDEA_FANOUT
+)
+from datetime import datetime, timezone
+import argparse
 import json
+import logging
+import os
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -14,189 +50,950 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def clean_json_response(raw_response):
-    """Clean and prepare JSON response from raw string."""
-    if raw_response.startswith("```") and raw_response.endswith("```"):
-        raw_response = raw_response.strip("`")  # Remove triple backticks
-        if raw_response.startswith("json"):
-            raw_response = raw_response[4:].strip()  # Remove 'json' label if present
-    return raw_response
+_checkpoint_store = None
+_checkpoint_store_lock = threading.Lock()
+
+def get_checkpoint_store():
+    """Return the store of run checkpoints, creating its directory on first use."""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        with _checkpoint_store_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = CheckpointStore()
+    return _checkpoint_store
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Return the LLM response cache, opened once per process and shared by every client."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = DiskCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+    return _llm_cache
+
+# Embeddings of stored ideas, synced incrementally from the ideation table
+idea_index = VectorIndex(approximate=VECTOR_INDEX_APPROXIMATE)
+
+# Embeddings of stored research, synced incrementally from the research table
+research_index = VectorIndex(approximate=VECTOR_INDEX_APPROXIMATE)
+
+class PipelineError(Exception):
+    """Raised when a pipeline stage cannot produce the data the next stage needs."""
+
+def parse_agent_output(client, message, schema, agent_name):
+    """
+    Parse an agent's JSON output into its schema.
+
+    Common formatting problems are fixed locally. Output that still fails is
+    sent once to a cheap repair call rather than rerunning the stage.
+    """
+    def repair(raw, schema, error):
+        record_retry()
+        return repair_with_llm(client.client, raw, schema, error)
 
-def main(topic):
     try:
-        # Step 1: Ideation Agent
-        logger.info(f"Starting conversation with Ideation Agent for topic: {topic}...")
-        client = Swarm()
-        ideation_response = client.run(
-            agent=ideation_agent,
-            messages=[
-                {"role": "user", "content": f"I need help coming up with an idea for an article about {topic}."},
-                {"role": "user", "content": "Please focus on providing valuable insights and practical applications."},
-                {"role": "user", "content": "Can you suggest one refined idea in JSON format?"}
-            ]
-        )
+        return parse_structured(message, schema, repair=repair)
+    except StructuredOutputError as e:
+        raise PipelineError(f"Failed to parse JSON from {agent_name} response: {str(e)}")
+
+def create_client():
+    """Create the Swarm client, wrapped in the LLM response cache when it is enabled."""
+    client = get_swarm()
+    # Rate limiting goes under the metrics wrapper so retries count against the LLM span
+    limit_openai_client(client.client)
+    instrument_openai_client(client.client)
+    if LLM_CACHE_MODE == "off":
+        return client
+    return CachedSwarm(
+        client, get_llm_cache(), mode=LLM_CACHE_MODE, ttl=LLM_CACHE_TTL,
+        ignore_context_keys=LLM_CACHE_IGNORE_CONTEXT_KEYS
+    )
 
-        # Parse ideation response
-        logger.info("Processing Ideation Agent response...")
-        ideation_message = ideation_response.messages[-1]["content"]
+def run_ideation(client, topic, rejected_titles=()):
+    """Ask the Ideation Agent for an idea and return its title and description."""
+    logger.info(f"Starting conversation with Ideation Agent for topic: {topic}...")
+    messages = [
+        {"role": "user", "content": f"I need help coming up with an idea for an article about {topic}."},
+        {"role": "user", "content": "Please focus on providing valuable insights and practical applications."},
+        {"role": "user", "content": "Can you suggest one refined idea in JSON format?"}
+    ]
+    if rejected_titles:
+        rejected = "; ".join(rejected_titles)
+        messages.append({"role": "user", "content": f"These ideas were already covered, so suggest a clearly different angle: {rejected}"})
+    ideation_response = client.run(
+        agent=ideation_agent,
+        messages=messages
+    )
+
+    # Parse ideation response
+    logger.info("Processing Ideation Agent response...")
+    ideation_message = ideation_response.messages[-1]["content"]
+    with discard_on_failure(client, ideation_agent, messages):
+        idea_details = parse_agent_output(client, ideation_message, IdeaResult, "Ideation Agent")
+    idea_title = idea_details.idea_title
+    description = idea_details.description
+
+    logger.info(f"Idea extracted: {idea_title}")
+    logger.info(f"Description: {description}")
+    return {"idea_title": idea_title, "description": description}
+
+def find_duplicate_idea(embedding):
+    """Return (idea_id, similarity) of the closest stored idea above the threshold, or None."""
+    idea_index.sync(lambda last_id, limit: fetch_embeddings_since("ideation", last_id, limit))
+    matches = idea_index.search(embedding, k=1)
+    if matches and matches[0][1] >= IDEA_SIMILARITY_THRESHOLD:
+        return matches[0]
+    return None
+
+def run_ideation_candidates(client, topic, count, rejected_titles=()):
+    """Ask the Ideation Agent for count distinct ideas in one completion and return those that parse."""
+    logger.info(f"Asking the Ideation Agent for {count} candidate ideas for topic: {topic}...")
+    messages = [
+        {"role": "user", "content": f"I need {count} distinct candidate ideas for an article about {topic}."},
+        {"role": "user", "content": "Please focus on providing valuable insights and practical applications."}
+    ]
+    if rejected_titles:
+        rejected = "; ".join(rejected_titles)
+        messages.append({"role": "user", "content": f"These ideas were already covered, so suggest clearly different angles: {rejected}"})
+    ideation_response = client.run(
+        agent=ideation_candidates_agent,
+        messages=messages
+    )
+
+    ideation_message = ideation_response.messages[-1]["content"]
+    with discard_on_failure(client, ideation_candidates_agent, messages):
         try:
-            idea_details = json.loads(ideation_message)
-            idea_title = idea_details.get("idea_title")
-            description = idea_details.get("description")
-
-            if not (idea_title and description):
-                logger.error("Failed to extract idea details from the Ideation Agent response.")
-                return
-
-            logger.info(f"Idea extracted: {idea_title}")
-            logger.info(f"Description: {description}")
-
-            # Generate embedding for the idea
-            logger.info("Generating embedding for the idea description...")
-            embedding = generate_embedding(description)
-
-            if embedding:
-                logger.info("Embedding generated successfully.")
-                # Save idea to database
-                logger.info("Saving idea to database...")
-                idea_id = insert_idea_with_embedding(idea_title, description, embedding)
-                if idea_id:
-                    logger.info(f"Idea saved with ID: {idea_id}")
-                else:
-                    logger.error("Failed to save idea to the database.")
-                    return
-            else:
-                logger.error("Failed to generate embedding for the idea.")
-                return
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from Ideation Agent response: {str(e)}")
-            return
-
-        # Step 2: Research Agent
-        logger.info("Starting conversation with Research Agent...")
-        research_response = client.run(
-            agent=research_agent,
-            messages=[
-                {"role": "system", "content": f"Research the following idea: {idea_title}"}
-            ],
-            context_variables={"idea_title": idea_title}
+            items = loads_tolerant(ideation_message).get("ideas")
+        except StructuredOutputError as e:
+            raise PipelineError(f"Failed to parse JSON from Ideation Agent response: {str(e)}")
+        candidates = []
+        for item in items if isinstance(items, list) else []:
+            try:
+                idea = validate(item, IdeaResult) if isinstance(item, dict) else None
+            except StructuredOutputError:
+                idea = None
+            if idea is not None:
+                candidates.append({"idea_title": idea.idea_title, "description": idea.description})
+        if not candidates:
+            raise PipelineError("The Ideation Agent returned no usable candidate ideas.")
+    logger.info(f"Received {len(candidates)} candidate ideas: {'; '.join(idea['idea_title'] for idea in candidates)}")
+    return candidates
+
+def run_speculative_ideation(client, topic, count=1):
+    """
+    Generate IDEA_CANDIDATES ideas in one call and return the best count of them.
+
+    The candidates are embedded in one batch. Candidates that duplicate a
+    stored idea are dropped, and the rest are ranked by novelty (distance
+    to the closest stored idea) and diversity (distance to the candidates
+    already picked), so the ideas returned are new and unlike each other.
+    If every candidate is a duplicate, a new set is requested up to
+    IDEA_MAX_REGENERATIONS times, after which the run is rejected.
+
+    Returns:
+        list: Up to count idea dicts, best first, each with the 'embedding'
+        of its description so saving it does not embed it again.
+    """
+    rejected_titles = []
+    for attempt in range(IDEA_MAX_REGENERATIONS + 1):
+        candidates = run_ideation_candidates(client, topic, max(IDEA_CANDIDATES, count), rejected_titles)
+        embeddings = generate_embeddings([idea["description"] for idea in candidates])
+        idea_index.sync(lambda last_id, limit: fetch_embeddings_since("ideation", last_id, limit))
+        fresh, vectors, novelty = [], [], []
+        for idea, embedding in zip(candidates, embeddings):
+            if not embedding:
+                logger.warning(f"Could not embed candidate idea '{idea['idea_title']}'; skipping it.")
+                continue
+            matches = idea_index.search(embedding, k=1)
+            similarity = matches[0][1] if matches else 0.0
+            if similarity >= IDEA_SIMILARITY_THRESHOLD:
+                logger.warning(f"Candidate idea '{idea['idea_title']}' duplicates stored idea {matches[0][0]} (similarity {similarity:.3f}).")
+                rejected_titles.append(idea["idea_title"])
+                continue
+            fresh.append(dict(idea, embedding=embedding))
+            vectors.append(embedding)
+            novelty.append(1.0 - similarity)
+        if fresh:
+            picked = [fresh[index] for index in select_diverse(vectors, novelty, count)]
+            annotate_span(candidates=len(candidates), fresh_candidates=len(fresh))
+            logger.info(f"Selected ideas: {'; '.join(idea['idea_title'] for idea in picked)}")
+            return picked
+        if not embeddings or not any(embeddings):
+            raise PipelineError("Failed to generate embeddings for the candidate ideas.")
+    raise PipelineError(f"Rejected topic after {IDEA_MAX_REGENERATIONS + 1} sets of duplicate ideas.")
+
+def run_unique_ideation(client, topic):
+    """
+    Generate an idea that is not a near-duplicate of a stored idea.
+
+    With IDEA_CANDIDATES above 1 the best of several candidates from one
+    call is used (see run_speculative_ideation). Otherwise each idea is
+    embedded and checked against the idea index before any research or
+    writing is paid for. Duplicates are regenerated up to
+    IDEA_MAX_REGENERATIONS times, after which the run is rejected.
+
+    Returns:
+        dict: The idea, with the 'embedding' of its description.
+    """
+    if IDEA_CANDIDATES > 1:
+        return run_speculative_ideation(client, topic)[0]
+    rejected_titles = []
+    for attempt in range(IDEA_MAX_REGENERATIONS + 1):
+        idea = run_ideation(client, topic, rejected_titles)
+        embedding = generate_embedding(idea["description"])
+        if not embedding:
+            raise PipelineError("Failed to generate embedding for the idea.")
+        duplicate = find_duplicate_idea(embedding)
+        if duplicate is None:
+            return dict(idea, embedding=embedding)
+        logger.warning(f"Idea '{idea['idea_title']}' duplicates stored idea {duplicate[0]} (similarity {duplicate[1]:.3f}).")
+        rejected_titles.append(idea["idea_title"])
+    raise PipelineError(f"Rejected topic after {IDEA_MAX_REGENERATIONS + 1} duplicate ideas.")
+
+def save_idea(idea, write_queue=None):
+    """
+    Save the idea with the embedding of its description, returning its database ID.
+
+    The embedding made for the duplicate check is reused when the idea
+    carries one; otherwise the description is embedded here. With a
+    write_queue the insert is queued and a PendingId is returned instead.
+    """
+    embedding = idea.get("embedding")
+    if not embedding:
+        logger.info("Generating embedding for the idea description...")
+        embedding = generate_embedding(idea["description"])
+        if not embedding:
+            raise PipelineError("Failed to generate embedding for the idea.")
+        logger.info("Embedding generated successfully.")
+    if write_queue is not None:
+        idea_id = queue_idea_with_embedding(write_queue, idea["idea_title"], idea["description"], embedding)
+        idea_id.add_done_callback(lambda row_id: idea_index.add([row_id], [embedding]))
+        idea_id.add_done_callback(lambda row_id: logger.info(f"Idea saved with ID: {row_id}"))
+        return idea_id
+
+    logger.info("Saving idea to database...")
+    idea_rows = insert_idea_with_embedding(idea["idea_title"], idea["description"], embedding)
+    if not idea_rows:
+        raise PipelineError("Failed to save idea to the database.")
+    # The ideation insert returns the inserted rows rather than the ID
+    idea_id = idea_rows[0].get("id")
+    idea_index.add([idea_id], [embedding])
+    logger.info(f"Idea saved with ID: {idea_id}")
+    return idea_id
+
+def _age_days(row):
+    """Days since a stored row was created, or None if it has no parseable date_created."""
+    try:
+        created = datetime.fromisoformat(str(row["date_created"]).replace("Z", "+00:00"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - created).total_seconds() / 86400
+
+def find_similar_research(idea_title):
+    """
+    Find stored research similar enough to the idea title to build on.
+
+    Returns:
+        list: Research rows, most similar first, each with its 'similarity'
+        and 'age_days' added. Empty if nothing reaches RESEARCH_AUGMENT_THRESHOLD.
+    """
+    embedding = generate_embedding(idea_title)
+    if not embedding:
+        return []
+    research_index.sync(lambda last_id, limit: fetch_embeddings_since("research", last_id, limit))
+    matches = [
+        (research_id, similarity)
+        for research_id, similarity in research_index.search(embedding, k=RESEARCH_REUSE_CANDIDATES)
+        if similarity >= RESEARCH_AUGMENT_THRESHOLD
+    ]
+    rows = {row["id"]: row for row in fetch_rows("research", [research_id for research_id, _ in matches])}
+    return [
+        dict(rows[research_id], similarity=similarity, age_days=_age_days(rows[research_id]))
+        for research_id, similarity in matches
+        if research_id in rows
+    ]
+
+def _is_fresh(row):
+    if not RESEARCH_REUSE_MAX_AGE_DAYS:
+        return True
+    return row["age_days"] is not None and row["age_days"] <= RESEARCH_REUSE_MAX_AGE_DAYS
+
+def run_research(client, idea_title):
+    """
+    Research the idea, building on stored research when it is close enough.
+
+    A fresh stored research row at least RESEARCH_REUSE_THRESHOLD similar to
+    the idea title is reused without any LLM or SerpAPI call. Weaker (or
+    stale) matches above RESEARCH_AUGMENT_THRESHOLD are adapted to the idea
+    by the Research Synthesis Agent without a web search. Otherwise the Research Agent
+    searches the web.
+
+    Returns:
+        dict: The research, with 'source' ('reused', 'augmented' or 'web'),
+        'reused_research_ids' and 'reused_age_days' (age of the oldest reused
+        row in days, None if unknown) recording where it came from.
+    """
+    matches = find_similar_research(idea_title) if RESEARCH_REUSE_ENABLED else []
+    if not matches:
+        research = _research_from_web(client, idea_title)
+        research.update(source="web", reused_research_ids=[], reused_age_days=None)
+        annotate_span(research_source="web")
+        return research
+
+    best = matches[0]
+    if best["similarity"] >= RESEARCH_REUSE_THRESHOLD and _is_fresh(best):
+        logger.info(f"Reusing stored research {best['id']} (similarity {best['similarity']:.3f}, age {best['age_days']} days).")
+        research = {
+            "research_title": best["research_title"],
+            "research_text": best["research_text"],
+            "references": best.get("references_urls") or "",
+        }
+        used = [best]
+        source = "reused"
+    else:
+        research = _research_from_stored(client, idea_title, matches)
+        used = matches
+        source = "augmented"
+
+    ages = [row["age_days"] for row in used]
+    research.update(
+        source=source,
+        reused_research_ids=[row["id"] for row in used],
+        reused_age_days=None if None in ages else max(ages)
+    )
+    annotate_span(research_source=source, reused_research_ids=research["reused_research_ids"], reused_age_days=research["reused_age_days"])
+    return research
+
+def _research_from_stored(client, idea_title, matches):
+    """Ask the Research Synthesis Agent to adapt stored research to the idea without searching the web."""
+    logger.info(f"Adapting {len(matches)} stored research entries with the Research Synthesis Agent...")
+    stored = "\n\n".join(
+        f"Title: {row['research_title']}\nCollected: {row.get('date_created') or 'unknown'}\n"
+        f"Content: {row['research_text']}\nReferences: {row.get('references_urls') or ''}"
+        for row in matches
+    )
+    messages = [
+        {"role": "system", "content": f"Research the following idea: {idea_title}"},
+        {"role": "user", "content": f"Stored research on closely related ideas:\n\n{stored}"}
+    ]
+    context_variables = {"idea_title": idea_title}
+    research_response = client.run(
+        agent=research_synthesis_agent,
+        messages=messages,
+        context_variables=context_variables
+    )
+    with discard_on_failure(client, research_synthesis_agent, messages, context_variables):
+        return _parse_research(client, research_response, research_synthesis_agent.name)
+
+def _research_from_web(client, idea_title):
+    """Ask the Research Agent to research the idea on the web and return its parsed findings."""
+    logger.info("Starting conversation with Research Agent...")
+    messages = [
+        {"role": "system", "content": f"Research the following idea: {idea_title}"}
+    ]
+    context_variables = {"idea_title": idea_title}
+    research_response = client.run(
+        agent=research_agent,
+        messages=messages,
+        context_variables=context_variables
+    )
+    with discard_on_failure(client, research_agent, messages, context_variables):
+        return _parse_research(client, research_response, research_agent.name)
+
+def _parse_research(client, research_response, agent_name):
+    """Parse a research agent's final message into the research dict."""
+    logger.info(f"Processing {agent_name} response...")
+    research_message = research_response.messages[-1]["content"]
+    logger.info(f"Raw {agent_name} response: {research_message}")  # Log the raw response
+    research_data = parse_agent_output(client, research_message, ResearchResult, agent_name)
+    research_title = research_data.research_title
+    research_text = research_data.research_description
+    references = research_data.references
+
+    logger.info(f"Research Title: {research_title}")
+    logger.info(f"Research Text: {research_text}")
+    logger.info(f"References: {references}")
+    return {"research_title": research_title, "research_text": research_text, "references": references}
+
+def save_chunks(parent_table, parent_id, chunks, write_queue=None):
+    """Store the chunk embeddings of a saved row when CHUNK_EMBEDDINGS is enabled; failures are only logged."""
+    if not CHUNK_EMBEDDINGS or not chunks:
+        return
+    if write_queue is not None:
+        queue_chunks(write_queue, parent_table, parent_id, chunks)
+    else:
+        insert_chunks(parent_table, parent_id, chunks)
+
+def save_research(research, idea_id, write_queue=None):
+    """
+    Embed the research and save it linked to the idea, returning its database ID.
+
+    With a write_queue the insert is queued and a PendingId is returned instead.
+    Research reused unchanged from a stored row is not saved again; the ID
+    of that row is returned.
+    """
+    if research.get("source") == "reused":
+        research_id = research["reused_research_ids"][0]
+        logger.info(f"Research reused from ID {research_id}; not saving a copy.")
+        return research_id
+
+    logger.info("Saving research data to database...")
+    embedding, chunks = embed_document(f"{research['research_title']} {research['research_text']}")
+    if not embedding:
+        raise PipelineError("Failed to generate embedding for research data.")
+
+    if write_queue is not None:
+        research_id = queue_research_with_embedding(
+            write_queue, research["research_title"], research["research_text"], research["references"], embedding, idea_id
         )
+        research_id.add_done_callback(lambda row_id: research_index.add([row_id], [embedding]))
+        research_id.add_done_callback(lambda row_id: logger.info(f"Research saved with ID: {row_id}"))
+        save_chunks("research", research_id, chunks, write_queue)
+        return research_id
 
-        # Parse research response
-        logger.info("Processing Research Agent response...")
-        research_message = research_response.messages[-1]["content"]
-        logger.info(f"Raw Research Agent response: {research_message}")  # Log the raw response
-        try:
-            # Clean and parse JSON response
-            cleaned_response = clean_json_response(research_message)
-            research_data = json.loads(cleaned_response)
-            research_title = research_data.get("research_title")
-            research_text = research_data.get("research_description")
-            references = research_data.get("references")
-
-            if not (research_title and research_text):
-                logger.error("Failed to extract research details from the Research Agent response.")
-                return
-
-            logger.info(f"Research Title: {research_title}")
-            logger.info(f"Research Text: {research_text}")
-            logger.info(f"References: {references}")
-
-            # Save research data to the database
-            logger.info("Saving research data to database...")
-            embedding = generate_embedding(f"{research_title} {research_text}")
-            if embedding:
-                research_id = insert_research_with_embedding(research_title, research_text, references, embedding, idea_id)
-                if research_id:
-                    logger.info(f"Research saved with ID: {research_id}")
-                    
-                    # Now we can proceed with the Writer Agent
-                    logger.info("Starting conversation with Writer Agent...")
-                    writer_response = client.run(
-                        agent=writer_agent,
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": f"Using this research data:\nTitle: {research_title}\n\nContent: {research_text}\n\nReferences: {references}\n\nCreate a comprehensive article."
-                            }
-                        ],
-                        context_variables={
-                            "ideation_id": idea_id,
-                            "research_id": research_id
-                        }
-                    )
-                else:
-                    logger.error("Failed to save research to the database.")
-                    return
-            else:
-                logger.error("Failed to generate embedding for research data.")
-                return
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from Research Agent response: {str(e)}")
-
-        # Step 3: Writer Agent
-        logger.info("Starting conversation with Writer Agent...")
-        writer_response = client.run(
-            agent=writer_agent,
-            messages=[
-                {
-                    "role": "system", 
-                    "content": f"Using this research data:\nTitle: {research_title}\n\nContent: {research_text}\n\nReferences: {references}\n\nCreate a comprehensive article."
-                }
-            ],
-            context_variables={
-                "ideation_id": idea_id,
-                "research_id": research_id
+    research_id = insert_research_with_embedding(
+        research["research_title"], research["research_text"], research["references"], embedding, idea_id
+    )
+    if not research_id:
+        raise PipelineError("Failed to save research to the database.")
+    research_index.add([research_id], [embedding])
+    logger.info(f"Research saved with ID: {research_id}")
+    save_chunks("research", research_id, chunks)
+    return research_id
+
+def _run_streaming(client, on_text, field, **run_kwargs):
+    """
+    Run an agent with streaming and report the growing value of one JSON string field.
+
+    Args:
+        client (Swarm): The Swarm client.
+        on_text (callable): Called with the decoded field text so far whenever it grows.
+        field (str): Name of the string field in the agent's JSON output.
+        **run_kwargs: Arguments for client.run.
+
+    Returns:
+        Response: The final Swarm response, as client.run would return it without streaming.
+    """
+    parser = PartialStringField(field)
+    for chunk in client.run(stream=True, **run_kwargs):
+        if "response" in chunk:
+            return chunk["response"]
+        if chunk.get("delim") == "start":
+            # Each model turn starts a new message; only the last one holds the article
+            parser = PartialStringField(field)
+        elif chunk.get("content") and parser.feed(chunk["content"]):
+            on_text(parser.value)
+    raise PipelineError("Streaming run ended without a final response.")
+
+def compact_for_writer(research, idea):
+    """Fit the research into the writer prompt's token budget; the stored research stays whole."""
+    compacted = compact_research(
+        research["research_text"], research["references"], f"{idea['idea_title']} {idea['description']}"
+    )
+    annotate_span(original_tokens=compacted["original_tokens"], compacted_tokens=compacted["tokens"])
+    return dict(research, research_text=compacted["research_text"], references=compacted["references"])
+
+def run_writer(client, research, idea_id, research_id, on_article_delta=None):
+    """
+    Ask the Writer Agent for an article based on the research and return its parsed output.
+
+    If on_article_delta is given the completion is streamed, and the callback
+    receives the article text decoded so far as it grows.
+    """
+    logger.info("Starting conversation with Writer Agent...")
+    run = client.run if on_article_delta is None else partial(_run_streaming, client, on_article_delta, "article_text")
+    messages = [
+        {
+            "role": "system", 
+            "content": f"Using this research data:\nTitle: {research['research_title']}\n\nContent: {research['research_text']}\n\nReferences: {research['references']}\n\nCreate a comprehensive article."
+        }
+    ]
+    context_variables = {
+        "ideation_id": idea_id,
+        "research_id": research_id
+    }
+    writer_response = run(
+        agent=writer_agent,
+        messages=messages,
+        context_variables=context_variables
+    )
+
+    # Parse writer response
+    logger.info("Processing Writer Agent response...")
+    writer_message = writer_response.messages[-1]["content"]
+    logger.info("Raw Writer Agent response:")
+    logger.info("----------------------------------------")
+    logger.info(writer_message)
+    logger.info("----------------------------------------")
+    with discard_on_failure(client, writer_agent, messages, context_variables):
+        article_data = parse_agent_output(client, writer_message, ArticleResult, "Writer Agent")
+    article_title = article_data.article_title
+    article_text = article_data.article_text
+
+    logger.info(f"Article created: {article_title}")
+    return {"article_title": article_title, "article_text": article_text}
+
+def run_editor(client, article):
+    """
+    Check the article locally and have the Editor Agent patch the sections that fail.
+
+    The local checks cost nothing, so an article that passes them never
+    reaches the model. Otherwise the editor is sent the failed checks and
+    returns replacement sections, not a rewrite, for at most
+    EDITOR_MAX_ROUNDS rounds. Issues left after the last round, or an
+    editor reply that cannot be parsed, are logged and the article is kept
+    as it is; editing never fails the pipeline.
+    """
+    article_text = article["article_text"]
+    issues = check_article(article_text)
+    rounds = 0
+    while issues and rounds < EDITOR_MAX_ROUNDS:
+        rounds += 1
+        logger.info(f"Article failed {len(issues)} checks; asking the Editor Agent for patches (round {rounds})...")
+        problems = "\n".join(f"- [{issue['section'] or 'whole article'}] {issue['message']}" for issue in issues)
+        messages = [
+            {
+                "role": "system",
+                "content": f"Problems found:\n{problems}\n\nArticle:\n{article_text}"
             }
+        ]
+        editor_response = client.run(
+            agent=editor_agent,
+            messages=messages
         )
-
-        # Parse writer response
-        logger.info("Processing Writer Agent response...")
-        writer_message = writer_response.messages[-1]["content"]
-        logger.info("Raw Writer Agent response:")
-        logger.info("----------------------------------------")
-        logger.info(writer_message)
-        logger.info("----------------------------------------")
-        logger.info("Attempting to clean response...")
         try:
-            cleaned_response = clean_json_response(writer_message)
-            article_data = json.loads(cleaned_response)
-            article_title = article_data.get("article_title")
-            article_text = article_data.get("article_text")
-
-            if not (article_title and article_text):
-                logger.error("Failed to extract article details from Writer Agent response.")
-                return None
-
-            logger.info(f"Article created: {article_title}")
-            
-            # Save article to database
-            logger.info("Saving article to database...")
-            embedding = generate_embedding(article_text)
-            if embedding:
-                insert_article_with_embedding(article_text, embedding, idea_id, research_id)
-                logger.info("Article saved successfully.")
-                # Return the article data
-                return {
-                    "article_title": article_title,
-                    "article_text": article_text,
-                    "idea_title": idea_title,
-                    "research_title": research_title,
-                    "references": references
-                }
+            with discard_on_failure(client, editor_agent, messages):
+                patches = loads_tolerant(editor_response.messages[-1]["content"]).get("patches") or []
+        except StructuredOutputError as e:
+            logger.warning(f"Could not parse the Editor Agent response ({str(e)}); keeping the article as it is.")
+            break
+        article_text, applied = apply_patches(article_text, [patch for patch in patches if isinstance(patch, dict)])
+        if not applied:
+            logger.warning("The Editor Agent returned no usable patches; keeping the article as it is.")
+            break
+        issues = check_article(article_text)
+
+    annotate_span(editor_rounds=rounds, remaining_issues=len(issues))
+    if issues:
+        logger.warning(f"Article still fails {len(issues)} checks: " + "; ".join(issue["message"] for issue in issues))
+    else:
+        logger.info(f"Article passed the editor checks after {rounds} revision rounds.")
+    return dict(article, article_text=article_text)
+
+def save_article(article, idea_id, research_id, write_queue=None):
+    """
+    Embed the article and save it linked to its idea and research, returning its database ID.
+
+    With a write_queue the insert is queued and a PendingId is returned instead.
+    """
+    logger.info("Saving article to database...")
+    embedding, chunks = embed_document(article["article_text"])
+    if not embedding:
+        raise PipelineError("Failed to generate embedding for article.")
+
+    if write_queue is not None:
+        article_id = queue_article_with_embedding(write_queue, article["article_text"], embedding, idea_id, research_id)
+        article_id.add_done_callback(lambda row_id: logger.info("Article saved successfully."))
+        save_chunks("writer", article_id, chunks, write_queue)
+        return article_id
+
+    article_id = insert_article_with_embedding(article["article_text"], embedding, idea_id, research_id)
+    if not article_id:
+        raise PipelineError("Failed to save article to the database.")
+    logger.info("Article saved successfully.")
+    save_chunks("writer", article_id, chunks)
+    return article_id
+
+def _deferred_id(future, table):
+    """PendingId for the row ID a save stage's future will hold, whether that stage returns an ID or a PendingId."""
+    pending = PendingId(table)
+
+    def settle(done):
+        if done.exception() is not None:
+            pending.future.set_exception(done.exception())
+        elif isinstance(done.result(), PendingId):
+            done.result().future.add_done_callback(settle)
+        else:
+            pending.future.set_result(done.result())
+
+    future.add_done_callback(settle)
+    return pending
+
+def run_pipeline(topic, run_id=None, resume=False, write_queue=None, on_article_delta=None, idea=None):
+    """
+    Run the ideation -> research -> writer -> editor pipeline for a single topic.
+
+    Every stage's output and database IDs are checkpointed under the run id
+    as soon as they exist. Resuming a run skips the stages it already
+    completed, so a failed run does not pay again for earlier LLM,
+    SerpAPI and embedding calls, and the writer never runs twice.
+
+    Stages run as a dependency graph (agents.orchestration_agent.Dag). The
+    LLM stages run in order on the calling thread. Embedding and saving each
+    result overlaps the next LLM stage. A failed LLM stage is retried up to
+    PIPELINE_STAGE_RETRIES times. A stage that still fails cancels every
+    stage that has not started.
+
+    Progress is published on utils.events.progress_events under the run id:
+    every stage reports when it starts, completes or fails, and the writer
+    stage streams its partial article as PARTIAL_OUTPUT events whenever the
+    run has subscribers.
+
+    Args:
+        topic (str): The article topic. May be None when resuming a run.
+        run_id (str): Run id to checkpoint under. A new one is generated if omitted.
+        resume (bool): Reuse completed stages from the run's existing checkpoint.
+            Without a topic, the run must have a checkpoint.
+        write_queue (WriteBehindQueue): Queue database inserts instead of writing
+            them inline. The LLM stages then never wait on the database; the run
+            only waits for its own inserts before returning.
+        on_article_delta (callable): Stream the writer completion and call this
+            with the partial article text as it arrives.
+        idea (dict): An idea already chosen (e.g. by run_fanout), used as the
+            ideation stage's output instead of asking the Ideation Agent.
+
+    Returns:
+        dict: The generated article data.
+
+    Raises:
+        PipelineError: If a stage fails to produce usable output, or a run
+            resumed without a topic has no checkpoint.
+    """
+    run_id = run_id or new_run_id()
+    checkpoint = get_checkpoint_store().load(run_id) if resume else None
+    if resume and not checkpoint and not topic:
+        raise PipelineError(f"No checkpoint found for run {run_id}; check the run id or pass a topic.")
+    if checkpoint:
+        topic = topic or checkpoint["topic"]
+        logger.info(f"Resuming run {run_id}; completed stages: {', '.join(checkpoint['stages']) or 'none'}")
+    stages = checkpoint["stages"] if checkpoint else {}
+
+    def stage(name, func, deps=(), **options):
+        """Declare a checkpointed stage: skipped when the run already completed it, checkpointed when it completes."""
+        def run(**inputs):
+            if name in stages:
+                logger.info(f"Skipping stage '{name}' already completed in run {run_id}.")
+                progress_events.publish(STAGE_COMPLETED, run_id, name, skipped=True)
+                return stages[name]
+            progress_events.publish(STAGE_STARTED, run_id, name)
+            with span(name, run_id=run_id):
+                result = func(**inputs)
+            if isinstance(result, PendingId):
+                # Checkpoint queued inserts once their real ID is known
+                result.add_done_callback(lambda row_id: get_checkpoint_store().save_stage(run_id, topic, name, row_id))
+                result.add_done_callback(lambda row_id: progress_events.publish(STAGE_COMPLETED, run_id, name, skipped=False))
             else:
-                logger.error("Failed to generate embedding for article.")
-                return None
+                stages[name] = result
+                get_checkpoint_store().save_stage(run_id, topic, name, result)
+                progress_events.publish(STAGE_COMPLETED, run_id, name, skipped=False)
+            return result
+        return Stage(name, run, tuple(deps), **options)
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from Writer Agent response: {str(e)}")
-            return None
-            
+    def publish_article_delta(article_text):
+        progress_events.publish(PARTIAL_OUTPUT, run_id, "writer", text=article_text)
+        if on_article_delta is not None:
+            on_article_delta(article_text)
+
+    client = create_client()
+    stream = on_article_delta is not None or progress_events.has_subscribers(run_id)
+    llm = {"inline": True, "retries": PIPELINE_STAGE_RETRIES}
+
+    # The LLM stages run in order on this thread; embedding and saving each
+    # result runs in the background alongside the next LLM stage
+    stages_to_run = [
+        stage("ideation", lambda: idea or run_unique_ideation(client, topic), **llm),
+        stage("idea_saved", lambda ideation: save_idea(ideation, write_queue), deps=["ideation"]),
+        stage("research", lambda ideation: run_research(client, ideation["idea_title"]), deps=["ideation"], **llm),
+        stage(
+            "research_saved", lambda research, idea_saved: save_research(research, idea_saved, write_queue),
+            deps=["research", "idea_saved"]
+        ),
+        stage("compaction", lambda ideation, research: compact_for_writer(research, ideation), deps=["ideation", "research"], inline=True),
+        # The writer only needs the saved IDs if its tool uses them, so it does not wait for the saves
+        stage(
+            "writer", lambda compaction: run_writer(
+                client, compaction, _deferred_id(dag.future("idea_saved"), "ideation"),
+                _deferred_id(dag.future("research_saved"), "research"), publish_article_delta if stream else None
+            ),
+            deps=["compaction"], **llm
+        ),
+    ]
+    if EDITOR_ENABLED:
+        stages_to_run.append(stage("editing", lambda writer: run_editor(client, writer), deps=["writer"], **llm))
+    final = "editing" if EDITOR_ENABLED else "writer"
+    stages_to_run.append(stage(
+        "article_saved",
+        lambda idea_saved, research_saved, **article: save_article(article[final], idea_saved, research_saved, write_queue),
+        deps=[final, "idea_saved", "research_saved"]
+    ))
+    dag = Dag(stages_to_run)
+    try:
+        results = dag.run()
+    except Exception as e:
+        progress_events.publish(ERROR, run_id, dag.failed, error=str(e))
+        raise
+    try:
+        resolve_id(results["article_saved"])
+    except Exception as e:
+        raise PipelineError(f"Failed to save article to the database: {str(e)}")
+
+    research, article = results["research"], results[final]
+    return {
+        "run_id": run_id,
+        "article_title": article["article_title"],
+        "article_text": article["article_text"],
+        "idea_title": results["ideation"]["idea_title"],
+        "research_title": research["research_title"],
+        "references": results["compaction"]["references"]
+    }
+
+def main(topic, run_id=None, resume=False, on_article_delta=None):
+    try:
+        return run_pipeline(topic, run_id=run_id, resume=resume, on_article_delta=on_article_delta)
+    except PipelineError as e:
+        logger.error(str(e))
+        return None
     except Exception as e:
         logger.error(f"An error occurred during execution: {str(e)}", exc_info=True)
         return None
 
+def _run_topic(topic, write_queue=None, run_id=None, resume=False, idea=None):
+    """Run one topic of a batch and wrap its outcome in a result object."""
+    started = time.monotonic()
+    run_id = run_id or new_run_id()
+    try:
+        article = run_pipeline(topic, run_id=run_id, resume=resume, write_queue=write_queue, idea=idea)
+        error = None
+    except Exception as e:
+        logger.error(f"Pipeline failed for topic '{topic}': {str(e)}")
+        article = None
+        error = f"{type(e).__name__}: {str(e)}"
+    return {
+        "topic": topic,
+        "run_id": run_id,
+        "article": article,
+        "error": error,
+        "elapsed": time.monotonic() - started
+    }
+
+def run_batch(topics, max_concurrency=BATCH_CONCURRENCY, write_behind=True):
+    """
+    Run the pipeline for many topics concurrently on a bounded worker pool.
+
+    The stages are dominated by blocking OpenAI, SerpAPI and Supabase calls,
+    so threads overlap that network wait without changing the per-topic code.
+
+    Args:
+        topics (list): The article topics.
+        max_concurrency (int): Maximum number of pipelines in flight at once.
+        write_behind (bool): Batch database inserts across topics through a
+            shared WriteBehindQueue instead of one round-trip per row.
+
+    Returns:
+        list: One result dict per topic, in input order, with 'topic', 'run_id'
+        (resumable with run_pipeline), 'article' (None on failure), 'error'
+        (None on success) and 'elapsed'.
+    """
+    topics = list(topics)
+    if not topics:
+        return []
+    logger.info(f"Starting batch of {len(topics)} topics with concurrency {max_concurrency}...")
+    write_queue = WriteBehindQueue(insert_rows) if write_behind else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(topics)))) as executor:
+            results = list(executor.map(lambda topic: _run_topic(topic, write_queue), topics))
+    finally:
+        if write_queue is not None:
+            write_queue.close()
+    failed = sum(1 for result in results if result["error"])
+    logger.info(f"Batch finished: {len(results) - failed} succeeded, {failed} failed.")
+    return results
+
+def run_fanout(topic, count=IDEA_FANOUT, write_behind=True):
+    """
+    Write up to count articles on one topic from a single ideation call.
+
+    The top candidates of run_speculative_ideation, which are new and unlike
+    each other, each get their own pipeline run, and the runs go in parallel.
+
+    Returns:
+        list: One result dict per idea, as returned by run_batch, best idea first.
+    """
+    client = create_client()
+    with span("ideation"):
+        ideas = run_speculative_ideation(client, topic, count)
+    logger.info(f"Fanning out {len(ideas)} ideas for topic '{topic}'...")
+    write_queue = WriteBehindQueue(insert_rows) if write_behind else None
+    try:
+        with ThreadPoolExecutor(max_workers=len(ideas)) as executor:
+            results = list(executor.map(lambda idea: _run_topic(topic, write_queue, idea=idea), ideas))
+    finally:
+        if write_queue is not None:
+            write_queue.close()
+    failed = sum(1 for result in results if result["error"])
+    logger.info(f"Fan-out finished: {len(results) - failed} succeeded, {failed} failed.")
+    return results
+
+def topic_key(record):
+    """Key identifying a batch input record across restarts: its id, request_id, or the topic itself."""
+    return str(record.get("id") or record.get("request_id") or record.get("topic") or record.get("title"))
+
+def iter_topic_records(path):
+    """
+    Stream topic records from a JSONL file.
+
+    Each line is a JSON object with a 'topic' (or, failing that, 'title').
+    Blank lines are skipped; malformed lines are logged and skipped.
+
+    Yields:
+        dict: The record, with 'topic' filled in.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f"Skipping malformed line {line_number} of {path}: {str(e)}")
+                continue
+            topic = record.get("topic") or record.get("title")
+            if not topic:
+                logger.error(f"Skipping line {line_number} of {path}: no 'topic' or 'title'.")
+                continue
+            yield dict(record, topic=topic)
+
+def load_batch_output(path):
+    """
+    Read the results already written to a batch output file.
+
+    Returns:
+        tuple: (set of keys that succeeded, dict of run_id by key for keys whose last attempt failed).
+    """
+    done, failed = set(), {}
+    if not os.path.exists(path):
+        return done, failed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; its topic is simply run again
+                continue
+            if result.get("error") is None:
+                done.add(result["key"])
+                failed.pop(result["key"], None)
+            else:
+                failed[result["key"]] = result.get("run_id")
+    return done, failed
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def run_batch_file(input_path, output_path, workers=BATCH_CONCURRENCY, processes=False):
+    """
+    Run every topic of a JSONL file through the pipeline, appending results to a JSONL file.
+
+    Topics are streamed from the input and at most 2 * workers are in flight,
+    so inputs of any size run in bounded memory. Each result is written and
+    flushed as soon as it finishes. On restart, keys that already succeeded
+    in the output are skipped and failed ones resume from their checkpoint.
+
+    Args:
+        input_path (str): JSONL file of topic records (see iter_topic_records).
+        output_path (str): JSONL file results are appended to. Each line holds
+            'key', 'topic', 'run_id', 'article', 'error' and 'elapsed'.
+        workers (int): Number of topics processed concurrently.
+        processes (bool): Use a process pool with inline database writes
+            instead of threads sharing a write-behind queue.
+
+    Returns:
+        dict: Counts of 'succeeded', 'failed' and 'skipped' topics.
+    """
+    done, failed_runs = load_batch_output(output_path)
+    total = len({topic_key(record) for record in iter_topic_records(input_path)} - done)
+    logger.info(f"Batch of {total} topics from {input_path} ({len(done)} already done) with {workers} {'processes' if processes else 'threads'}...")
+
+    write_queue = None if processes else WriteBehindQueue(insert_rows)
+    executor = ProcessPoolExecutor(max_workers=workers) if processes else ThreadPoolExecutor(max_workers=workers)
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+    started = time.monotonic()
+    in_flight = {}
+
+    def collect(futures, out):
+        for future in futures:
+            record = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # Only reached if the worker itself died, e.g. a killed process
+                result = {"topic": record["topic"], "run_id": None, "article": None, "error": f"{type(e).__name__}: {str(e)}", "elapsed": None}
+            out.write(json.dumps(dict(result, key=topic_key(record)), default=str) + "\n")
+            out.flush()
+            counts["failed" if result["error"] else "succeeded"] += 1
+            finished = counts["succeeded"] + counts["failed"]
+            elapsed = time.monotonic() - started
+            rate = finished / elapsed if elapsed else 0
+            eta = _format_duration((total - finished) / rate) if rate else "unknown"
+            logger.info(f"Batch progress: {finished}/{total} ({counts['failed']} failed), {60 * rate:.2f} topics/min, ETA {eta}")
+
+    try:
+        with open(output_path, "a", encoding="utf-8") as out, executor:
+            for record in iter_topic_records(input_path):
+                key = topic_key(record)
+                if key in done:
+                    counts["skipped"] += 1
+                    continue
+                # Duplicate keys in the input run once
+                done.add(key)
+                run_id = failed_runs.get(key)
+                in_flight[executor.submit(_run_topic, record["topic"], write_queue, run_id, run_id is not None)] = record
+                if len(in_flight) >= 2 * workers:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished, out)
+            collect(list(in_flight), out)
+    finally:
+        if write_queue is not None:
+            write_queue.close()
+    logger.info(f"Batch finished in {_format_duration(time.monotonic() - started)}: {counts['succeeded']} succeeded, {counts['failed']} failed, {counts['skipped']} skipped.")
+    return counts
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate articles for one topic or a JSONL batch of topics.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--topic", help="Generate one article on this topic.")
+    source.add_argument("--batch", metavar="INPUT_JSONL", help="JSONL file with one {\"topic\": ...} object per line.")
+    source.add_argument("--resume", metavar="RUN_ID", help="Resume a failed single-topic run.")
+    parser.add_argument("--out", help="Batch results JSONL, appended to (default: <input>.results.jsonl).")
+    parser.add_argument("--workers", type=int, default=BATCH_CONCURRENCY, help="Topics processed concurrently.")
+    parser.add_argument("--processes", action="store_true", help="Run batch topics in worker processes instead of threads.")
+    parser.add_argument("--fanout", type=int, metavar="K", help="With --topic, write articles for the K best of IDEA_CANDIDATES ideas.")
+    args = parser.parse_args()
+
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    if args.batch:
+        output_path = args.out or f"{os.path.splitext(args.batch)[0]}.results.jsonl"
+        counts = run_batch_file(args.batch, output_path, workers=max(1, args.workers), processes=args.processes)
+        raise SystemExit(1 if counts["failed"] else 0)
+    if args.fanout and args.topic:
+        try:
+            results = run_fanout(args.topic, count=max(1, args.fanout))
+        except PipelineError as e:
+            logger.error(str(e))
+            raise SystemExit(1)
+        for result in results:
+            if result["article"]:
+                print(f"# {result['article']['article_title']}\n\n{result['article']['article_text']}\n")
+        raise SystemExit(0 if all(result["article"] for result in results) else 1)
+    result = main(args.topic, run_id=args.resume, resume=bool(args.resume))
+    if result:
+        print(f"# {result['article_title']}\n\n{result['article_text']}")
+    raise SystemExit(0 if result else 1)
@@ -1,49 +1,96 @@
 import streamlit as st
 import sys
 import io
+from collections import deque
 from contextlib import redirect_stdout
+from functools import partial
 import json
+import threading
 import time
 import main
 import logging
 from datetime import datetime
+from utils.checkpoint import new_run_id
+from utils.events import progress_events, STAGE_STARTED, STAGE_COMPLETED, PARTIAL_OUTPUT, ERROR
+
+# Minimum seconds between re-renders of a streaming article
+STREAM_RENDER_INTERVAL = 0.25
+
+# Minimum seconds between re-renders of the log panel
+LOG_RENDER_INTERVAL = 0.5
+
+# Number of most recent log lines kept and shown
+LOG_BUFFER_LINES = 500
+
+# Status box updates for pipeline progress events, keyed by (event kind, stage)
+STAGE_STATUS = {
+    (STAGE_STARTED, "ideation"): ("ideation_status", "info", "🤔 Generating Ideas..."),
+    (STAGE_COMPLETED, "idea_saved"): ("ideation_status", "success", "✅ Ideation Complete"),
+    (STAGE_STARTED, "research"): ("research_status", "info", "🔍 Conducting Research..."),
+    (STAGE_COMPLETED, "research_saved"): ("research_status", "success", "✅ Research Complete"),
+    (STAGE_STARTED, "writer"): ("writing_status", "info", "✍️ Writing Article..."),
+    (STAGE_STARTED, "editing"): ("writing_status", "info", "📝 Editing Article..."),
+    (STAGE_COMPLETED, "article_saved"): ("writing_status", "success", "✅ Writing Complete"),
+}
+
+# Status box that shows a failure of each stage
+STAGE_BOXES = {
+    "ideation": "ideation_status", "idea_saved": "ideation_status",
+    "research": "research_status", "research_saved": "research_status",
+    "writer": "writing_status", "editing": "writing_status", "article_saved": "writing_status",
+}
 
-# Configure custom logger for capturing output
 class StreamlitHandler(logging.Handler):
-    def __init__(self, placeholder):
+    """
+    Keeps the most recent log lines in a ring buffer and renders them at most every LOG_RENDER_INTERVAL.
+
+    Records can arrive from worker threads (e.g. the research fan-out); they
+    are buffered and only rendered from the thread running the script.
+    """
+
+    def __init__(self, placeholder, capacity=LOG_BUFFER_LINES):
         super().__init__()
         self.placeholder = placeholder
-        self.log_text = ""
-        self.stages = {
-            "ideation": {"started": False, "completed": False},
-            "research": {"started": False, "completed": False},
-            "writing": {"started": False, "completed": False}
-        }
+        self.lines = deque(maxlen=capacity)
+        self.owner = threading.current_thread()
+        self.last_render = 0.0
 
     def emit(self, record):
-        log_entry = self.format(record)
-        self.log_text += log_entry + "\n"
-        
-        # Update stages based on log messages
-        if "Starting conversation with Ideation Agent" in log_entry:
-            self.stages["ideation"]["started"] = True
-            st.session_state["ideation_status"].info("🤔 Generating Ideas...")
-        elif "Idea saved with ID" in log_entry:
-            self.stages["ideation"]["completed"] = True
-            self.stages["research"]["started"] = True
-            st.session_state["ideation_status"].success("✅ Ideation Complete")
-            st.session_state["research_status"].info("🔍 Conducting Research...")
-        elif "Research saved with ID" in log_entry:
-            self.stages["research"]["completed"] = True
-            self.stages["writing"]["started"] = True
-            st.session_state["research_status"].success("✅ Research Complete")
-            st.session_state["writing_status"].info("✍️ Writing Article...")
-        elif "Article saved successfully" in log_entry:
-            self.stages["writing"]["completed"] = True
-            st.session_state["writing_status"].success("✅ Writing Complete")
-
-        # Update the placeholder with the full log text
-        self.placeholder.code(self.log_text)
+        self.lines.append(self.format(record))
+        if threading.current_thread() is self.owner and time.monotonic() - self.last_render >= LOG_RENDER_INTERVAL:
+            self.render()
+
+    def render(self):
+        self.last_render = time.monotonic()
+        self.placeholder.code("\n".join(list(self.lines)))
+
+def show_progress_event(event, stream_placeholder, last_render):
+    """Update the status boxes and the streaming article from a pipeline progress event."""
+    if event.kind == PARTIAL_OUTPUT:
+        # Throttle re-renders; each one redraws the whole partial article
+        now = time.monotonic()
+        if now - last_render[0] >= STREAM_RENDER_INTERVAL:
+            last_render[0] = now
+            display_article({"article_text": event.data["text"]}, placeholder=stream_placeholder)
+    elif event.kind == ERROR:
+        st.session_state[STAGE_BOXES.get(event.stage, "ideation_status")].error(f"❌ Failed: {event.data['error']}")
+    elif (event.kind, event.stage) in STAGE_STATUS:
+        box, level, text = STAGE_STATUS[(event.kind, event.stage)]
+        getattr(st.session_state[box], level)(text)
+
+def on_progress_event(event, owner, deferred, **display):
+    """
+    Show a progress event, or queue it if it was published off the script thread.
+
+    Save stages run on worker threads, which cannot draw; their events are
+    shown before the next event from the script thread, or once the run ends.
+    """
+    if threading.current_thread() is not owner:
+        deferred.append(event)
+        return
+    while deferred:
+        show_progress_event(deferred.popleft(), **display)
+    show_progress_event(event, **display)
 
 def initialize_page():
     st.set_page_config(
@@ -95,8 +142,19 @@ def create_status_containers():
         st.session_state["writing_status"] = st.empty()
         st.session_state["writing_status"].error("⏳ Waiting to Start")
 
-def display_article(article_data):
-    """Display the generated article in a formatted way"""
+def display_article(article_data, placeholder=None):
+    """Display the generated article in a formatted way.
+
+    With a placeholder, article_data is a partial article still being
+    streamed: only its text is rendered, replacing the placeholder's
+    previous content.
+    """
+    if placeholder is not None:
+        with placeholder.container():
+            st.header("📝 Writing Article...", divider="rainbow")
+            st.markdown(article_data.get("article_text", ""))
+        return
+
     if not article_data:
         st.error("No article data available to display")
         return
@@ -192,11 +250,23 @@ def run_generation_pipeline(topic):
         logger.removeHandler(existing_handler)
     logger.addHandler(handler)
     
+    # Placeholder the article streams into while the Writer Agent is generating it
+    stream_placeholder = st.empty()
+
+    # Follow this run's progress events; subscribing also makes the writer stream
+    run_id = new_run_id()
+    deferred_events = deque()
+    display = {"stream_placeholder": stream_placeholder, "last_render": [0.0]}
+    unsubscribe = progress_events.subscribe(
+        partial(on_progress_event, owner=threading.current_thread(), deferred=deferred_events, **display), run_id=run_id
+    )
+
     try:
         # Capture stdout and run the main process
         buffer = io.StringIO()
         with redirect_stdout(buffer):
-            article_data = main.main(topic)  # Now captures the returned article data
+            article_data = main.main(topic, run_id=run_id)  # Now captures the returned article data
+        stream_placeholder.empty()
         
         # Get the captured output
         output = buffer.getvalue()
@@ -215,8 +285,12 @@ def run_generation_pipeline(topic):
         st.error(f"An error occurred during generation: {str(e)}")
         st.exception(e)
     finally:
-        # Remove our custom handler
+        # Remove our custom handler and subscription, showing the last log lines
+        unsubscribe()
+        while deferred_events:
+            show_progress_event(deferred_events.popleft(), **display)
         logger.removeHandler(handler)
+        handler.render()
 
 def main_ui():
     topic = initialize_page()
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import itertools
+import os
+import sys
+import pytest
+
+# Let the tests import the project's top-level packages (utils, database, agents)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeTable:
+    """The subset of the postgrest query builder the pipeline uses, over in-memory rows."""
+
+    def __init__(self, rows, ids):
+        self.rows = rows
+        self.ids = ids
+        self.result = list(rows)
+        self.count = None
+        self.inserted = None
+
+    def select(self, columns="*"):
+        return self
+
+    def gt(self, column, value):
+        self.result = [row for row in self.result if row[column] > value]
+        return self
+
+    def in_(self, column, values):
+        self.result = [row for row in self.result if row[column] in values]
+        return self
+
+    def eq(self, column, value):
+        self.result = [row for row in self.result if row.get(column) == value]
+        return self
+
+    def order(self, column):
+        self.result = sorted(self.result, key=lambda row: row[column])
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def insert(self, rows):
+        self.inserted = [dict(row, id=next(self.ids)) for row in (rows if isinstance(rows, list) else [rows])]
+        return self
+
+    def execute(self):
+        if self.inserted is not None:
+            self.rows.extend(self.inserted)
+            return SimpleNamespace(data=self.inserted)
+        return SimpleNamespace(data=self.result[:self.count] if self.count else self.result)
+
+class FakeSupabase:
+    """Stands in for the Supabase client; tables are lists of row dicts keyed by table name."""
+
+    def __init__(self, tables=None):
+        self.tables = tables if tables is not None else {}
+        self._ids = itertools.count(1)
+
+    def table(self, name):
+        return FakeTable(self.tables.setdefault(name, []), self._ids)
+
+@pytest.fixture
+def supabase():
+    """Serve get_supabase() from an empty FakeSupabase for the test."""
+    from utils import clients
+    fake = FakeSupabase()
+    clients.set_client("supabase", fake)
+    yield fake
+    clients.reset("supabase")
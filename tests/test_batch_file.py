@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("swarm")
+
+import main
+import json
+
+class FakePipeline:
+    """Records each run and fails the topics in failing, as run_pipeline would raise."""
+
+    def __init__(self, failing=()):
+        self.runs = []
+        self.failing = set(failing)
+
+    def __call__(self, topic, run_id=None, resume=False, write_queue=None, idea=None):
+        self.runs.append({"topic": topic, "run_id": run_id, "resume": resume})
+        if topic in self.failing:
+            raise main.PipelineError(f"{topic} failed")
+        return {"article_title": topic}
+
+@pytest.fixture
+def pipeline(supabase, monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(main, "run_pipeline", fake)
+    return fake
+
+def write_topics(path, lines):
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_each_key_runs_once_and_bad_lines_are_skipped(tmp_path, pipeline):
+    topics, out = tmp_path / "topics.jsonl", tmp_path / "out.jsonl"
+    write_topics(topics, [
+        json.dumps({"topic": "Caching"}),
+        "{not json",
+        json.dumps({"note": "no topic"}),
+        json.dumps({"title": "Profiling", "id": 7}),
+        json.dumps({"topic": "Caching"}),
+    ])
+
+    counts = main.run_batch_file(str(topics), str(out), workers=2)
+
+    # The repeated topic counts as skipped
+    assert counts == {"succeeded": 2, "failed": 0, "skipped": 1}
+    assert sorted(run["topic"] for run in pipeline.runs) == ["Caching", "Profiling"]
+    assert sorted(result["key"] for result in read_results(out)) == ["7", "Caching"]
+
+def test_a_rerun_skips_successes_and_resumes_failures_from_their_checkpoint(tmp_path, pipeline):
+    topics, out = tmp_path / "topics.jsonl", tmp_path / "out.jsonl"
+    write_topics(topics, [json.dumps({"topic": "Caching"}), json.dumps({"topic": "Profiling"})])
+    pipeline.failing = {"Profiling"}
+
+    assert main.run_batch_file(str(topics), str(out), workers=2) == {"succeeded": 1, "failed": 1, "skipped": 0}
+    failed_run_id = next(run["run_id"] for run in pipeline.runs if run["topic"] == "Profiling")
+
+    pipeline.failing, pipeline.runs = set(), []
+    assert main.run_batch_file(str(topics), str(out), workers=2) == {"succeeded": 1, "failed": 0, "skipped": 1}
+    assert pipeline.runs == [{"topic": "Profiling", "run_id": failed_run_id, "resume": True}]
+
+    pipeline.runs = []
+    assert main.run_batch_file(str(topics), str(out), workers=2) == {"succeeded": 0, "failed": 0, "skipped": 2}
+    assert pipeline.runs == []
+    # Results are appended, so the output holds every attempt
+    assert [(result["key"], result["error"] is None) for result in read_results(out)][-1] == ("Profiling", True)
+
+def test_a_line_cut_short_by_a_crash_is_run_again(tmp_path, pipeline):
+    topics, out = tmp_path / "topics.jsonl", tmp_path / "out.jsonl"
+    write_topics(topics, [json.dumps({"topic": "Caching"}), json.dumps({"topic": "Profiling"})])
+    out.write_text(json.dumps({"key": "Caching", "error": None}) + "\n" + '{"key": "Profiling", "err', encoding="utf-8")
+
+    assert main.load_batch_output(str(out)) == ({"Caching"}, {})
+    assert main.run_batch_file(str(topics), str(out), workers=1) == {"succeeded": 1, "failed": 0, "skipped": 1}
+    assert pipeline.runs == [{"topic": "Profiling", "run_id": pipeline.runs[0]["run_id"], "resume": False}]
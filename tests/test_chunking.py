@@ -0,0 +1,48 @@
+from utils import chunking
+from utils.chunking import chunk_text
+import pytest
+
+PARAGRAPHS = ["p0a p0b p0c.", "p1a p1b p1c.", "p2a p2b p2c.", "p3a p3b p3c."]
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """Count one token per word, so budgets in these tests are word counts."""
+    monkeypatch.setattr(chunking, "count_tokens", lambda text, model=None: len(text.split()))
+
+def test_a_split_section_repeats_the_previous_paragraph_as_overlap():
+    chunks = list(chunk_text("\n\n".join(PARAGRAPHS), max_tokens=7, overlap_tokens=3))
+
+    assert chunks == [
+        "p0a p0b p0c.\n\np1a p1b p1c.",
+        "p1a p1b p1c.\n\np2a p2b p2c.",
+        "p2a p2b p2c.\n\np3a p3b p3c.",
+    ]
+
+def test_overlap_stops_at_its_token_budget():
+    chunks = list(chunk_text("\n\n".join(PARAGRAPHS), max_tokens=7, overlap_tokens=2))
+
+    assert chunks == ["p0a p0b p0c.\n\np1a p1b p1c.", "p2a p2b p2c.\n\np3a p3b p3c."]
+
+def test_a_chunk_may_fill_its_budget_exactly():
+    text = "\n\n".join(PARAGRAPHS[:2])
+
+    assert list(chunk_text(text, max_tokens=6, overlap_tokens=3)) == [text]
+    assert list(chunk_text(text, max_tokens=5, overlap_tokens=3)) == PARAGRAPHS[:2]
+
+def test_small_sections_share_a_chunk_until_the_next_one_does_not_fit():
+    text = "# A\n\none two\n\n# B\n\nthree four\n\n# C\n\nfive six seven"
+
+    assert list(chunk_text(text, max_tokens=8, overlap_tokens=3)) == [
+        "# A\n\none two\n\n# B\n\nthree four",
+        "# C\n\nfive six seven",
+    ]
+
+def test_text_without_breaks_is_split_into_word_runs_within_budget():
+    chunks = list(chunk_text(" ".join(f"w{i}" for i in range(10)), max_tokens=4, overlap_tokens=0))
+
+    assert " ".join(chunks).split() == [f"w{i}" for i in range(10)]
+    assert all(len(chunk.split()) <= 4 for chunk in chunks)
+
+@pytest.mark.parametrize("text", ["", None, "\n\n  \n"])
+def test_empty_text_has_no_chunks(text):
+    assert list(chunk_text(text, max_tokens=5, overlap_tokens=1)) == []
@@ -0,0 +1,45 @@
+from utils import compaction
+from utils.token_utils import count_tokens
+import numpy as np
+import pytest
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    def generate_embeddings(texts):
+        return [np.random.default_rng(abs(hash(text)) % 2 ** 32).normal(size=16).tolist() for text in texts]
+    monkeypatch.setattr(compaction, "generate_embeddings", generate_embeddings)
+
+def tokens(result):
+    return count_tokens(result["research_text"], compaction.WRITER_MODEL) + count_tokens(result["references"], compaction.WRITER_MODEL)
+
+def test_research_within_budget_is_unchanged():
+    result = compaction.compact_research("A short finding.", "https://example.com", "idea", budget_tokens=1000)
+    assert result["research_text"] == "A short finding."
+    assert result["dropped_passages"] == 0
+
+def test_uncited_references_cannot_crowd_out_the_passages():
+    research_text = "\n".join(f"Finding {index} about the topic and why it matters." for index in range(40))
+    references = ", ".join(f"https://example.com/a/long/path/to/source/number/{index}" for index in range(200))
+
+    result = compaction.compact_research(research_text, references, "the topic", budget_tokens=1000)
+
+    assert result["research_text"]
+    assert tokens(result) <= 1000
+    assert count_tokens(result["references"], compaction.WRITER_MODEL) <= 250
+
+def test_the_most_relevant_passage_is_kept_even_over_budget():
+    research_text = "\n".join(["word " * 100] * 3 + ["other " * 100])
+
+    result = compaction.compact_research(research_text, "", "idea", budget_tokens=10)
+
+    assert result["research_text"]
+
+def test_cited_references_are_renumbered():
+    research_text = "\n".join(["Unrelated filler text that repeats. " * 8] * 20 + ["Key fact [3].", "Second fact [1]."])
+    references = "\n".join(f"[{n}] Source {n}" for n in range(1, 4))
+
+    result = compaction.compact_research(research_text, references, "Key fact", budget_tokens=60)
+
+    cited = set(compaction._CITATION.findall(result["research_text"]))
+    assert cited <= {"1", "2"}
+    assert len(compaction.parse_references(result["references"])) == len(cited)
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("swarm")
+
+from agents.editor_agent import apply_patches, check_article, count_references
+
+BODY = " ".join(["Short sentences keep the guide easy to read."] * 45)
+
+def article(references):
+    return (
+        f"# Caching for Beginners\n\n{BODY}\n\n## Why Caches Help\n{BODY}\n\n"
+        f"## Practical Exercise\nAdd a cache to a slow function and time it.\n\n## References\n{references}"
+    )
+
+@pytest.mark.parametrize("references", [
+    "Smith, J. (2021). Caching basics. Tech Press. https://example.com/a\nLee, K. (2020). Fast systems. https://example.com/b",
+    "- https://example.com/a\n- https://example.com/b",
+    "Smith, J. (2021). Caching basics. Tech Press. Lee, K. (n.d.). Fast systems. Retrieved from the web.",
+    "https://example.com/a, https://example.com/b, https://example.com/c",
+])
+def test_typical_writer_output_passes(references):
+    assert check_article(article(references)) == []
+
+def test_count_references_handles_each_layout():
+    assert count_references("## References\n1. A (2020).\n2. B (2021).\n3. C (2022).") == 3
+    assert count_references("## References\nA (2020). B (2021, March 3). C (n.d.).") == 3
+    assert count_references("## References\nhttps://a.example, https://b.example") == 2
+    assert count_references("## References\n") == 0
+
+def test_missing_sections_and_short_articles_are_reported():
+    issues = check_article("# Title\n\nToo short.\n\n## References\nhttps://example.com/a")
+    checks = {issue["check"] for issue in issues}
+    assert {"structure", "required_section", "length", "references"} <= checks
+    assert {"check": "required_section", "section": "Practical Exercise", "message": "The '## Practical Exercise' section is missing."} in issues
+
+def test_patches_replace_or_add_sections():
+    text, applied = apply_patches(article("https://example.com/a"), [
+        {"section": "References", "content": "## References\nhttps://example.com/a\nhttps://example.com/b"},
+        {"section": "Summary", "content": "Caches trade memory for time."},
+    ])
+    assert applied == 2
+    assert text.index("## Summary") < text.index("## References")
+    assert text.endswith("https://example.com/b")
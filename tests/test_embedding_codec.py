@@ -0,0 +1,29 @@
+from utils.embedding_codec import decode_embedding, encode_embedding, pack_embedding
+import numpy as np
+import pytest
+
+EMBEDDING = [0.25, -0.5, 0.125, 1.0]
+
+@pytest.mark.parametrize("fmt, tolerance", [("json", 0), ("float32", 0), ("float16", 1e-3), ("int8", 1 / 127)])
+def test_round_trip(fmt, tolerance):
+    decoded = decode_embedding(encode_embedding(EMBEDDING, fmt))
+
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, EMBEDDING, atol=tolerance)
+
+def test_compact_formats_are_prefixed_strings():
+    encoded = encode_embedding(EMBEDDING, "float16")
+    assert encoded.startswith("float16:")
+    assert len(encoded) < len(str(encode_embedding(EMBEDDING, "json")))
+
+def test_pgvector_strings_are_decoded():
+    np.testing.assert_allclose(decode_embedding("[0.25,-0.5,0.125,1]"), EMBEDDING)
+
+def test_int8_of_a_zero_vector_stays_zero():
+    np.testing.assert_array_equal(decode_embedding(encode_embedding([0.0, 0.0], "int8")), [0.0, 0.0])
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        pack_embedding(EMBEDDING, "float8")
+    with pytest.raises(ValueError):
+        decode_embedding("float8:AAAA")
@@ -0,0 +1,70 @@
+from utils import clients, embedding_utils
+from utils.disk_cache import DiskCache
+from utils.embedding_utils import generate_embeddings
+from types import SimpleNamespace
+import pytest
+
+class FakeEmbeddings:
+    """Embeds each text as [length, request number], failing the requests listed in fail."""
+
+    def __init__(self, fail=()):
+        self.requests = []
+        self.fail = set(fail)
+
+    def create(self, input, model):
+        self.requests.append(list(input))
+        if len(self.requests) in self.fail:
+            raise ValueError("invalid input")
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(len(text)), float(len(self.requests))]) for i, text in enumerate(input)],
+            usage=SimpleNamespace(total_tokens=sum(len(text.split()) for text in input))
+        )
+
+@pytest.fixture
+def openai(tmp_path, monkeypatch):
+    """Route embedding requests to a fake, with a fresh disk cache and one token per word."""
+    embeddings = FakeEmbeddings()
+    clients.set_client("openai", SimpleNamespace(embeddings=embeddings))
+    monkeypatch.setattr(embedding_utils, "_embedding_cache", DiskCache(str(tmp_path / "embeddings.sqlite3")))
+    monkeypatch.setattr(embedding_utils, "count_tokens", lambda text, model: len(text.split()))
+    yield embeddings
+    clients.reset("openai")
+
+def test_batches_respect_the_input_and_token_limits(monkeypatch):
+    monkeypatch.setattr(embedding_utils, "MAX_BATCH_INPUTS", 3)
+    monkeypatch.setattr(embedding_utils, "MAX_BATCH_TOKENS", 10)
+
+    batches = list(embedding_utils._pack_batches([1, 1, 1, 1, 6, 5, 12]))
+
+    # A text over the token budget still gets a batch of its own
+    assert batches == [[0, 1, 2], [3, 4], [5], [6]]
+
+def test_duplicates_and_empty_texts_are_not_sent(openai):
+    results = generate_embeddings(["a b", "", "c", "a b"])
+
+    assert openai.requests == [["a b", "c"]]
+    assert results == [[3.0, 1.0], None, [1.0, 1.0], [3.0, 1.0]]
+
+def test_cached_texts_are_not_sent_again(openai):
+    generate_embeddings(["a b", "c"])
+    results = generate_embeddings(["c", "d e f"])
+
+    assert openai.requests == [["a b", "c"], ["d e f"]]
+    assert results == [[1.0, 1.0], [5.0, 2.0]]
+    assert embedding_utils.embedding_cache_stats()["hits"] == 1
+
+def test_a_failed_batch_only_loses_its_own_texts(openai, monkeypatch, caplog):
+    monkeypatch.setattr(embedding_utils, "MAX_BATCH_INPUTS", 2)
+    monkeypatch.setattr(embedding_utils, "call_with_limits", lambda provider, func, tokens=0, **kwargs: func(**kwargs))
+    openai.fail = {1}
+
+    results = generate_embeddings(["a", "b", "c"])
+
+    assert results == [None, None, [1.0, 2.0]]
+    assert "batch of 2 texts" in caplog.text
+
+def test_texts_over_the_input_limit_are_skipped(openai, monkeypatch):
+    monkeypatch.setattr(embedding_utils, "MAX_INPUT_TOKENS", 2)
+
+    assert generate_embeddings(["a b c", "d"]) == [None, [1.0, 1.0]]
+    assert openai.requests == [["d"]]
@@ -0,0 +1,50 @@
+from utils.events import EventBus, PARTIAL_OUTPUT, STAGE_COMPLETED, STAGE_STARTED
+
+def test_subscribers_get_all_events_or_only_their_run():
+    bus = EventBus()
+    everything, run_a = [], []
+    bus.subscribe(everything.append)
+    bus.subscribe(run_a.append, run_id="a")
+
+    bus.publish(STAGE_STARTED, "a", "ideation")
+    bus.publish(STAGE_STARTED, "b", "ideation")
+    bus.publish(PARTIAL_OUTPUT, "a", "writer", text="Hel")
+
+    assert [(event.kind, event.run_id) for event in everything] == [(STAGE_STARTED, "a"), (STAGE_STARTED, "b"), (PARTIAL_OUTPUT, "a")]
+    assert [event.kind for event in run_a] == [STAGE_STARTED, PARTIAL_OUTPUT]
+    assert run_a[-1].data == {"text": "Hel"}
+
+def test_has_subscribers_matches_global_and_run_subscriptions():
+    bus = EventBus()
+    assert not bus.has_subscribers("a")
+    unsubscribe = bus.subscribe(lambda event: None, run_id="a")
+    assert bus.has_subscribers("a") and not bus.has_subscribers("b")
+    unsubscribe()
+    assert not bus.has_subscribers("a")
+    bus.subscribe(lambda event: None)
+    assert bus.has_subscribers("b")
+
+def test_failing_subscriber_does_not_stop_the_others():
+    bus = EventBus()
+    received = []
+
+    def broken(event):
+        raise RuntimeError("display closed")
+
+    bus.subscribe(broken)
+    bus.subscribe(received.append)
+
+    event = bus.publish(STAGE_COMPLETED, "a", "writer", skipped=False)
+
+    assert received == [event]
+
+def test_unsubscribe_is_idempotent():
+    bus = EventBus()
+    received = []
+    unsubscribe = bus.subscribe(received.append)
+    unsubscribe()
+    unsubscribe()
+
+    bus.publish(STAGE_STARTED, "a")
+
+    assert received == []
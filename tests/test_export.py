@@ -0,0 +1,77 @@
+from database import export
+from utils import clients
+from types import SimpleNamespace
+import json
+import pytest
+
+class FakeQuery:
+    """The subset of the postgrest query builder the export uses."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = None
+
+    def select(self, columns):
+        return self
+
+    def gt(self, column, value):
+        self.rows = [row for row in self.rows if row[column] > value]
+        return self
+
+    def in_(self, column, values):
+        self.rows = [row for row in self.rows if row[column] in values]
+        return self
+
+    def order(self, column):
+        self.rows = sorted(self.rows, key=lambda row: row[column])
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows[:self.count] if self.count else self.rows)
+
+class FakeSupabase:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return FakeQuery(list(self.tables.get(name, [])))
+
+@pytest.fixture
+def database():
+    tables = {
+        "ideation": [{"id": 1, "idea_title": "Idea", "description": "About it", "date_created": None}],
+        "research": [{"id": 1, "research_title": "R", "research_text": "Text", "references_urls": "a, b", "date_created": None}],
+        "writer": [
+            {"id": article_id, "article_text": f"# Article {article_id}", "ideation_id": 1, "research_id": 1, "date_created": None}
+            for article_id in range(1, 6)
+        ],
+    }
+    clients.set_client("supabase", FakeSupabase(tables))
+    yield tables
+    clients.reset("supabase")
+
+def test_export_pages_joins_and_advances_the_watermark(database, tmp_path):
+    watermark = str(tmp_path / "watermark.json")
+
+    result = export.export_corpus(str(tmp_path / "all.jsonl"), watermark_path=watermark, page_size=2)
+
+    records = [json.loads(line) for line in open(tmp_path / "all.jsonl")]
+    assert result == {"articles": 5, "last_article_id": 5}
+    assert [record["article_id"] for record in records] == [1, 2, 3, 4, 5]
+    assert {record["idea_title"] for record in records} == {"Idea"}
+    database["writer"].append({"id": 6, "article_text": "# New", "ideation_id": 1, "research_id": 1, "date_created": None})
+    assert export.export_corpus(str(tmp_path / "new.jsonl"), watermark_path=watermark)["articles"] == 1
+
+def test_missing_join_rows_abort_without_moving_the_watermark(database, tmp_path):
+    watermark = str(tmp_path / "watermark.json")
+    export.save_watermark(watermark, 2)
+    database["research"].clear()
+
+    with pytest.raises(export.ExportError):
+        export.export_corpus(str(tmp_path / "out.jsonl"), watermark_path=watermark)
+
+    assert export.load_watermark(watermark) == 2
@@ -0,0 +1,87 @@
+from utils import disk_cache
+from utils.http_cache import CachedJsonClient
+from types import SimpleNamespace
+import threading
+import time
+import pytest
+
+URL = "https://serpapi.example/search"
+
+class FakeSession:
+    """Answers GETs with {'version': n}, n counting requests; blocks while gate is cleared."""
+
+    def __init__(self):
+        self.requests = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get(self, url, params, timeout):
+        self.requests.append(dict(params))
+        self.gate.wait(5)
+        version = len(self.requests)
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"version": version})
+
+def wait_for_revalidation(client):
+    deadline = time.monotonic() + 5
+    while client.stats()["revalidating"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = SimpleNamespace(now=1_000_000.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(disk_cache, "time", fake)
+    return fake
+
+@pytest.fixture
+def client(tmp_path):
+    client = CachedJsonClient(FakeSession(), str(tmp_path / "http.sqlite3"), ttl=60, stale_ttl=600)
+    yield client
+    client._executor.shutdown(wait=True)
+
+def test_fresh_responses_are_served_from_the_cache(client, clock):
+    assert client.get_json(URL, {"q": "Caching  Tips!", "api_key": "a"}) == {"version": 1}
+    clock.now += 30
+    # The normalized query matches and the API key is not part of the key
+    assert client.get_json(URL, {"q": "caching tips", "api_key": "b"}) == {"version": 1}
+
+    assert len(client.session.requests) == 1
+    assert client.stats()["fresh_hits"] == 1
+
+def test_stale_responses_are_served_while_one_background_request_refreshes_them(client, clock):
+    client.get_json(URL, {"q": "caching"})
+    clock.now += 120
+    client.session.gate.clear()
+
+    # Both stale reads return at once, without waiting on the refresh
+    assert client.get_json(URL, {"q": "caching"}) == {"version": 1}
+    assert client.get_json(URL, {"q": "caching"}) == {"version": 1}
+    assert client.stats()["revalidating"] == 1
+
+    client.session.gate.set()
+    wait_for_revalidation(client)
+
+    assert len(client.session.requests) == 2
+    assert client.stats()["stale_hits"] == 2 and client.stats()["revalidations"] == 1
+    assert client.get_json(URL, {"q": "caching"}) == {"version": 2}
+
+def test_responses_past_the_stale_window_are_fetched_synchronously(client, clock):
+    client.get_json(URL, {"q": "caching"})
+    clock.now += 60 + 600
+
+    assert client.get_json(URL, {"q": "caching"}) == {"version": 2}
+    assert client.stats()["misses"] == 2 and client.stats()["stale_hits"] == 0
+
+def test_a_failed_revalidation_keeps_the_stale_response(client, clock):
+    client.get_json(URL, {"q": "caching"})
+    clock.now += 120
+
+    def fail(url, params, timeout):
+        raise ConnectionError("offline")
+
+    client.session.get = fail
+    assert client.get_json(URL, {"q": "caching"}) == {"version": 1}
+    wait_for_revalidation(client)
+
+    assert client.stats()["revalidating"] == 0 and client.stats()["revalidations"] == 0
+    assert client.get_json(URL, {"q": "caching"}) == {"version": 1}
@@ -0,0 +1,27 @@
+from utils.idea_selection import select_diverse
+from utils.vector_index import unit_vectors
+import numpy as np
+import pytest
+
+def test_unit_vectors_normalizes_rows_and_keeps_zero_rows():
+    vectors = unit_vectors([[3.0, 4.0], [0.0, 0.0]])
+
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+def test_near_duplicate_loses_to_a_less_similar_candidate():
+    embeddings = [[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]]
+    # The near-duplicate of the first pick is the second most novel, yet the distinct candidate wins
+    assert select_diverse(embeddings, [0.9, 0.8, 0.6], 2, weight=0.7, max_similarity=1.1) == [0, 2]
+
+def test_duplicates_of_a_pick_are_never_picked():
+    embeddings = [[1.0, 0.0], [0.99, 0.14]]
+    assert select_diverse(embeddings, [0.9, 0.8], 2, max_similarity=0.95) == [0]
+
+def test_weight_one_ranks_by_novelty_alone():
+    embeddings = [[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]]
+    assert select_diverse(embeddings, [0.9, 0.8, 0.6], 3, weight=1.0, max_similarity=1.1) == [0, 1, 2]
+
+@pytest.mark.parametrize("embeddings, k", [([], 3), ([[1.0, 0.0]], 0)])
+def test_nothing_to_pick(embeddings, k):
+    assert select_diverse(embeddings, [0.5] * len(embeddings), k) == []
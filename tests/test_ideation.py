@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("swarm")
+
+import main
+from types import SimpleNamespace
+from utils.vector_index import VectorIndex
+import json
+
+class ScriptedSwarm:
+    """Answers each run with the next scripted reply."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+
+    def run(self, agent, messages, **kwargs):
+        return SimpleNamespace(messages=[{"role": "assistant", "content": self.replies.pop(0)}], agent=agent)
+
+@pytest.fixture
+def embeddings(supabase, monkeypatch):
+    """Count embedding requests by text; texts embed to one of two dissimilar vectors by their first letter."""
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        odd = ord(text[0]) % 2
+        return [float(odd), float(1 - odd), 0.5]
+
+    monkeypatch.setattr(main, "idea_index", VectorIndex())
+    monkeypatch.setattr(main, "generate_embedding", embed)
+    monkeypatch.setattr(main, "generate_embeddings", lambda texts: [embed(text) for text in texts])
+    return calls
+
+def test_the_duplicate_check_embedding_is_saved_with_the_idea(supabase, embeddings):
+    client = ScriptedSwarm(json.dumps({"idea_title": "Caching", "description": "Why caches help."}))
+
+    idea = main.run_unique_ideation(client, "Performance")
+    idea_id = main.save_idea(idea)
+
+    assert embeddings == ["Why caches help."]
+    assert supabase.tables["ideation"][0]["id"] == idea_id
+    assert supabase.tables["ideation"][0]["embedding"] == idea["embedding"]
+
+def test_the_picked_candidate_keeps_its_batch_embedding(supabase, embeddings):
+    client = ScriptedSwarm(json.dumps({"ideas": [
+        {"idea_title": "Caching", "description": "Why caches help."},
+        {"idea_title": "Profiling", "description": "Finding the slow parts of a program first."},
+    ]}))
+
+    ideas = main.run_speculative_ideation(client, "Performance", count=2)
+    for idea in ideas:
+        main.save_idea(idea)
+
+    assert sorted(embeddings) == sorted(["Why caches help.", "Finding the slow parts of a program first."])
+    assert len(supabase.tables["ideation"]) == 2
+
+def test_an_idea_without_an_embedding_is_embedded_when_saved(supabase, embeddings):
+    main.save_idea({"idea_title": "Caching", "description": "Why caches help."})
+
+    assert embeddings == ["Why caches help."]
@@ -0,0 +1,30 @@
+from benchmarks.import_time import BUDGETS_MS, ROOT, measure
+import os
+import subprocess
+import sys
+import pytest
+
+def _measure_or_skip(module):
+    try:
+        return min(measure(module)[0] for _ in range(3))
+    except RuntimeError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(f"{module} needs a dependency that is not installed")
+        raise
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_import_stays_within_budget(module):
+    total = _measure_or_skip(module)
+    assert total <= BUDGETS_MS[module], f"Importing {module} took {total:.0f} ms; the budget is {BUDGETS_MS[module]} ms"
+
+@pytest.mark.parametrize("module", ["database.db_utils", "main"])
+def test_import_creates_no_files(module, tmp_path):
+    env = dict(
+        os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        CHECKPOINT_DIR=str(tmp_path / "checkpoints"), EMBEDDING_CACHE_PATH=str(tmp_path / "embeddings.sqlite3"),
+    )
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True, text=True, cwd=ROOT, env=env)
+    if "ModuleNotFoundError" in result.stderr:
+        pytest.skip(f"{module} needs a dependency that is not installed")
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,77 @@
+from agents.orchestration_agent import Dag, Stage
+from utils.llm_cache import CachedSwarm, discard_on_failure
+from types import SimpleNamespace
+import json
+import pytest
+
+AGENT = SimpleNamespace(name="Writer Agent", instructions="Write an article.", functions=[], model="gpt-4o")
+MESSAGES = [{"role": "system", "content": "Create a comprehensive article."}]
+
+class FakeSwarm:
+    """Stands in for Swarm, answering each run with the next scripted reply."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+        self.client = None
+
+    def run(self, agent, messages, context_variables=None, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            messages=[{"role": "assistant", "content": self.replies.pop(0)}],
+            agent=agent,
+            context_variables=context_variables or {}
+        )
+
+def run_and_parse(client):
+    response = client.run(agent=AGENT, messages=MESSAGES)
+    with discard_on_failure(client, AGENT, MESSAGES):
+        return json.loads(response.messages[-1]["content"])
+
+def test_stage_retry_calls_the_model_again_after_a_malformed_reply(tmp_path):
+    swarm = FakeSwarm(["not json", '{"article_title": "A"}'])
+    client = CachedSwarm(swarm, str(tmp_path / "llm.sqlite"))
+
+    results = Dag([Stage("writer", lambda: run_and_parse(client), retries=1, inline=True)]).run()
+
+    assert results["writer"] == {"article_title": "A"}
+    assert swarm.calls == 2
+
+def test_malformed_reply_is_dropped_from_the_cache(tmp_path):
+    swarm = FakeSwarm(["not json", '{"article_title": "A"}'])
+    client = CachedSwarm(swarm, str(tmp_path / "llm.sqlite"))
+
+    with pytest.raises(json.JSONDecodeError):
+        run_and_parse(client)
+
+    assert client.cache.get(client.cache_key(AGENT, MESSAGES, {})) is None
+    assert run_and_parse(client) == {"article_title": "A"}
+    assert swarm.calls == 2
+
+def test_valid_reply_is_served_from_the_cache(tmp_path):
+    pytest.importorskip("swarm")
+    swarm = FakeSwarm(['{"article_title": "A"}'])
+    client = CachedSwarm(swarm, str(tmp_path / "llm.sqlite"))
+
+    assert run_and_parse(client) == run_and_parse(client) == {"article_title": "A"}
+    assert swarm.calls == 1
+
+def test_clients_share_one_cache_per_process(tmp_path, monkeypatch):
+    pytest.importorskip("swarm")
+    import main
+    from utils import clients
+
+    monkeypatch.setattr(main, "LLM_CACHE_MODE", "readwrite")
+    monkeypatch.setattr(main, "LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(main, "LLM_CACHE_MAX_ENTRIES", 5)
+    monkeypatch.setattr(main, "_llm_cache", None)
+    clients.set_client("swarm", FakeSwarm([]))
+    monkeypatch.setattr(main, "limit_openai_client", lambda client: client)
+    monkeypatch.setattr(main, "instrument_openai_client", lambda client: client)
+    try:
+        first, second = main.create_client(), main.create_client()
+    finally:
+        clients.reset("swarm")
+
+    assert first.cache is second.cache
+    assert first.cache.max_entries == 5
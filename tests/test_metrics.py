@@ -0,0 +1,106 @@
+from utils import metrics
+from utils.metrics import MetricsRegistry, estimate_cost, instrument_openai_client, record_usage, span
+from types import SimpleNamespace
+import urllib.error
+import urllib.request
+import pytest
+
+@pytest.fixture
+def registry(monkeypatch):
+    fresh = MetricsRegistry()
+    monkeypatch.setattr(metrics, "registry", fresh)
+    return fresh
+
+@pytest.mark.parametrize("model, expected", [
+    ("gpt-4o", 12.50),
+    ("gpt-4o-2024-08-06", 12.50),
+    ("gpt-4o-mini", 0.75),
+    ("gpt-4o-mini-2024-07-18", 0.75),
+    ("text-embedding-ada-002", 0.10),
+    ("unknown-model", 0.0),
+    (None, 0.0),
+])
+def test_estimate_cost_uses_the_most_specific_price(model, expected):
+    assert estimate_cost(model, 1_000_000, 1_000_000) == pytest.approx(expected)
+
+def test_usage_goes_to_the_innermost_span(registry):
+    with span("writer", run_id="run-1"):
+        record_usage("gpt-4o", 100, 10)
+        with span("writer_llm") as inner:
+            record_usage("gpt-4o-mini", 1000, 100)
+
+    assert inner["run_id"] == "run-1"
+    stats = registry.snapshot()
+    assert (stats["writer"]["prompt_tokens"], stats["writer"]["completion_tokens"]) == (100, 10)
+    assert (stats["writer_llm"]["prompt_tokens"], stats["writer_llm"]["completion_tokens"]) == (1000, 100)
+    assert stats["writer_llm"]["cost_usd"] == pytest.approx(estimate_cost("gpt-4o-mini", 1000, 100))
+
+def test_failed_span_counts_an_error(registry):
+    with pytest.raises(ValueError):
+        with span("research"):
+            raise ValueError("bad output")
+
+    assert registry.snapshot()["research"]["errors"] == 1
+
+def _chunk(content=None, usage=None):
+    choices = [] if usage else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+def _fake_openai(calls):
+    def create(**kwargs):
+        calls.append(kwargs)
+        if kwargs.get("stream"):
+            usage = SimpleNamespace(prompt_tokens=50, completion_tokens=20) if kwargs.get("stream_options") else None
+            return iter([_chunk("Hel"), _chunk("lo"), _chunk(usage=usage)] if usage else [_chunk("Hel"), _chunk("lo")])
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=50, completion_tokens=20))
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def test_instrumented_calls_record_usage(registry):
+    calls = []
+    client = instrument_openai_client(_fake_openai(calls))
+
+    with span("ideation"):
+        client.chat.completions.create(model="gpt-4o", messages=[])
+
+    assert registry.snapshot()["ideation_llm"]["prompt_tokens"] == 50
+
+def test_streamed_calls_record_the_final_usage_chunk(registry):
+    calls = []
+    client = instrument_openai_client(_fake_openai(calls))
+
+    with span("writer"):
+        chunks = list(client.chat.completions.create(model="gpt-4o", messages=[], stream=True))
+
+    assert calls[0]["stream_options"] == {"include_usage": True}
+    # The usage chunk has no choices and is not passed on
+    assert [chunk.choices[0].delta.content for chunk in chunks] == ["Hel", "lo"]
+    stats = registry.snapshot()["writer_llm"]
+    assert (stats["count"], stats["prompt_tokens"], stats["completion_tokens"]) == (1, 50, 20)
+    assert stats["cost_usd"] == pytest.approx(estimate_cost("gpt-4o", 50, 20))
+
+def test_prometheus_rendering(registry):
+    with span("writer"):
+        record_usage("gpt-4o", 100, 10)
+
+    text = registry.render_prometheus()
+
+    assert 'article_stage_duration_seconds_count{stage="writer"} 1' in text
+    assert 'article_stage_duration_seconds_bucket{stage="writer",le="+Inf"} 1' in text
+    assert 'article_tokens_total{stage="writer",kind="prompt"} 100' in text
+    assert 'article_stage_errors_total{stage="writer"} 0' in text
+
+def test_metrics_server_serves_the_registry(registry):
+    with span("writer"):
+        pass
+    server = metrics.start_metrics_server(0, host="127.0.0.1")
+    try:
+        base = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert 'stage="writer"' in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}/other")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
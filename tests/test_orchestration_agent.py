@@ -0,0 +1,96 @@
+from agents.orchestration_agent import Dag, Stage, StageCancelled
+import threading
+import pytest
+
+def test_stages_get_their_dependencies_results():
+    results = Dag([
+        Stage("idea", lambda: "idea", inline=True),
+        Stage("idea_saved", lambda idea: f"{idea} saved", deps=("idea",)),
+        Stage("research", lambda idea: f"research on {idea}", deps=("idea",), inline=True),
+        Stage("article", lambda research, idea_saved: f"{research}, {idea_saved}", deps=("research", "idea_saved"), inline=True),
+    ]).run()
+
+    assert results["article"] == "research on idea, idea saved"
+
+def test_pool_stages_overlap_with_inline_stages():
+    saving = threading.Event()
+
+    def save():
+        saving.set()
+        return "saved"
+
+    def next_llm_stage():
+        # Only returns if the save is running in the pool at the same time
+        assert saving.wait(timeout=5)
+        return "written"
+
+    results = Dag([
+        Stage("idea", lambda: "idea", inline=True),
+        Stage("idea_saved", lambda idea: save(), deps=("idea",)),
+        Stage("writer", lambda idea: next_llm_stage(), deps=("idea",), inline=True),
+    ]).run()
+
+    assert results == {"idea": "idea", "idea_saved": "saved", "writer": "written"}
+
+def test_failed_stage_is_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("timed out")
+        return "ok"
+
+    assert Dag([Stage("research", flaky, retries=2)]).run() == {"research": "ok"}
+    assert len(attempts) == 3
+
+def test_failure_after_retries_stops_the_run():
+    ran = []
+
+    def fail():
+        raise ValueError("bad output")
+
+    dag = Dag([
+        Stage("writer", fail, retries=1, inline=True),
+        Stage("article_saved", lambda writer: ran.append("article_saved"), deps=("writer",)),
+    ])
+    with pytest.raises(ValueError, match="bad output"):
+        dag.run()
+
+    assert dag.failed == "writer"
+    assert ran == []
+
+def test_cancel_skips_the_remaining_stages():
+    ran = []
+    dag = Dag([
+        Stage("idea", lambda: dag.cancel(), inline=True),
+        Stage("research", lambda idea: ran.append("research"), deps=("idea",), inline=True),
+    ])
+    with pytest.raises(StageCancelled):
+        dag.run()
+
+    assert ran == []
+    assert not dag.future("research").done()
+
+def test_cancel_stops_retries():
+    attempts = []
+
+    def fail_and_cancel():
+        attempts.append(1)
+        dag.cancel()
+        raise ConnectionError("timed out")
+
+    dag = Dag([Stage("research", fail_and_cancel, retries=3, inline=True)])
+    with pytest.raises(ConnectionError):
+        dag.run()
+
+    assert len(attempts) == 1
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage("a", print), Stage("a", print)], "Duplicate"),
+    ([Stage("a", print, deps=("b",))], "unknown"),
+    ([Stage("a", print, deps=("b",)), Stage("b", print, deps=("a",))], "cycle"),
+])
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        Dag(stages)
@@ -0,0 +1,42 @@
+from utils.partial_json import PartialStringField
+import json
+import random
+import pytest
+
+ARTICLE = 'Line one\nTab\tquote " backslash \\ slash / café 中文 emoji \U0001F600 end'
+
+def random_chunks(text, rng):
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 8)
+        yield text[pos:pos + size]
+        pos += size
+
+@pytest.mark.parametrize("seed", range(50))
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_random_chunking_decodes_the_field(seed, ensure_ascii):
+    raw = json.dumps({"article_title": "T", "article_text": ARTICLE, "extra": "x"}, ensure_ascii=ensure_ascii)
+    parser = PartialStringField("article_text")
+    for chunk in random_chunks(raw, random.Random(seed)):
+        parser.feed(chunk)
+        assert ARTICLE.startswith(parser.value)
+    assert parser.value == ARTICLE
+    assert parser.complete
+
+def test_value_only_grows_when_the_field_has_started():
+    parser = PartialStringField("article_text")
+    assert not parser.feed('{"article_title": "T", ')
+    assert parser.feed('"article_text": "Hel')
+    assert parser.value == "Hel"
+
+@pytest.mark.parametrize("raw", [
+    '{"article_text": "bad \\uZZZZ escape"}',
+    '{"article_text": "bad \\u12 escape"}',
+    '{"article_text": "lone \\ud83d surrogate"}',
+])
+def test_malformed_unicode_escapes_do_not_raise(raw):
+    parser = PartialStringField("article_text")
+    for chunk in random_chunks(raw, random.Random(0)):
+        parser.feed(chunk)
+    assert parser.complete
+    assert parser.value.endswith("escape") or parser.value.endswith("surrogate")
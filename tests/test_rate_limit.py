@@ -0,0 +1,150 @@
+from utils import rate_limit
+from utils.rate_limit import AdaptiveConcurrency, TokenBucketLimiter, _MemoryState, _SqliteState, _parse_retry_after, classify_error
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+
+class FakeClock:
+    """Stands in for the time module; sleeping advances the clock instead of blocking."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: 0.0)
+    return fake
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Give call_with_limits fresh in-memory limiters for an unthrottled 'test' provider."""
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit, "_concurrency", {})
+    monkeypatch.setattr(rate_limit, "_state", _MemoryState())
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_MAX_CONCURRENCY", 8)
+    monkeypatch.setitem(rate_limit.PROVIDER_LIMITS, "test", (0, 0))
+    monkeypatch.setattr(rate_limit, "record_retry", lambda: None)
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+class APIConnectionError(Exception):
+    pass
+
+def test_requests_bucket_refills_continuously(clock):
+    limiter = TokenBucketLimiter("test", rpm=60, tpm=0, state=_MemoryState())
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+
+    # The 61st request waits for one request's worth of refill: a second at 60 per minute
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+def test_tokens_bucket_waits_for_the_tokens_a_request_needs(clock):
+    limiter = TokenBucketLimiter("test", rpm=0, tpm=600, state=_MemoryState())
+    limiter.acquire(500)
+    limiter.acquire(200)
+
+    # 100 tokens were left, and 600 per minute refill 100 more in 10 seconds
+    assert sum(clock.sleeps) == pytest.approx(10.0)
+
+def test_usage_corrections_are_charged_to_the_bucket(clock):
+    limiter = TokenBucketLimiter("test", rpm=0, tpm=600, state=_MemoryState())
+    limiter.acquire(100)
+    limiter.adjust(500)
+    limiter.acquire(60)
+
+    assert sum(clock.sleeps) == pytest.approx(6.0)
+
+def test_a_block_holds_back_callers_sharing_the_state(clock, tmp_path):
+    state = _SqliteState(str(tmp_path / "buckets.sqlite3"))
+    TokenBucketLimiter("test", rpm=60, tpm=0, state=state).block(3.0)
+
+    TokenBucketLimiter("test", rpm=60, tpm=0, state=state).acquire()
+
+    assert sum(clock.sleeps) == pytest.approx(3.0)
+
+def test_concurrency_halves_on_throttling_and_recovers_slowly():
+    concurrency = AdaptiveConcurrency(8)
+    concurrency.on_throttle()
+    concurrency.on_throttle()
+    assert concurrency.limit == 2.0
+
+    for _ in range(2):
+        concurrency.on_success()
+    assert int(concurrency.limit) == 2
+    for _ in range(20):
+        concurrency.on_success()
+    assert 5 < concurrency.limit < 8
+
+    for _ in range(200):
+        concurrency.on_success()
+    assert concurrency.limit == 8
+
+def test_concurrency_never_drops_below_one():
+    concurrency = AdaptiveConcurrency(2)
+    for _ in range(5):
+        concurrency.on_throttle()
+    assert concurrency.limit == 1.0
+
+def test_retry_after_seconds_and_milliseconds():
+    assert _parse_retry_after({"retry-after": "7"}) == 7.0
+    assert _parse_retry_after({"retry-after-ms": "1500", "retry-after": "7"}) == 1.5
+    assert _parse_retry_after({"retry-after": "soon"}) is None
+    assert _parse_retry_after({}) is None
+    assert _parse_retry_after(None) is None
+
+def test_retry_after_http_date(clock):
+    later = datetime.fromtimestamp(clock.now + 30, tz=timezone.utc)
+    earlier = datetime.fromtimestamp(clock.now - 30, tz=timezone.utc)
+
+    assert _parse_retry_after({"retry-after": format_datetime(later, usegmt=True)}) == pytest.approx(30.0)
+    assert _parse_retry_after({"retry-after": format_datetime(earlier, usegmt=True)}) == 0.0
+
+@pytest.mark.parametrize("error, expected", [
+    (HTTPError(429, {"retry-after": "2"}), (True, True, 2.0)),
+    (HTTPError(503), (True, False, None)),
+    (HTTPError(408), (True, False, None)),
+    (HTTPError(400), (False, False, None)),
+    (APIConnectionError("reset"), (True, False, None)),
+    (ValueError("bad input"), (False, False, None)),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+def test_throttled_calls_wait_for_retry_after_and_halve_concurrency(clock, registry):
+    replies = [HTTPError(429, {"retry-after": "4"}), "ok"]
+
+    def call():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert rate_limit.call_with_limits("test", call) == "ok"
+    assert sum(clock.sleeps) == pytest.approx(4.0)
+    # Halved from 8, then a quarter slot back for the successful retry
+    assert rate_limit.get_concurrency("test").limit == 4.25
+
+def test_client_errors_are_not_retried(clock, registry):
+    def call():
+        raise HTTPError(400)
+
+    with pytest.raises(HTTPError):
+        rate_limit.call_with_limits("test", call)
+    assert clock.sleeps == []
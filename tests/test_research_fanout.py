@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("swarm")
+
+from agents.research_agent import build_subqueries, merge_results
+
+def result(link, snippet=None, title="Page"):
+    return {"link": link, "snippet": snippet or f"About {link}", "title": title}
+
+def test_the_same_page_under_url_variants_is_merged_and_ranked_first():
+    merged = merge_results([
+        [result("https://a.example/one"), result("https://example.com/page/")],
+        [result("https://b.example/two"), result("http://www.example.com/page?utm_source=x#top")],
+    ])
+
+    links = [item["link"] for item in merged]
+    # Found by both queries, so it outranks pages each query put first
+    assert links[0] == "https://example.com/page/"
+    assert len(links) == 3
+
+def test_syndicated_copies_are_merged_by_snippet():
+    merged = merge_results([
+        [result("https://news.example/story", "Caches trade memory, for time!")],
+        [result("https://mirror.example/copy", "caches trade memory for time")],
+    ])
+
+    assert [item["link"] for item in merged] == ["https://news.example/story"]
+
+def test_results_without_links_are_dropped_and_the_limit_applies():
+    merged = merge_results([[{"title": "No link"}] + [result(f"https://example.com/{i}") for i in range(5)]], limit=3)
+
+    assert [item["link"] for item in merged] == [f"https://example.com/{i}" for i in range(3)]
+
+def test_query_parameters_other_than_tracking_keep_pages_apart():
+    merged = merge_results([[result("https://example.com/search?q=a"), result("https://example.com/search?q=b")]])
+
+    assert len(merged) == 2
+
+def test_subqueries_start_with_the_bare_title():
+    assert build_subqueries("Caching", 2) == ["Caching", "Caching research findings"]
+    assert build_subqueries("Caching", 0) == ["Caching"]
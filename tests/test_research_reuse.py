@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("swarm")
+
+import main
+from database.db_utils import insert_research_with_embedding
+from utils.vector_index import VectorIndex
+
+EMBEDDING = [0.6, 0.8, 0.0]
+
+class NoLLM:
+    """A Swarm client that fails the test if the pipeline asks a model anything."""
+
+    def run(self, **kwargs):
+        raise AssertionError(f"Unexpected call to {kwargs['agent'].name}")
+
+@pytest.fixture
+def stored_research(supabase, monkeypatch):
+    monkeypatch.setattr(main, "research_index", VectorIndex())
+    monkeypatch.setattr(main, "generate_embedding", lambda text: EMBEDDING)
+    return insert_research_with_embedding("Caching", "Caches trade memory for time.", "https://example.com/a", EMBEDDING, 1)
+
+def test_research_rows_record_their_creation_date(supabase, stored_research):
+    row = supabase.tables["research"][0]
+    assert main._age_days(row) < 1
+
+def test_close_fresh_research_is_reused_without_calling_the_model(supabase, stored_research):
+    research = main.run_research(NoLLM(), "Caching")
+
+    assert research["source"] == "reused"
+    assert research["reused_research_ids"] == [stored_research]
+    assert research["research_text"] == "Caches trade memory for time."
+    assert main.save_research(research, 2) == stored_research
+    assert len(supabase.tables["research"]) == 1
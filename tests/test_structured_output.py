@@ -0,0 +1,55 @@
+from utils.structured_output import (
+    ArticleResult, IdeaResult, ResearchResult, StructuredOutputError, loads_tolerant, parse_structured, validate
+)
+import pytest
+
+@pytest.mark.parametrize("raw, expected", [
+    ('{"idea_title": "A", "description": "B"}', {"idea_title": "A", "description": "B"}),
+    ('```json\n{"idea_title": "A"}\n```', {"idea_title": "A"}),
+    ('Here is the idea:\n{"idea_title": "A"}\nHope this helps!', {"idea_title": "A"}),
+    ("{'idea_title': 'A', 'description': 'B'}", {"idea_title": "A", "description": "B"}),
+    ('{"references": ["a", "b",],}', {"references": ["a", "b"]}),
+    ('{"done": True, "score": None}', {"done": True, "score": None}),
+    ('{"article_text": "Line one\nLine "two"\tend"}', {"article_text": 'Line one\nLine "two"\tend'}),
+    ("{'article_text': 'It\\'s fine'}", {"article_text": "It's fine"}),
+    ('{"article_text": "Keep, commas: and }brackets] inside"}', {"article_text": "Keep, commas: and }brackets] inside"}),
+])
+def test_loads_tolerant_fixes_common_breakages(raw, expected):
+    assert loads_tolerant(raw) == expected
+
+@pytest.mark.parametrize("raw", ["", "no json here", '["a", "b"]', '{"idea_title": '])
+def test_loads_tolerant_rejects_what_it_cannot_fix(raw):
+    with pytest.raises(StructuredOutputError):
+        loads_tolerant(raw)
+
+def test_validate_joins_lists_and_fills_defaults():
+    result = validate({"research_title": "T", "research_description": "D", "references": ["a", "b"]}, ResearchResult)
+    assert result == ResearchResult("T", "D", "a, b")
+    assert validate({"research_title": "T", "research_description": "D"}, ResearchResult).references == ""
+
+def test_validate_requires_non_empty_fields():
+    with pytest.raises(StructuredOutputError, match="description"):
+        validate({"idea_title": "A", "description": ""}, IdeaResult)
+
+def test_parse_structured_repairs_once():
+    calls = []
+
+    def repair(raw, schema, error):
+        calls.append(raw)
+        return '{"article_title": "T", "article_text": "Body"}'
+
+    assert parse_structured("not json", ArticleResult, repair) == ArticleResult("T", "Body")
+    assert calls == ["not json"]
+
+def test_parse_structured_skips_the_repair_for_tolerable_output():
+    def repair(raw, schema, error):
+        raise AssertionError("repair should not be called")
+
+    assert parse_structured("{'article_title': 'T', 'article_text': 'Body',}", ArticleResult, repair) == ArticleResult("T", "Body")
+
+def test_parse_structured_fails_when_the_repair_fails():
+    def repair(raw, schema, error):
+        raise RuntimeError("service unavailable")
+
+    with pytest.raises(StructuredOutputError, match="repair failed"):
+        parse_structured("not json", ArticleResult, repair)
@@ -0,0 +1,97 @@
+from database.write_behind import WriteBehindQueue, resolve_id
+import itertools
+import threading
+import pytest
+
+class FakeTables:
+    """Records bulk inserts and hands out increasing IDs; fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.inserts = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def insert_rows(self, table, rows):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("database unavailable")
+            self.inserts.append((table, rows))
+            return [dict(row, id=next(self._ids)) for row in rows]
+
+def test_flush_writes_each_table_in_one_bulk_insert():
+    tables = FakeTables()
+    queue = WriteBehindQueue(tables.insert_rows, flush_interval=60)
+    ids = [queue.submit("ideation", {"idea_title": f"Idea {index}"}) for index in range(3)]
+    assert not any(pending_id.done() for pending_id in ids)
+
+    queue.flush()
+    queue.close()
+
+    assert [resolve_id(pending_id) for pending_id in ids] == [1, 2, 3]
+    assert [(table, len(rows)) for table, rows in tables.inserts] == [("ideation", 3)]
+
+def test_foreign_keys_are_resolved_before_insert():
+    tables = FakeTables()
+    queue = WriteBehindQueue(tables.insert_rows, flush_interval=60)
+    idea_id = queue.submit("ideation", {"idea_title": "Idea"})
+    research_id = queue.submit("research", {"ideation_id": idea_id})
+    article_id = queue.submit("writer", {"ideation_id": idea_id, "research_id": research_id})
+
+    queue.close()
+
+    # Tables are flushed parents first, with pending IDs replaced by the inserted ones
+    assert tables.inserts == [
+        ("ideation", [{"idea_title": "Idea"}]),
+        ("research", [{"ideation_id": 1}]),
+        ("writer", [{"ideation_id": 1, "research_id": 2}]),
+    ]
+    assert int(article_id) == 3
+
+def test_batch_is_flushed_when_full():
+    tables = FakeTables()
+    queue = WriteBehindQueue(tables.insert_rows, max_batch=2, flush_interval=60)
+    ids = [queue.submit("chunks", {"text": "a"}), queue.submit("chunks", {"text": "b"})]
+
+    assert [pending_id.result(timeout=5) for pending_id in ids] == [1, 2]
+    queue.close()
+
+def test_failed_insert_is_retried():
+    tables = FakeTables(failures=1)
+    queue = WriteBehindQueue(tables.insert_rows, flush_interval=60, max_retries=1)
+    pending_id = queue.submit("ideation", {"idea_title": "Idea"})
+
+    queue.close()
+
+    assert pending_id.result() == 1
+    assert len(tables.inserts) == 1
+
+def test_rows_fail_when_retries_are_exhausted():
+    tables = FakeTables(failures=1)
+    queue = WriteBehindQueue(tables.insert_rows, flush_interval=60, max_retries=0)
+    idea_id = queue.submit("ideation", {"idea_title": "Idea"})
+    research_id = queue.submit("research", {"ideation_id": idea_id})
+    callbacks = []
+    idea_id.add_done_callback(callbacks.append)
+
+    queue.flush()
+
+    with pytest.raises(RuntimeError, match="database unavailable"):
+        idea_id.result()
+    # Rows that reference a failed row fail with it instead of being inserted
+    with pytest.raises(RuntimeError, match="database unavailable"):
+        research_id.result()
+    assert tables.inserts == []
+    assert callbacks == []
+
+    # The queue keeps working after a failed batch
+    retried_id = queue.submit("ideation", {"idea_title": "Again"})
+    queue.close()
+    assert retried_id.result() == 1
+
+def test_submit_after_close_raises():
+    queue = WriteBehindQueue(FakeTables().insert_rows)
+    queue.close()
+    with pytest.raises(RuntimeError):
+        queue.submit("ideation", {})
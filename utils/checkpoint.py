@@ -0,0 +1,66 @@
+from datetime import datetime
+from utils.config import CHECKPOINT_DIR
+import json
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def new_run_id():
+    """Return a new, sortable run id."""
+    return f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+class CheckpointStore:
+    """
+    Local store of per-run pipeline checkpoints.
+
+    Each run is one JSON file named after its run id. It maps stage names
+    to the output that stage produced. Files are replaced atomically, so a
+    crash mid-write never leaves a half-written checkpoint.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, run_id):
+        return os.path.join(self.directory, f"{run_id}.json")
+
+    def load(self, run_id):
+        """
+        Load the checkpoint of a run.
+
+        Args:
+            run_id (str): The run id.
+
+        Returns:
+            dict: The checkpoint with 'run_id', 'topic' and 'stages', or None if the run has none.
+        """
+        try:
+            with open(self._path(run_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_stage(self, run_id, topic, stage, data):
+        """
+        Record a completed stage of a run.
+
+        Args:
+            run_id (str): The run id.
+            topic (str): The run's topic.
+            stage (str): The stage name.
+            data (dict): JSON-serializable stage output, including any DB ids.
+        """
+        with self._lock:
+            checkpoint = self.load(run_id) or {"run_id": run_id, "topic": topic, "stages": {}}
+            checkpoint["stages"][stage] = data
+            checkpoint["updated_at"] = datetime.utcnow().isoformat()
+            tmp_path = f"{self._path(run_id)}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f, indent=2)
+            os.replace(tmp_path, self._path(run_id))
+        logger.info(f"Checkpointed stage '{stage}' for run {run_id}.")
@@ -0,0 +1,160 @@
+from utils.token_utils import count_tokens
+from utils.embedding_utils import EMBEDDING_MODEL, MAX_INPUT_TOKENS, generate_embedding, generate_embeddings
+from utils.config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_EMBED_BATCH, CHUNK_EMBEDDINGS
+import logging
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def iter_sections(text):
+    """Yield the markdown sections of text, each starting at a heading (the first may have none)."""
+    start = 0
+    for match in _HEADING.finditer(text):
+        if match.start() > start and text[start:match.start()].strip():
+            yield text[start:match.start()].strip()
+        start = match.start()
+    if text[start:].strip():
+        yield text[start:].strip()
+
+def _iter_spans(text, pattern):
+    start = 0
+    for match in pattern.finditer(text):
+        if text[start:match.start()].strip():
+            yield text[start:match.start()].strip()
+        start = match.end()
+    if text[start:].strip():
+        yield text[start:].strip()
+
+def _split_words(text, max_tokens, model):
+    """Split text that has no usable sentence breaks into runs of words under max_tokens."""
+    words, tokens = [], 0
+    for word in text.split():
+        word_tokens = count_tokens(word, model) + 1
+        if words and tokens + word_tokens > max_tokens:
+            yield " ".join(words), tokens
+            words, tokens = [], 0
+        words.append(word)
+        tokens += word_tokens
+    if words:
+        yield " ".join(words), tokens
+
+def _iter_units(section, max_tokens, model):
+    """Yield (text, tokens) pieces of a section: paragraphs, or sentences and word runs of paragraphs too long to fit."""
+    for paragraph in _iter_spans(section, _PARAGRAPH_BREAK):
+        tokens = count_tokens(paragraph, model)
+        if tokens <= max_tokens:
+            yield paragraph, tokens
+            continue
+        for sentence in _iter_spans(paragraph, _SENTENCE_END):
+            tokens = count_tokens(sentence, model)
+            if tokens <= max_tokens:
+                yield sentence, tokens
+            else:
+                yield from _split_words(sentence, max_tokens, model)
+
+def chunk_text(text, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, model=EMBEDDING_MODEL):
+    """
+    Split markdown text into chunks of at most max_tokens tokens.
+
+    Chunks follow section boundaries: consecutive small sections share a
+    chunk, and a section too long for one chunk is split at paragraphs,
+    then sentences, then words. Consecutive chunks of the same section
+    repeat up to overlap_tokens tokens of trailing context. This is a
+    generator and only holds the section being chunked, so long texts are
+    never copied whole.
+
+    Args:
+        text (str): The text to chunk.
+        max_tokens (int): Token budget of a chunk.
+        overlap_tokens (int): Tokens of the previous chunk repeated at the start of the next.
+        model (str): Model whose tokenizer counts the tokens.
+
+    Yields:
+        str: The chunks, in order.
+    """
+    current, current_tokens = [], 0
+    for section in iter_sections(text or ""):
+        section_tokens = count_tokens(section, model)
+        if current and current_tokens + section_tokens <= max_tokens:
+            current.append((section, section_tokens))
+            current_tokens += section_tokens
+            continue
+        if current:
+            yield "\n\n".join(unit for unit, _ in current)
+            current, current_tokens = [], 0
+        if section_tokens <= max_tokens:
+            current, current_tokens = [(section, section_tokens)], section_tokens
+            continue
+
+        for unit, tokens in _iter_units(section, max_tokens, model):
+            if current and current_tokens + tokens > max_tokens:
+                yield "\n\n".join(unit for unit, _ in current)
+                # Carry trailing units of the previous chunk into the next one as overlap
+                overlap, overlap_total = [], 0
+                for previous, previous_tokens in reversed(current):
+                    if overlap_total + previous_tokens > overlap_tokens or overlap_total + previous_tokens + tokens > max_tokens:
+                        break
+                    overlap.insert(0, (previous, previous_tokens))
+                    overlap_total += previous_tokens
+                current, current_tokens = overlap, overlap_total
+            current.append((unit, tokens))
+            current_tokens += tokens
+        # A split section is not merged with the next one
+        yield "\n\n".join(unit for unit, _ in current)
+        current, current_tokens = [], 0
+    if current:
+        yield "\n\n".join(unit for unit, _ in current)
+
+def embed_chunks(text, batch_size=CHUNK_EMBED_BATCH):
+    """
+    Chunk text and embed the chunks in batched requests.
+
+    Yields:
+        dict: 'chunk_index', 'content' and 'embedding' (None if embedding failed) per chunk.
+    """
+    batch = []
+    index = 0
+    for chunk in chunk_text(text):
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            for content, embedding in zip(batch, generate_embeddings(batch)):
+                yield {"chunk_index": index, "content": content, "embedding": embedding}
+                index += 1
+            batch = []
+    if batch:
+        for content, embedding in zip(batch, generate_embeddings(batch)):
+            yield {"chunk_index": index, "content": content, "embedding": embedding}
+            index += 1
+
+def pool_embeddings(embeddings):
+    """Mean of the embeddings, normalized to unit length; None if there are none."""
+    embeddings = [embedding for embedding in embeddings if embedding is not None]
+    if not embeddings:
+        return None
+    mean = np.asarray(embeddings, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
+
+def embed_document(text, store_chunks=CHUNK_EMBEDDINGS):
+    """
+    Embed a document, chunking it when asked to or when it is too long for one request.
+
+    Args:
+        text (str): The document text.
+        store_chunks (bool): Also return chunk embeddings for a document that fits in one request.
+
+    Returns:
+        tuple: (document embedding or None, list of chunk dicts from embed_chunks).
+        A document over the model's input limit gets the pooled vector of its chunks.
+    """
+    fits = count_tokens(text, EMBEDDING_MODEL) <= MAX_INPUT_TOKENS
+    chunks = list(embed_chunks(text)) if store_chunks or not fits else []
+    if fits:
+        return generate_embedding(text), chunks
+    logger.info(f"Text exceeds the {MAX_INPUT_TOKENS}-token embedding limit; pooling {len(chunks)} chunk embeddings.")
+    return pool_embeddings(chunk["embedding"] for chunk in chunks), chunks
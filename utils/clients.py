@@ -0,0 +1,78 @@
+"""
+Process-wide registry of lazily created service clients.
+
+Every module gets its OpenAI, Supabase, HTTP and Swarm clients from here,
+so each service has one keep-alive connection pool per process. Nothing is
+imported or connected until a client is first used, which keeps importing
+main (and Streamlit reruns) cheap.
+"""
+from utils.config import SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY, HTTP_POOL_SIZE
+import threading
+
+_clients = {}
+_factories = {}
+_lock = threading.RLock()
+
+def register(name, factory):
+    """Register factory() as the way to build the named client on first use."""
+    with _lock:
+        _factories[name] = factory
+
+def get(name):
+    """Return the named client, creating it on first use."""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            if name not in _factories:
+                raise KeyError(f"No client registered under '{name}'.")
+            _clients[name] = _factories[name]()
+        return _clients[name]
+
+def set_client(name, client):
+    """Use client for name from now on, e.g. to inject a fake or a preconfigured client."""
+    with _lock:
+        _clients[name] = client
+
+def reset(name=None):
+    """Forget one or all created clients so they are rebuilt on next use."""
+    with _lock:
+        if name is None:
+            _clients.clear()
+        else:
+            _clients.pop(name, None)
+
+def _create_openai():
+    from openai import OpenAI
+    # Retries are left to utils.rate_limit, which shares backoff across callers
+    return OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+def _create_supabase():
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def _create_http_session():
+    from utils.http_cache import create_session
+    return create_session(HTTP_POOL_SIZE)
+
+def _create_swarm():
+    from swarm import Swarm
+    return Swarm(client=get("openai"))
+
+register("openai", _create_openai)
+register("supabase", _create_supabase)
+register("http", _create_http_session)
+register("swarm", _create_swarm)
+
+def get_openai():
+    return get("openai")
+
+def get_supabase():
+    return get("supabase")
+
+def get_http_session():
+    return get("http")
+
+def get_swarm():
+    return get("swarm")
@@ -0,0 +1,157 @@
+from utils.token_utils import count_tokens
+from utils.embedding_utils import generate_embeddings
+from utils.vector_index import unit_vectors
+from utils.config import WRITER_RESEARCH_TOKEN_BUDGET, RESEARCH_DEDUPE_SIMILARITY
+import logging
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Model whose tokenizer measures the writer prompt
+WRITER_MODEL = "gpt-4o"
+
+# Passages longer than this are split into sentences so ranking can drop their weaker parts
+MAX_PASSAGE_TOKENS = 120
+
+# Share of the budget that references no passage cites may take; the rest is kept for passages
+MAX_UNCITED_REFERENCE_SHARE = 0.25
+
+_CITATION = re.compile(r"\[(\d+)\]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_NUMBERED_REFERENCE = re.compile(r"^\s*\[?(\d+)[\].)]\s*")
+
+def split_passages(text):
+    """Split research text into passages: lines, or sentences of lines longer than MAX_PASSAGE_TOKENS."""
+    passages = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if count_tokens(line, WRITER_MODEL) <= MAX_PASSAGE_TOKENS:
+            passages.append(line)
+        else:
+            passages.extend(sentence for sentence in _SENTENCE_END.split(line) if sentence.strip())
+    return passages
+
+def parse_references(references):
+    """
+    Split a references string into a list, ordered as cited: reference n is at index n - 1.
+
+    Accepts comma-separated or one-per-line references, optionally numbered '[n]'.
+    """
+    if not references:
+        return []
+    parts = references.splitlines() if "\n" in references.strip() else references.split(",")
+    return [_NUMBERED_REFERENCE.sub("", part).strip() for part in parts if part.strip()]
+
+def _normalize(passage):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", _CITATION.sub("", passage).lower())).strip()
+
+def _dedupe(passages, vectors):
+    """Indexes of passages to keep: the first of each exact or near-duplicate group."""
+    kept, seen = [], set()
+    for index, passage in enumerate(passages):
+        key = _normalize(passage)
+        if not key or key in seen:
+            continue
+        if vectors is not None and kept and float(np.max(vectors[kept] @ vectors[index])) >= RESEARCH_DEDUPE_SIMILARITY:
+            continue
+        seen.add(key)
+        kept.append(index)
+    return kept
+
+def _trim_references(reference_list, budget_tokens):
+    """Keep leading references while they fit in budget_tokens, one per line."""
+    kept, used = [], 0
+    for reference in reference_list:
+        tokens = count_tokens(reference, WRITER_MODEL) + 1
+        if used + tokens > budget_tokens:
+            break
+        kept.append(reference)
+        used += tokens
+    return "\n".join(kept)
+
+def compact_research(research_text, references, idea_text, budget_tokens=WRITER_RESEARCH_TOKEN_BUDGET):
+    """
+    Fit research into a token budget for the writer prompt.
+
+    Research already within budget is returned unchanged, with no embedding
+    calls. Otherwise duplicate and near-duplicate passages are dropped, the
+    rest are ranked by embedding similarity to the idea and the best are
+    kept, in their original order, until the budget is used. Passages citing
+    references as [n] keep their citations. Cited references are kept and
+    renumbered in order, and uncited ones are dropped. If the text cites
+    nothing, the references are kept up to MAX_UNCITED_REFERENCE_SHARE of
+    the budget. The most relevant passage is always kept, so the writer
+    never gets an empty research body.
+
+    Args:
+        research_text (str): The research findings.
+        references (str): Comma- or newline-separated references.
+        idea_text (str): The idea the article is about.
+        budget_tokens (int): Token budget for the research text plus references.
+
+    Returns:
+        dict: 'research_text', 'references', 'tokens' (after compaction),
+        'original_tokens' and 'dropped_passages'.
+    """
+    original_tokens = count_tokens(research_text, WRITER_MODEL) + count_tokens(references, WRITER_MODEL)
+    unchanged = {
+        "research_text": research_text, "references": references,
+        "tokens": original_tokens, "original_tokens": original_tokens, "dropped_passages": 0
+    }
+    passages = split_passages(research_text or "")
+    if original_tokens <= budget_tokens or not passages:
+        return unchanged
+
+    embeddings = generate_embeddings([idea_text] + passages)
+    if embeddings[0] is None or any(embedding is None for embedding in embeddings[1:]):
+        # Without embeddings, fall back to deduplicating and keeping passages in their original order
+        logger.warning("Could not embed research passages; compacting without relevance ranking.")
+        vectors, scores = None, np.zeros(len(passages))
+    else:
+        matrix = unit_vectors(embeddings)
+        vectors, scores = matrix[1:], matrix[1:] @ matrix[0]
+
+    reference_list = parse_references(references)
+    cites_any = any(_CITATION.search(passage) for passage in passages)
+    remaining = budget_tokens
+    if not cites_any:
+        # Uncited references come out of the budget up front, capped so they cannot crowd out the passages
+        reference_budget = int(budget_tokens * MAX_UNCITED_REFERENCE_SHARE)
+        if count_tokens(references, WRITER_MODEL) > reference_budget:
+            references = _trim_references(reference_list, reference_budget)
+        remaining -= count_tokens(references, WRITER_MODEL)
+
+    candidates = _dedupe(passages, vectors)
+    selected = []
+    for index in sorted(candidates, key=lambda index: -scores[index]):
+        tokens = count_tokens(passages[index], WRITER_MODEL)
+        if cites_any:
+            # Cited references each cost about a line in the prompt
+            tokens += sum(count_tokens(reference_list[int(n) - 1], WRITER_MODEL) + 2
+                          for n in set(_CITATION.findall(passages[index])) if 0 < int(n) <= len(reference_list))
+        if tokens <= remaining or not selected:
+            selected.append(index)
+            remaining -= tokens
+    selected.sort()
+
+    kept_passages = [passages[index] for index in selected]
+    if cites_any:
+        numbering = {}
+        for passage in kept_passages:
+            for n in _CITATION.findall(passage):
+                if 0 < int(n) <= len(reference_list) and n not in numbering:
+                    numbering[n] = len(numbering) + 1
+        renumber = lambda match: f"[{numbering[match.group(1)]}]" if match.group(1) in numbering else ""
+        kept_passages = [_CITATION.sub(renumber, passage) for passage in kept_passages]
+        references = "\n".join(f"[{new}] {reference_list[int(old) - 1]}" for old, new in numbering.items())
+
+    research_text = "\n".join(kept_passages)
+    tokens = count_tokens(research_text, WRITER_MODEL) + count_tokens(references, WRITER_MODEL)
+    logger.info(f"Compacted research from {original_tokens} to {tokens} tokens, keeping {len(selected)} of {len(passages)} passages.")
+    return {
+        "research_text": research_text, "references": references,
+        "tokens": tokens, "original_tokens": original_tokens, "dropped_passages": len(passages) - len(selected)
+    }
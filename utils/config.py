@@ -7,3 +7,116 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+
+# Maximum number of topic pipelines run_batch keeps in flight at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# On-disk embedding cache; set EMBEDDING_CACHE_PATH to an empty string to disable it
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# How long concurrent generate_embedding calls wait to be merged into one request; 0 disables merging
+EMBEDDING_COALESCE_WINDOW_MS = float(os.getenv("EMBEDDING_COALESCE_WINDOW_MS", "10"))
+
+# Directory holding per-run pipeline checkpoints used to resume failed runs
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", ".cache/checkpoints")
+
+# Ideas at least this similar (cosine) to a stored idea are treated as duplicates
+IDEA_SIMILARITY_THRESHOLD = float(os.getenv("IDEA_SIMILARITY_THRESHOLD", "0.92"))
+# How many times a duplicate idea is regenerated before the run is rejected
+IDEA_MAX_REGENERATIONS = int(os.getenv("IDEA_MAX_REGENERATIONS", "2"))
+# Candidate ideas requested in one ideation call (1 asks for a single idea), the weight of
+# novelty against diversity when ranking them, and how many top candidates --fanout runs
+IDEA_CANDIDATES = int(os.getenv("IDEA_CANDIDATES", "1"))
+IDEA_DIVERSITY_WEIGHT = float(os.getenv("IDEA_DIVERSITY_WEIGHT", "0.7"))
+IDEA_FANOUT = int(os.getenv("IDEA_FANOUT", "3"))
+# Use the approximate (inverted-file) vector index instead of exact search
+VECTOR_INDEX_APPROXIMATE = os.getenv("VECTOR_INDEX_APPROXIMATE", "false").lower() == "true"
+
+# SerpAPI response cache: fresh for SERPAPI_CACHE_TTL seconds, then served stale while
+# revalidating for SERPAPI_CACHE_STALE_TTL more; an empty path disables the cache
+SERPAPI_CACHE_PATH = os.getenv("SERPAPI_CACHE_PATH", ".cache/serpapi.sqlite3")
+SERPAPI_CACHE_TTL = int(os.getenv("SERPAPI_CACHE_TTL", str(24 * 3600)))
+SERPAPI_CACHE_STALE_TTL = int(os.getenv("SERPAPI_CACHE_STALE_TTL", str(6 * 24 * 3600)))
+SERPAPI_TIMEOUT = float(os.getenv("SERPAPI_TIMEOUT", "20"))
+# Keep-alive connections held open to each HTTP host
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Research fan-out: number of concurrent SerpAPI sub-queries per idea and merged results kept.
+# Every sub-query that misses the cache is a billed search, so research costs this many searches per idea
+RESEARCH_SUBQUERIES = int(os.getenv("RESEARCH_SUBQUERIES", "2"))
+RESEARCH_MAX_RESULTS = int(os.getenv("RESEARCH_MAX_RESULTS", "10"))
+
+# Embedding storage format for inserts: 'json' (list of floats, for pgvector columns) or the
+# compact 'float32', 'float16' and 'int8' base64 encodings, which need text columns
+EMBEDDING_STORAGE_FORMAT = os.getenv("EMBEDDING_STORAGE_FORMAT", "json")
+
+# Swarm run cache: 'off', 'readwrite', 'record' or 'replay' (fails on a miss, for offline runs)
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite3")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "0")) or None
+# Stored responses kept before the least recently used are evicted; 0 keeps them all
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")) or None
+# Context variables left out of the cache key; they never reach the prompt
+LLM_CACHE_IGNORE_CONTEXT_KEYS = [key for key in os.getenv("LLM_CACHE_IGNORE_CONTEXT_KEYS", "ideation_id,research_id").split(",") if key]
+
+# Structured span trace (one JSON object per line) and Prometheus /metrics port; empty/0 disables
+METRICS_TRACE_PATH = os.getenv("METRICS_TRACE_PATH", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Chunked embeddings of article and research text, stored in the chunks table when enabled.
+# Texts over the embedding input limit are always chunked and get the pooled vector of their chunks.
+CHUNK_EMBEDDINGS = os.getenv("CHUNK_EMBEDDINGS", "false").lower() == "true"
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+CHUNK_EMBED_BATCH = int(os.getenv("CHUNK_EMBED_BATCH", "64"))
+
+# Retrieval-first research: stored research at least RESEARCH_REUSE_THRESHOLD similar to the idea title
+# (and at most RESEARCH_REUSE_MAX_AGE_DAYS old; 0 = any age) is reused as is. Matches above
+# RESEARCH_AUGMENT_THRESHOLD are adapted by the research agent without a web search.
+RESEARCH_REUSE_ENABLED = os.getenv("RESEARCH_REUSE_ENABLED", "true").lower() == "true"
+RESEARCH_REUSE_THRESHOLD = float(os.getenv("RESEARCH_REUSE_THRESHOLD", "0.92"))
+RESEARCH_AUGMENT_THRESHOLD = float(os.getenv("RESEARCH_AUGMENT_THRESHOLD", "0.86"))
+RESEARCH_REUSE_MAX_AGE_DAYS = float(os.getenv("RESEARCH_REUSE_MAX_AGE_DAYS", "30"))
+RESEARCH_REUSE_CANDIDATES = int(os.getenv("RESEARCH_REUSE_CANDIDATES", "3"))
+
+# Provider rate limits per minute (0 disables a limit). Set RATE_LIMIT_STATE_PATH to share the
+# budget between worker processes through a SQLite file; empty keeps it per process.
+OPENAI_CHAT_RPM = int(os.getenv("OPENAI_CHAT_RPM", "500"))
+OPENAI_CHAT_TPM = int(os.getenv("OPENAI_CHAT_TPM", "30000"))
+OPENAI_EMBEDDING_RPM = int(os.getenv("OPENAI_EMBEDDING_RPM", "3000"))
+OPENAI_EMBEDDING_TPM = int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))
+SERPAPI_RPM = int(os.getenv("SERPAPI_RPM", "60"))
+RATE_LIMIT_STATE_PATH = os.getenv("RATE_LIMIT_STATE_PATH", "")
+# Completion tokens charged up front for a chat call without max_tokens; corrected from its usage
+CHAT_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("CHAT_COMPLETION_TOKEN_ESTIMATE", "1000"))
+# Retries of throttled or transient failures, with jittered backoff in seconds
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1"))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+# Upper bound of each provider's adaptive concurrency limit in a process
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "16"))
+
+# Token budget for research text plus references in the writer prompt; larger research is compacted
+WRITER_RESEARCH_TOKEN_BUDGET = int(os.getenv("WRITER_RESEARCH_TOKEN_BUDGET", "3000"))
+# Research passages at least this similar to a kept passage are dropped as near-duplicates
+RESEARCH_DEDUPE_SIMILARITY = float(os.getenv("RESEARCH_DEDUPE_SIMILARITY", "0.95"))
+
+# Editor stage: local checks first, LLM section patches only for articles that fail them.
+# The defaults pass a typical Writer Agent article: a title, one or more body sections plus the
+# Practical Exercise and References sections, and references in any layout
+EDITOR_ENABLED = os.getenv("EDITOR_ENABLED", "true").lower() == "true"
+EDITOR_MAX_ROUNDS = int(os.getenv("EDITOR_MAX_ROUNDS", "2"))
+EDITOR_MIN_WORDS = int(os.getenv("EDITOR_MIN_WORDS", "300"))
+EDITOR_MAX_WORDS = int(os.getenv("EDITOR_MAX_WORDS", "3000"))
+EDITOR_MIN_SECTIONS = int(os.getenv("EDITOR_MIN_SECTIONS", "3"))
+EDITOR_MIN_REFERENCES = int(os.getenv("EDITOR_MIN_REFERENCES", "2"))
+EDITOR_MIN_READABILITY = float(os.getenv("EDITOR_MIN_READABILITY", "30"))
+
+# Pipeline orchestration: worker threads for off-critical-path stages and retries of failed LLM stages
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+PIPELINE_STAGE_RETRIES = int(os.getenv("PIPELINE_STAGE_RETRIES", "1"))
+
+# Articles read, joined and written per page by the corpus export (database/export.py)
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
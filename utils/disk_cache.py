@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How many writes go by between checks of the entry count against max_entries
+EVICTION_CHECK_INTERVAL = 64
+
+def make_key(*parts):
+    """
+    Build a content-addressed cache key from the given parts.
+
+    Args:
+        *parts: Strings (or values convertible to str) identifying the entry.
+
+    Returns:
+        str: Hex SHA-256 digest of the NUL-joined parts.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Persistent key/value cache backed by a single SQLite file.
+
+    Values are stored as raw bytes. When max_entries is set the least recently
+    used entries are evicted once the cache grows past it. SQLite's file
+    locking makes one cache file safe to share between processes.
+    """
+
+    def __init__(self, path, max_entries=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def get_with_age(self, key):
+        """
+        Return the cached bytes for key and their age in seconds.
+
+        Returns:
+            tuple: (value, age), or (None, None) on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None, None
+            now = time.time()
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0], now - row[1]
+
+    def set(self, key, value):
+        """Store bytes under key, evicting least recently used entries if needed."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), now, now)
+            )
+            self._writes += 1
+            if self.max_entries and self._writes % EVICTION_CHECK_INTERVAL == 0:
+                self._evict()
+            self._conn.commit()
+
+    def delete(self, key):
+        """Remove the entry for key, if any."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"Evicted {excess} entries from cache {self.path}")
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,139 @@
+import argparse
+import base64
+import json
+import logging
+import struct
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Storage formats: 'json' keeps the plain list of floats pgvector expects; the
+# others are prefixed base64 strings and need a text column
+FORMATS = ["json", "float32", "float16", "int8"]
+
+def pack_embedding(embedding, fmt="float32"):
+    """
+    Pack an embedding into raw bytes, e.g. for a binary column.
+
+    Args:
+        embedding (list): The embedding vector.
+        fmt (str): 'float32', 'float16' or 'int8' (a float32 scale followed
+            by the int8 values).
+
+    Returns:
+        bytes: The packed vector, little-endian.
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    if fmt == "float32":
+        return vector.astype("<f4").tobytes()
+    if fmt == "float16":
+        return vector.astype("<f2").tobytes()
+    if fmt == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        return struct.pack("<f", scale) + np.round(vector / scale).astype(np.int8).tobytes()
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+def encode_embedding(embedding, fmt="json"):
+    """
+    Encode an embedding for storage or transfer.
+
+    Args:
+        embedding (list): The embedding vector.
+        fmt (str): 'json' (list of floats), 'float32', 'float16' or 'int8'
+            (int8 values with a per-vector float32 scale).
+
+    Returns:
+        list or str: The list itself for 'json', otherwise a self-describing
+        '<format>:<base64>' string.
+    """
+    if fmt == "json":
+        return [float(value) for value in embedding]
+    return f"{fmt}:{base64.b64encode(pack_embedding(embedding, fmt)).decode('ascii')}"
+
+def decode_embedding(value):
+    """
+    Decode an embedding stored in any supported format.
+
+    Accepts lists, pgvector strings ('[0.1,0.2]') and '<format>:<base64>'
+    strings produced by encode_embedding.
+
+    Returns:
+        numpy.ndarray: The float32 vector.
+    """
+    if not isinstance(value, str):
+        return np.asarray(value, dtype=np.float32)
+    if value.startswith("["):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    fmt, _, encoded = value.partition(":")
+    payload = base64.b64decode(encoded)
+    if fmt == "float32":
+        return np.frombuffer(payload, dtype=np.float32).copy()
+    if fmt == "float16":
+        return np.frombuffer(payload, dtype=np.float16).astype(np.float32)
+    if fmt == "int8":
+        scale = struct.unpack("<f", payload[:4])[0]
+        return np.frombuffer(payload[4:], dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+def encoded_size(encoded):
+    """Return the number of bytes an encoded embedding takes on the wire."""
+    return len(json.dumps(encoded).encode("utf-8"))
+
+def recall_report(vectors, k=10, n_queries=100, seed=0):
+    """
+    Measure size and top-k recall of every format against float32 search.
+
+    Args:
+        vectors (array): Corpus of embeddings, one per row.
+        k (int): Neighbours compared per query.
+        n_queries (int): Corpus vectors used as queries.
+        seed (int): Seed for picking queries.
+
+    Returns:
+        list: One dict per format with 'format', 'bytes_per_vector',
+        'size_ratio' (relative to 'json') and 'recall_at_k'.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    k = min(k, len(vectors) - 1)
+
+    def top_k(matrix):
+        scores = vectors[queries] @ matrix.T
+        scores[np.arange(len(queries)), queries] = -np.inf  # ignore the query itself
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    reference = top_k(vectors)
+    json_size = None
+    report = []
+    for fmt in FORMATS:
+        encoded = [encode_embedding(vector, fmt) for vector in vectors]
+        decoded = np.stack([decode_embedding(value) for value in encoded])
+        found = top_k(decoded)
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(reference, found)])
+        size = np.mean([encoded_size(value) for value in encoded])
+        json_size = json_size or size
+        report.append({
+            "format": fmt,
+            "bytes_per_vector": round(float(size), 1),
+            "size_ratio": round(float(size / json_size), 3),
+            "recall_at_k": round(float(recall), 4)
+        })
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report size and recall of embedding storage formats.")
+    parser.add_argument("--table", help="Read embeddings from this Supabase table instead of generating random ones.")
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum number of embeddings to evaluate.")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of random embeddings.")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours compared per query.")
+    args = parser.parse_args()
+
+    if args.table:
+        from database.db_utils import fetch_embeddings_since
+        rows = fetch_embeddings_since(args.table, 0, args.limit)
+        corpus = np.stack([decode_embedding(row["embedding"]) for row in rows if row.get("embedding")])
+    else:
+        corpus = np.random.default_rng(0).normal(size=(args.limit, args.dim))
+    print(json.dumps(recall_report(corpus, k=args.k), indent=2))
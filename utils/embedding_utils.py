@@ -1,16 +1,184 @@
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
+from array import array
+from utils.disk_cache import DiskCache, make_key
+from utils.token_utils import count_tokens
+from utils.metrics import span, record_usage
+from utils.clients import get_openai
+from utils.rate_limit import call_with_limits
+from utils.config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_COALESCE_WINDOW_MS
+import threading
+import time
+import logging
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# API limits for a single embeddings request
+MAX_INPUT_TOKENS = 8191
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 300000
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """
+    Return the persistent cache of embeddings keyed by model and text, opening it on first use.
+
+    Returns:
+        DiskCache: The cache, or None when EMBEDDING_CACHE_PATH is empty.
+    """
+    global _embedding_cache
+    if _embedding_cache is None and EMBEDDING_CACHE_PATH:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = DiskCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES)
+    return _embedding_cache
+
+def _pack_embedding(embedding):
+    """Pack an embedding into compact float32 bytes."""
+    return array("f", embedding).tobytes()
+
+def _unpack_embedding(data):
+    """Unpack float32 bytes back into a list of floats."""
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+def _pack_batches(token_counts):
+    """
+    Split texts into request-sized batches given their token counts.
+
+    Yields:
+        list: Text indices, within the per-request input and token limits.
+    """
+    batch, batch_tokens = [], 0
+    for index, tokens in enumerate(token_counts):
+        if batch and (len(batch) >= MAX_BATCH_INPUTS or batch_tokens + tokens > MAX_BATCH_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def _fetch_embeddings(texts):
+    """
+    Embed texts through the API in as few requests as possible, caching the results.
+
+    Args:
+        texts (list): Non-empty texts; duplicates are sent once.
+
+    Returns:
+        dict: Embedding by text for every text that was embedded successfully.
+    """
+    pending, token_counts = [], []
+    for text in dict.fromkeys(texts):
+        tokens = count_tokens(text, EMBEDDING_MODEL)
+        if tokens > MAX_INPUT_TOKENS:
+            logger.error(f"Text of {len(text)} characters exceeds the {MAX_INPUT_TOKENS}-token embedding input limit.")
+            continue
+        pending.append(text)
+        token_counts.append(tokens)
+
+    embeddings, cache = {}, get_embedding_cache()
+    for batch in _pack_batches(token_counts):
+        try:
+            with span("embedding", texts=len(batch)):
+                response = call_with_limits(
+                    "openai.embeddings", get_openai().embeddings.create,
+                    tokens=sum(token_counts[i] for i in batch),
+                    input=[pending[i] for i in batch],
+                    model=EMBEDDING_MODEL
+                )
+                record_usage(EMBEDDING_MODEL, response.usage.total_tokens, embedding=True)
+        except Exception as e:
+            logger.error(f"Error generating embeddings for a batch of {len(batch)} texts: {e}")
+            continue
+        for item in response.data:
+            text = pending[batch[item.index]]
+            embeddings[text] = item.embedding
+            if cache is not None:
+                cache.set(make_key(EMBEDDING_MODEL, text), _pack_embedding(item.embedding))
+    return embeddings
+
+def generate_embeddings(texts):
+    """
+    Generate embeddings for many texts with as few API requests as possible.
+
+    Cached texts and duplicates are not sent. The remaining texts are packed
+    into requests up to the API's input-count and token limits.
+
+    Args:
+        texts (list): The input texts.
+
+    Returns:
+        list: One embedding per input text, in input order. An entry is None
+        if its text was empty, too long for the model, or its request failed.
+    """
+    texts = list(texts)
+    results = [None] * len(texts)
+    missing, cache = [], get_embedding_cache()
+    for index, text in enumerate(texts):
+        if not text:
+            continue
+        if cache is not None:
+            cached = cache.get(make_key(EMBEDDING_MODEL, text))
+            if cached is not None:
+                results[index] = _unpack_embedding(cached)
+                continue
+        missing.append(index)
+
+    if missing:
+        embeddings = _fetch_embeddings([texts[index] for index in missing])
+        for index in missing:
+            results[index] = embeddings.get(texts[index])
+    return results
+
+class _EmbeddingCoalescer:
+    """
+    Merge concurrent single-text embedding calls into one batched request.
+
+    The first caller in a window waits briefly for others to join. It then
+    embeds everything pending in one packed request and hands each waiting
+    caller its result.
+    """
+
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def embed(self, text):
+        slot = {"done": threading.Event(), "embedding": None}
+        with self._lock:
+            self._pending.append((text, slot))
+            leader = len(self._pending) == 1
+        if not leader:
+            slot["done"].wait()
+            return slot["embedding"]
+
+        time.sleep(self.window_seconds)
+        with self._lock:
+            batch, self._pending = self._pending, []
+        try:
+            embeddings = _fetch_embeddings([text for text, _ in batch if text])
+        except Exception as e:
+            logger.error(f"Error generating coalesced embeddings: {str(e)}")
+            embeddings = {}
+        for batch_text, waiting_slot in batch:
+            waiting_slot["embedding"] = embeddings.get(batch_text)
+            waiting_slot["done"].set()
+        return slot["embedding"]
+
+_coalescer = _EmbeddingCoalescer(EMBEDDING_COALESCE_WINDOW_MS / 1000) if EMBEDDING_COALESCE_WINDOW_MS > 0 else None
 
 def generate_embedding(text):
     """
     Generate embeddings for the given text using text-embedding-ada-002.
+
+    Results are cached on disk, and calls made concurrently (e.g. by
+    run_batch) are coalesced into a single batched request.
     
     Args:
         text (str): The input text for which embeddings are needed.
@@ -18,12 +186,16 @@ def generate_embedding(text):
     Returns:
         list: The embedding vector (1536-dimensional).
     """
-    try:
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-ada-002"
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        return None
+    if _coalescer is None or not text:
+        return generate_embeddings([text])[0]
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(make_key(EMBEDDING_MODEL, text))
+        if cached is not None:
+            return _unpack_embedding(cached)
+    return _coalescer.embed(text)
+
+def embedding_cache_stats():
+    """Return hit/miss counters of the embedding cache, or None when it is disabled."""
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else None
@@ -0,0 +1,76 @@
+from dataclasses import dataclass, field
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Kinds of progress events published by the pipeline
+STAGE_STARTED = "stage_started"
+STAGE_COMPLETED = "stage_completed"
+PARTIAL_OUTPUT = "partial_output"
+ERROR = "error"
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """
+    One step of a pipeline run.
+
+    data depends on the kind: STAGE_COMPLETED carries 'skipped' (True when
+    a resumed run reused the checkpoint), PARTIAL_OUTPUT carries 'text'
+    (the output decoded so far) and ERROR carries 'error'.
+    """
+    kind: str
+    run_id: str
+    stage: str = None
+    data: dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+class EventBus:
+    """
+    Synchronous publish/subscribe channel for progress events.
+
+    Subscribers are called on the publishing thread, in subscription order.
+    A subscriber that raises is logged and does not affect the pipeline or
+    the other subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, run_id=None):
+        """
+        Call callback(event) for every published event, or only for one run's events.
+
+        Returns:
+            callable: Removes the subscription when called.
+        """
+        subscription = (callback, run_id)
+        with self._lock:
+            self._subscribers.append(subscription)
+
+        def unsubscribe():
+            with self._lock:
+                if subscription in self._subscribers:
+                    self._subscribers.remove(subscription)
+        return unsubscribe
+
+    def has_subscribers(self, run_id):
+        """Return whether anything is listening to the run's events."""
+        with self._lock:
+            return any(subscribed in (None, run_id) for _, subscribed in self._subscribers)
+
+    def publish(self, kind, run_id, stage=None, **data):
+        """Build a ProgressEvent and deliver it to the matching subscribers."""
+        event = ProgressEvent(kind, run_id, stage, data)
+        with self._lock:
+            subscribers = [callback for callback, subscribed in self._subscribers if subscribed in (None, run_id)]
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Progress event subscriber failed on {kind} event: {str(e)}")
+        return event
+
+progress_events = EventBus()
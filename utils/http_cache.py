@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from utils.disk_cache import DiskCache, make_key
+import json
+import logging
+import re
+import threading
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Parameters that never affect the response and must not end up in cache keys
+EXCLUDED_KEY_PARAMS = {"api_key"}
+
+def create_session(pool_size=10):
+    """Create a requests session that keeps up to pool_size connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def normalize_query(query):
+    """Normalize a search query so trivially different spellings share a cache entry."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", query.lower())).strip()
+
+class CachedJsonClient:
+    """
+    GET client for JSON APIs with a persistent TTL cache and stale-while-revalidate.
+
+    Responses younger than ttl are served from the cache. Responses older
+    than ttl but younger than ttl + stale_ttl are also served, and one
+    background request refreshes them. Anything older is fetched
+    synchronously. When call is given, every network request runs as
+    call(fetch, url, params), e.g. to apply rate limits and retries.
+    """
+
+    def __init__(self, session, cache_path, ttl, stale_ttl=0, timeout=30, max_entries=None, call=None):
+        self.session = session
+        self.call = call
+        self.cache = DiskCache(cache_path, max_entries) if cache_path else None
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._revalidating = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidate")
+
+    def _cache_key(self, url, params, query_param):
+        normalized = {
+            name: normalize_query(value) if name == query_param else value
+            for name, value in params.items()
+            if name not in EXCLUDED_KEY_PARAMS
+        }
+        return make_key(url, json.dumps(normalized, sort_keys=True, default=str))
+
+    def _fetch(self, url, params, key):
+        data = self.call(self._get, url, params) if self.call else self._get(url, params)
+        if self.cache is not None:
+            self.cache.set(key, json.dumps(data).encode("utf-8"))
+        return data
+
+    def _get(self, url, params):
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _revalidate(self, url, params, key):
+        try:
+            self._fetch(url, params, key)
+            with self._lock:
+                self.revalidations += 1
+        except Exception as e:
+            logger.warning(f"Background revalidation of {url} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    def get_json(self, url, params, query_param="q"):
+        """
+        GET url with params and return the decoded JSON body, using the cache when possible.
+
+        Args:
+            url (str): Endpoint URL.
+            params (dict): Query parameters.
+            query_param (str): Parameter holding free-text search input, normalized for the cache key.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            requests.RequestException: If a synchronous fetch fails.
+        """
+        key = self._cache_key(url, params, query_param)
+        if self.cache is not None:
+            value, age = self.cache.get_with_age(key)
+            if value is not None and age < self.ttl:
+                with self._lock:
+                    self.fresh_hits += 1
+                return json.loads(value)
+            if value is not None and age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                    schedule = key not in self._revalidating
+                    self._revalidating.add(key)
+                if schedule:
+                    self._executor.submit(self._revalidate, url, params, key)
+                return json.loads(value)
+        with self._lock:
+            self.misses += 1
+        return self._fetch(url, params, key)
+
+    def stats(self):
+        """Return fresh/stale hit, miss and revalidation counters."""
+        with self._lock:
+            return {
+                "fresh_hits": self.fresh_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "revalidating": len(self._revalidating)
+            }
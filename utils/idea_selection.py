@@ -0,0 +1,39 @@
+from utils.config import IDEA_DIVERSITY_WEIGHT, IDEA_SIMILARITY_THRESHOLD
+from utils.vector_index import unit_vectors
+import numpy as np
+
+def select_diverse(embeddings, novelty, k, weight=IDEA_DIVERSITY_WEIGHT, max_similarity=IDEA_SIMILARITY_THRESHOLD):
+    """
+    Pick up to k candidates by maximal marginal relevance.
+
+    The first pick is the most novel candidate. Each later pick maximizes
+    weight * novelty - (1 - weight) * its similarity to the closest
+    candidate already picked, so near-identical candidates are not picked
+    together. Candidates at least max_similarity to a pick are never picked.
+
+    Args:
+        embeddings (list): Candidate embeddings.
+        novelty (list): Novelty score of each candidate, higher is better.
+        k (int): Maximum number of candidates to pick.
+        weight (float): 1.0 ranks by novelty alone; lower values favor diversity.
+        max_similarity (float): Cosine similarity at which two candidates count as duplicates.
+
+    Returns:
+        list: Indexes of the picked candidates, best first.
+    """
+    if not len(embeddings) or k <= 0:
+        return []
+    vectors = unit_vectors(embeddings)
+    novelty = np.asarray(novelty, dtype=np.float32)
+    closest = np.full(len(vectors), -1.0, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    picked = []
+    while len(picked) < k and available.any():
+        scores = np.where(available, weight * novelty - (1 - weight) * np.maximum(closest, 0.0), -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        similarity = vectors @ vectors[best]
+        closest = np.maximum(closest, similarity)
+        available &= similarity < max_similarity
+    return picked
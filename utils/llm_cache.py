@@ -0,0 +1,152 @@
+from utils.disk_cache import DiskCache, make_key
+from contextlib import contextmanager
+import inspect
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODES = ["off", "readwrite", "record", "replay"]
+
+class LLMCacheMiss(Exception):
+    """Raised in replay mode when a run has no recorded response."""
+
+def _json_default(value):
+    # Values such as pending database IDs have no stable JSON form
+    return f"<{type(value).__name__}>"
+
+def _describe_function(function):
+    """Describe an agent tool by what the model sees: name, signature and docstring."""
+    try:
+        signature = str(inspect.signature(function))
+    except (TypeError, ValueError):
+        signature = ""
+    return f"{function.__name__}{signature}:{inspect.getdoc(function) or ''}"
+
+class CachedSwarm:
+    """
+    Wraps a Swarm client and caches run() results keyed by everything that shapes the completion.
+
+    The key hashes the agent name, resolved instructions, tool descriptions,
+    messages, context variables and model. Modes:
+        readwrite: serve hits, run and store misses.
+        record: always run and store, refreshing recordings.
+        replay: serve hits only and raise LLMCacheMiss otherwise; TTL is ignored.
+
+    Responses are stored as soon as they arrive, before the caller has
+    parsed them, so callers drop a reply they cannot use with invalidate()
+    (or discard_on_failure) to keep it from being replayed.
+
+    cache is a DiskCache to share between clients, or a path to open one at
+    with room for max_entries responses.
+    """
+
+    def __init__(self, swarm, cache, mode="readwrite", ttl=None, ignore_context_keys=(), max_entries=None):
+        if mode not in MODES or mode == "off":
+            raise ValueError(f"Unsupported LLM cache mode: {mode}")
+        self.swarm = swarm
+        self.cache = cache if isinstance(cache, DiskCache) else DiskCache(cache, max_entries=max_entries)
+        self.mode = mode
+        self.ttl = ttl
+        self.ignore_context_keys = set(ignore_context_keys)
+
+    @property
+    def client(self):
+        """The underlying OpenAI client, as on Swarm."""
+        return self.swarm.client
+
+    def cache_key(self, agent, messages, context_variables, model_override=None):
+        context_variables = context_variables or {}
+        instructions = agent.instructions(context_variables) if callable(agent.instructions) else agent.instructions
+        return make_key(json.dumps({
+            "agent": agent.name,
+            "instructions": instructions,
+            "functions": [_describe_function(function) for function in agent.functions],
+            "messages": messages,
+            "context_variables": {
+                name: value for name, value in context_variables.items() if name not in self.ignore_context_keys
+            },
+            "model": model_override or agent.model
+        }, sort_keys=True, default=_json_default))
+
+    def invalidate(self, key):
+        """Drop the stored response for key, so the next run with it calls the model again."""
+        self.cache.delete(key)
+
+    def _lookup(self, key):
+        value, age = self.cache.get_with_age(key)
+        if value is None:
+            return None
+        if self.mode != "replay" and self.ttl is not None and age > self.ttl:
+            return None
+        return json.loads(value)
+
+    def _store(self, key, response):
+        self.cache.set(key, json.dumps({
+            "messages": response.messages,
+            "agent": response.agent.name if response.agent else None,
+            "context_variables": {
+                name: value for name, value in (response.context_variables or {}).items()
+                if name not in self.ignore_context_keys
+            }
+        }, default=_json_default).encode("utf-8"))
+
+    def _replay_stream(self, agent, response):
+        """Yield a cached response in the shape of a streaming run."""
+        content = response.messages[-1].get("content") if response.messages else None
+        yield {"delim": "start"}
+        if content:
+            yield {"content": content, "sender": agent.name, "role": "assistant"}
+        yield {"delim": "end"}
+        yield {"response": response}
+
+    def _record_stream(self, key, chunks):
+        for chunk in chunks:
+            if "response" in chunk:
+                self._store(key, chunk["response"])
+            yield chunk
+
+    def run(self, agent, messages, context_variables=None, model_override=None, stream=False, **kwargs):
+        """Same as Swarm.run, served from the cache when possible."""
+        context_variables = context_variables or {}
+        key = self.cache_key(agent, messages, context_variables, model_override)
+        if self.mode != "record":
+            cached = self._lookup(key)
+            if cached is not None:
+                # Imported on first hit so importing this module stays cheap
+                from swarm.types import Response
+                logger.info(f"Serving {agent.name} run from the LLM cache.")
+                response = Response(
+                    messages=cached["messages"],
+                    agent=agent,
+                    context_variables={**context_variables, **cached["context_variables"]}
+                )
+                return self._replay_stream(agent, response) if stream else response
+            if self.mode == "replay":
+                raise LLMCacheMiss(f"No recorded response for {agent.name} run {key[:12]}.")
+
+        result = self.swarm.run(
+            agent=agent, messages=messages, context_variables=context_variables,
+            model_override=model_override, stream=stream, **kwargs
+        )
+        if stream:
+            return self._record_stream(key, result)
+        self._store(key, result)
+        return result
+
+@contextmanager
+def discard_on_failure(client, agent, messages, context_variables=None, model_override=None):
+    """
+    Drop the cached response of a run if the block handling it raises.
+
+    Wrap the parsing of a run's reply in this, so a malformed reply is not
+    replayed by a stage retry or a resumed run. Does nothing for a client
+    without a cache.
+    """
+    try:
+        yield
+    except Exception:
+        if isinstance(client, CachedSwarm):
+            logger.info(f"Dropping the cached {agent.name} response that could not be used.")
+            client.invalidate(client.cache_key(agent, messages, context_variables, model_override))
+        raise
@@ -0,0 +1,276 @@
+from contextlib import contextmanager
+from utils.config import METRICS_TRACE_PATH
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens as (prompt, completion); embedding models only have a prompt price
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+# Upper bounds in seconds of the stage duration histogram buckets
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def _model_prices(model):
+    """Prices of a model, matching dated versions such as 'gpt-4o-2024-08-06' by the longest priced prefix."""
+    model = model or ""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(f"{name}-")]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+def estimate_cost(model, prompt_tokens=0, completion_tokens=0):
+    """Estimate the USD cost of a call from its token counts; unknown models cost 0."""
+    prices = _model_prices(model)
+    if prices is None:
+        return 0.0
+    prompt_price, completion_price = prices
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.embedding_tokens = 0
+        self.retries = 0
+        self.cost_usd = 0.0
+
+class MetricsRegistry:
+    """In-process aggregation of finished spans, per stage."""
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span):
+        """Aggregate a finished span and append it to the trace file if one is configured."""
+        with self._lock:
+            stats = self._stats.setdefault(span["stage"], _StageStats())
+            stats.count += 1
+            stats.errors += span["error"] is not None
+            stats.duration_sum += span["wall_time_s"]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if span["wall_time_s"] <= bound:
+                    stats.buckets[index] += 1
+            stats.prompt_tokens += span["prompt_tokens"]
+            stats.completion_tokens += span["completion_tokens"]
+            stats.embedding_tokens += span["embedding_tokens"]
+            stats.retries += span["retries"]
+            stats.cost_usd += span["cost_usd"]
+            if self.trace_path:
+                with open(self.trace_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    def snapshot(self):
+        """Return aggregated stats per stage as plain dicts."""
+        with self._lock:
+            return {stage: dict(vars(stats), buckets=list(stats.buckets)) for stage, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def render_prometheus(self):
+        """Render the aggregates in the Prometheus text exposition format."""
+        lines = [
+            "# HELP article_stage_duration_seconds Wall time of pipeline stages.",
+            "# TYPE article_stage_duration_seconds histogram",
+        ]
+        snapshot = self.snapshot()
+        for stage, stats in sorted(snapshot.items()):
+            for bound, count in zip(DURATION_BUCKETS, stats["buckets"]):
+                lines.append(f'article_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'article_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'article_stage_duration_seconds_sum{{stage="{stage}"}} {stats["duration_sum"]:.6f}')
+            lines.append(f'article_stage_duration_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+        counters = [
+            ("article_stage_errors_total", "Stage executions that raised.", "errors"),
+            ("article_stage_retries_total", "Retries performed within stages.", "retries"),
+            ("article_cost_usd_total", "Estimated spend in USD.", "cost_usd"),
+        ]
+        for name, help_text, field in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{stage="{stage}"}} {stats[field]}' for stage, stats in sorted(snapshot.items())]
+
+        lines += ["# HELP article_tokens_total Tokens used, by kind.", "# TYPE article_tokens_total counter"]
+        for stage, stats in sorted(snapshot.items()):
+            for kind in ("prompt", "completion", "embedding"):
+                lines.append(f'article_tokens_total{{stage="{stage}",kind="{kind}"}} {stats[f"{kind}_tokens"]}')
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry(METRICS_TRACE_PATH or None)
+
+def _new_record(stage, parent, attributes):
+    record = {
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "run_id": parent.get("run_id") if parent else None,
+        "stage": stage,
+        "start": time.time(),
+        "wall_time_s": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "embedding_tokens": 0,
+        "retries": 0,
+        "cost_usd": 0.0,
+        "error": None,
+    }
+    record.update(attributes)
+    return record
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time a unit of pipeline work and collect its token, retry and cost counters.
+
+    Spans nest through a context variable. Attributes such as run_id are
+    inherited from the enclosing span. Tokens and retries recorded while
+    the span is innermost are attributed to it.
+
+    Args:
+        stage (str): Stage name used to aggregate the span.
+        **attributes: Extra fields written to the trace.
+
+    Yields:
+        dict: The span record.
+    """
+    record = _new_record(stage, _current_span.get(), attributes)
+    token = _current_span.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        record["wall_time_s"] = time.perf_counter() - started
+        _current_span.reset(token)
+        registry.observe(record)
+
+def current_stage():
+    """Return the stage name of the innermost open span, or None."""
+    record = _current_span.get()
+    return record["stage"] if record else None
+
+def record_usage(model, prompt_tokens=0, completion_tokens=0, embedding=False):
+    """Attribute token usage and its estimated cost to the innermost open span."""
+    record = _current_span.get()
+    if record is not None:
+        _add_usage(record, model, prompt_tokens, completion_tokens, embedding)
+
+def _add_usage(record, model, prompt_tokens=0, completion_tokens=0, embedding=False):
+    if embedding:
+        record["embedding_tokens"] += prompt_tokens
+    else:
+        record["prompt_tokens"] += prompt_tokens
+        record["completion_tokens"] += completion_tokens
+    record["cost_usd"] += estimate_cost(model, prompt_tokens, completion_tokens)
+
+def annotate_span(**attributes):
+    """Add attributes to the innermost open span's trace record."""
+    record = _current_span.get()
+    if record is not None:
+        record.update(attributes)
+
+def record_retry():
+    """Count a retry against the innermost open span."""
+    record = _current_span.get()
+    if record is not None:
+        record["retries"] += 1
+
+def instrument_openai_client(openai_client):
+    """
+    Wrap an OpenAI client's chat completion calls in '<stage>_llm' spans that record token usage.
+
+    Streamed completions ask for a final usage chunk, and their span lasts
+    until the stream is exhausted. The usage chunk has no choices, so it is
+    not passed on to callers that expect every chunk to have one.
+
+    Returns:
+        The same client, instrumented once.
+    """
+    completions = openai_client.chat.completions
+    if getattr(completions, "_instrumented", False):
+        return openai_client
+    create = completions.create
+
+    def instrumented_create(*args, **kwargs):
+        parent = current_stage()
+        model = kwargs.get("model")
+        if kwargs.get("stream"):
+            kwargs.setdefault("stream_options", {"include_usage": True})
+            return _instrumented_stream(create, args, kwargs, f"{parent}_llm" if parent else "llm", model)
+        with span(f"{parent}_llm" if parent else "llm", model=model):
+            response = create(*args, **kwargs)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                record_usage(model, usage.prompt_tokens, usage.completion_tokens)
+            return response
+
+    completions.create = instrumented_create
+    completions._instrumented = True
+    return openai_client
+
+def _instrumented_stream(create, args, kwargs, stage, model):
+    """
+    Yield a streamed completion's chunks inside a span of its own.
+
+    The span is not made current, since the caller's code runs between
+    chunks; it is observed once the stream ends, fails or is closed.
+    """
+    record = _new_record(stage, _current_span.get(), {"model": model})
+    started = time.perf_counter()
+    try:
+        for chunk in create(*args, **kwargs):
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                _add_usage(record, model, usage.prompt_tokens, usage.completion_tokens)
+            if chunk.choices:
+                yield chunk
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        record["wall_time_s"] = time.perf_counter() - started
+        registry.observe(record)
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics in the Prometheus text format from a background thread."""
+    # Imported here so that importing metrics, which every module does, stays cheap
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
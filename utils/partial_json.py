@@ -0,0 +1,99 @@
+import json
+import re
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+_HEX4 = re.compile(r"[0-9a-fA-F]{4}")
+
+def _decode_unicode_escape(buffer, pos):
+    """
+    Decode the \\u escape at buffer[pos].
+
+    Returns:
+        tuple: (decoded text, characters consumed), or None if the escape is
+        cut off at the end of the buffer. A malformed escape is passed
+        through without its backslash, like other unknown escapes, leaving
+        the verdict to the final parse of the whole output.
+    """
+    escape = buffer[pos:pos + 6]
+    if len(escape) < 6:
+        return None
+    if not _HEX4.fullmatch(escape[2:]):
+        return escape[1:2], 2
+    if 0xD800 <= int(escape[2:], 16) <= 0xDBFF:
+        # High surrogate: decode together with the low surrogate that follows
+        pair = buffer[pos:pos + 12]
+        if len(pair) < 12:
+            return None
+        if pair[6:8] == "\\u" and _HEX4.fullmatch(pair[8:]):
+            return json.loads(f'"{pair}"'), 12
+    return json.loads(f'"{escape}"'), 6
+
+class PartialStringField:
+    """
+    Incrementally decode one string field out of a JSON object that is still streaming.
+
+    Feed raw chunks of the model's output as they arrive. value holds the
+    decoded field text seen so far. Each chunk is scanned once, so the
+    total work is linear in the length of the output.
+    """
+
+    def __init__(self, field):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.value = ""
+        self.complete = False
+        self._pos = None
+
+    def feed(self, chunk):
+        """
+        Add a chunk of raw output.
+
+        Returns:
+            bool: True if value grew.
+        """
+        self.buffer += chunk
+        if self.complete:
+            return False
+        if self._pos is None:
+            match = self._key.search(self.buffer)
+            if not match:
+                return False
+            self._pos = match.end()
+
+        pieces = []
+        buffer, pos = self.buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.complete = True
+                pos += 1
+                break
+            if char != "\\":
+                end = pos
+                while end < len(buffer) and buffer[end] not in '"\\':
+                    end += 1
+                pieces.append(buffer[pos:end])
+                pos = end
+                continue
+            # Escape sequence; stop if it is cut off at the end of the buffer
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code in _SIMPLE_ESCAPES:
+                pieces.append(_SIMPLE_ESCAPES[code])
+                pos += 2
+            elif code == "u":
+                decoded = _decode_unicode_escape(buffer, pos)
+                if decoded is None:
+                    break
+                pieces.append(decoded[0])
+                pos += decoded[1]
+            else:
+                pieces.append(code)
+                pos += 2
+        self._pos = pos
+        if pieces:
+            self.value += "".join(pieces)
+            return True
+        return False
@@ -0,0 +1,322 @@
+"""
+Per-provider rate limiting, retries and adaptive concurrency for API calls.
+
+Each provider gets token buckets for requests and tokens per minute. With
+RATE_LIMIT_STATE_PATH set, bucket state lives in a SQLite file so every
+worker process draws from the same budget; otherwise it is kept in memory.
+Throttled and transient failures are retried with jittered exponential
+backoff that honors Retry-After, and each provider's concurrency limit is
+halved on throttling and grows back slowly on success (AIMD).
+"""
+from utils.metrics import record_retry
+from utils.config import (
+    RATE_LIMIT_STATE_PATH, RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_MAX_CONCURRENCY, RATE_LIMIT_BACKOFF_BASE,
+    RATE_LIMIT_BACKOFF_MAX, OPENAI_CHAT_RPM, OPENAI_CHAT_TPM, OPENAI_EMBEDDING_RPM, OPENAI_EMBEDDING_TPM,
+    SERPAPI_RPM, CHAT_COMPLETION_TOKEN_ESTIMATE
+)
+from utils.token_utils import count_tokens
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# (requests per minute, tokens per minute) by provider; 0 disables that limit
+PROVIDER_LIMITS = {
+    "openai.chat": (OPENAI_CHAT_RPM, OPENAI_CHAT_TPM),
+    "openai.embeddings": (OPENAI_EMBEDDING_RPM, OPENAI_EMBEDDING_TPM),
+    "serpapi": (SERPAPI_RPM, 0),
+}
+
+# Exceptions of the OpenAI SDK that mean the request never got a response
+_CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+class _MemoryState:
+    """Bucket state of the providers, kept in this process."""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def transact(self, name, update):
+        with self._lock:
+            row = self._rows.get(name)
+            result, self._rows[name] = update(row)
+            return result
+
+class _SqliteState:
+    """Bucket state of the providers in a SQLite file, shared by every process using it."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, state TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def transact(self, name, update):
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                found = self._conn.execute("SELECT state FROM buckets WHERE name = ?", (name,)).fetchone()
+                result, row = update(json.loads(found[0]) if found else None)
+                self._conn.execute("INSERT OR REPLACE INTO buckets (name, state) VALUES (?, ?)", (name, json.dumps(row)))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets for one provider.
+
+    Both buckets hold up to a minute's allowance and refill continuously.
+    A Retry-After from the provider blocks every caller sharing the state
+    until it has passed.
+    """
+
+    def __init__(self, name, rpm, tpm, state):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.state = state
+
+    def _refill(self, row, now):
+        if row is None:
+            return {"requests": self.rpm, "tokens": self.tpm, "updated": now, "blocked_until": 0.0}
+        elapsed = max(0.0, now - row["updated"])
+        row["requests"] = min(self.rpm, row["requests"] + elapsed * self.rpm / 60)
+        row["tokens"] = min(self.tpm, row["tokens"] + elapsed * self.tpm / 60)
+        row["updated"] = now
+        return row
+
+    def _try_acquire(self, tokens):
+        def update(row):
+            now = time.time()
+            row = self._refill(row, now)
+            waits = [row["blocked_until"] - now]
+            if self.rpm and row["requests"] < 1:
+                waits.append((1 - row["requests"]) * 60 / self.rpm)
+            # A request larger than the whole bucket waits for a full bucket instead of forever
+            needed = min(tokens, self.tpm)
+            if self.tpm and row["tokens"] < needed:
+                waits.append((needed - row["tokens"]) * 60 / self.tpm)
+            wait = max(waits)
+            if wait <= 0:
+                row["requests"] -= 1 if self.rpm else 0
+                row["tokens"] -= tokens if self.tpm else 0
+            return wait, row
+        return self.state.transact(self.name, update)
+
+    def acquire(self, tokens=0):
+        """Block until a request using tokens tokens fits in both buckets, then take it."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+
+    def adjust(self, tokens):
+        """Correct the token bucket once a request's real usage is known (positive takes more)."""
+        if not self.tpm or not tokens:
+            return
+
+        def update(row):
+            row = self._refill(row, time.time())
+            row["tokens"] -= tokens
+            return None, row
+        self.state.transact(self.name, update)
+
+    def block(self, seconds):
+        """Hold back every caller sharing this limiter for seconds, e.g. after a Retry-After."""
+        def update(row):
+            now = time.time()
+            row = self._refill(row, now)
+            row["blocked_until"] = max(row["blocked_until"], now + seconds)
+            return None, row
+        self.state.transact(self.name, update)
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit that adapts to throttling (additive increase, multiplicative decrease).
+
+    The limit halves whenever a call is throttled and grows by roughly one
+    slot per limit-many successful calls, up to max_limit.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.active >= max(1, int(self.limit)):
+                self._condition.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.max_limit, self.limit + 1 / max(1.0, self.limit))
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            self.limit = max(1.0, self.limit / 2)
+
+_state = None
+_limiters = {}
+_concurrency = {}
+_registry_lock = threading.Lock()
+
+def get_limiter(provider):
+    """Return the shared token-bucket limiter of a provider in PROVIDER_LIMITS."""
+    global _state
+    with _registry_lock:
+        if provider not in _limiters:
+            if _state is None:
+                _state = _SqliteState(RATE_LIMIT_STATE_PATH) if RATE_LIMIT_STATE_PATH else _MemoryState()
+            rpm, tpm = PROVIDER_LIMITS[provider]
+            _limiters[provider] = TokenBucketLimiter(provider, rpm, tpm, _state)
+            _concurrency[provider] = AdaptiveConcurrency(RATE_LIMIT_MAX_CONCURRENCY)
+        return _limiters[provider]
+
+def get_concurrency(provider):
+    """Return the adaptive concurrency limit of a provider in this process."""
+    get_limiter(provider)
+    return _concurrency[provider]
+
+def _parse_retry_after(headers):
+    if not headers:
+        return None
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # HTTP-date form
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def classify_error(error):
+    """
+    Decide whether a failed call is worth retrying.
+
+    Works for OpenAI SDK errors and requests exceptions without importing
+    either; an error can only come from requests once something imported it.
+
+    Returns:
+        tuple: (retriable, throttled, retry_after seconds or None).
+    """
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True, False, None
+    if type(error).__name__ in _CONNECTION_ERRORS:
+        return True, False, None
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status is None:
+        return False, False, None
+    retry_after = _parse_retry_after(getattr(response, "headers", None))
+    if status == 429:
+        return True, True, retry_after
+    if status in (408, 409) or status >= 500:
+        return True, False, retry_after
+    return False, False, None
+
+def call_with_limits(provider, func, *args, tokens=0, **kwargs):
+    """
+    Call func(*args, **kwargs) within the provider's rate and concurrency limits, retrying transient failures.
+
+    Args:
+        provider (str): Key of PROVIDER_LIMITS.
+        func (callable): The API call.
+        tokens (int): Estimated tokens the call uses, for the tokens-per-minute bucket.
+
+    Returns:
+        The result of func.
+
+    Raises:
+        Exception: The last error once RATE_LIMIT_MAX_RETRIES retries are used up,
+        or at once for errors that are not transient.
+    """
+    limiter = get_limiter(provider)
+    concurrency = get_concurrency(provider)
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        limiter.acquire(tokens)
+        try:
+            with concurrency:
+                result = func(*args, **kwargs)
+            concurrency.on_success()
+            return result
+        except Exception as e:
+            retriable, throttled, retry_after = classify_error(e)
+            if not retriable or attempt == RATE_LIMIT_MAX_RETRIES:
+                raise
+            # Full jitter spreads out callers that failed together
+            delay = random.uniform(0, min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt))
+            if throttled:
+                concurrency.on_throttle()
+                if retry_after is not None:
+                    limiter.block(retry_after)
+                    delay = max(delay, retry_after)
+            record_retry()
+            logger.warning(f"{provider} call failed ({type(e).__name__}: {str(e)}); retry {attempt + 1} in {delay:.1f}s...")
+            time.sleep(delay)
+
+def _estimate_chat_tokens(kwargs):
+    prompt = " ".join(str(message.get("content") or "") for message in kwargs.get("messages", []))
+    return count_tokens(prompt, kwargs.get("model") or "gpt-4o") + (kwargs.get("max_tokens") or CHAT_COMPLETION_TOKEN_ESTIMATE)
+
+def limit_openai_client(openai_client):
+    """
+    Route an OpenAI client's chat completion calls through call_with_limits.
+
+    The tokens-per-minute bucket is charged an estimate up front and
+    corrected with the reported usage once the response arrives.
+
+    Returns:
+        The same client, wrapped once.
+    """
+    completions = openai_client.chat.completions
+    if getattr(completions, "_rate_limited", False):
+        return openai_client
+    create = completions.create
+
+    def limited_create(*args, **kwargs):
+        estimate = _estimate_chat_tokens(kwargs)
+        response = call_with_limits("openai.chat", create, *args, tokens=estimate, **kwargs)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            get_limiter("openai.chat").adjust(usage.total_tokens - estimate)
+        return response
+
+    completions.create = limited_create
+    completions._rate_limited = True
+    return openai_client
@@ -0,0 +1,201 @@
+from dataclasses import dataclass, fields, MISSING
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Cheap model used to repair agent output that the local parser cannot fix
+REPAIR_MODEL = "gpt-4o-mini"
+
+class StructuredOutputError(ValueError):
+    """Raised when agent output cannot be parsed into its schema."""
+
+@dataclass
+class IdeaResult:
+    idea_title: str
+    description: str
+
+@dataclass
+class ResearchResult:
+    research_title: str
+    research_description: str
+    references: str = ""
+
+@dataclass
+class ArticleResult:
+    article_title: str
+    article_text: str
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_CLOSERS = ",:}]"
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+def _extract_object(text):
+    """Return the outermost {...} span of text, dropping code fences and surrounding prose."""
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return text.strip()
+    return text[start:end + 1]
+
+def _closes_string(text, pos):
+    """A quote closes a string only if the next non-space character ends a JSON value."""
+    rest = text[pos + 1:].lstrip()
+    return not rest or rest[0] in _CLOSERS
+
+def _normalize(text):
+    """
+    Rewrite near-JSON into JSON in one pass.
+
+    Fixes single-quoted strings, unescaped quotes and raw control characters
+    inside strings, trailing commas and Python literals.
+    """
+    out = []
+    quote = None
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if quote:
+            if char == "\\" and pos + 1 < len(text):
+                escaped = text[pos + 1]
+                out.append("'" if escaped == "'" else char + escaped)
+                pos += 2
+                continue
+            if char == quote and _closes_string(text, pos):
+                out.append('"')
+                quote = None
+            elif char == '"':
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            elif ord(char) < 0x20:
+                out.append(f"\\u{ord(char):04x}")
+            else:
+                out.append(char)
+        elif char in "\"'":
+            out.append('"')
+            quote = char
+        elif char == ",":
+            rest = text[pos + 1:].lstrip()
+            if not rest or rest[0] not in "}]":
+                out.append(char)
+        else:
+            literal = next((word for word in _LITERALS if text.startswith(word, pos)), None)
+            if literal and not (out and out[-1].isalnum()):
+                out.append(_LITERALS[literal])
+                pos += len(literal)
+                continue
+            out.append(char)
+        pos += 1
+    return "".join(out)
+
+def loads_tolerant(raw):
+    """
+    Parse JSON from agent output, tolerating common breakages.
+
+    Handles code fences, prose around the object, single quotes, trailing
+    commas, unescaped quotes and newlines inside strings, and Python literals.
+
+    Args:
+        raw (str): The agent's message content.
+
+    Returns:
+        dict: The parsed object.
+
+    Raises:
+        StructuredOutputError: If the text cannot be parsed.
+    """
+    candidate = _extract_object(raw or "")
+    for text in (candidate, _normalize(candidate)):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            error = e
+            continue
+        if not isinstance(data, dict):
+            raise StructuredOutputError(f"Expected a JSON object, got {type(data).__name__}.")
+        return data
+    raise StructuredOutputError(str(error))
+
+def validate(data, schema):
+    """
+    Build a schema instance from parsed data.
+
+    Required fields must be non-empty strings. A list given for a string
+    field (e.g. references) is joined with commas.
+
+    Raises:
+        StructuredOutputError: If a required field is missing or empty.
+    """
+    values = {}
+    for field in fields(schema):
+        value = data.get(field.name)
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        if value is None or value == "":
+            if field.default is MISSING:
+                raise StructuredOutputError(f"Missing required field '{field.name}'.")
+            continue
+        values[field.name] = str(value)
+    return schema(**values)
+
+def repair_with_llm(openai_client, raw, schema, error):
+    """
+    Ask a cheap model to turn malformed output into valid JSON for the schema.
+
+    Only the formatting is repaired; the content is not regenerated, so this
+    costs far less than rerunning the stage.
+
+    Returns:
+        str: The repaired JSON text.
+    """
+    keys = ", ".join(field.name for field in fields(schema))
+    response = openai_client.chat.completions.create(
+        model=REPAIR_MODEL,
+        response_format={"type": "json_object"},
+        temperature=0,
+        messages=[
+            {
+                "role": "system",
+                "content": f"Convert the user's text into a single valid JSON object with the string keys: {keys}. "
+                           "Keep the content verbatim; only fix the formatting and escaping."
+            },
+            {"role": "user", "content": f"Parse error: {error}\n\n{raw}"}
+        ]
+    )
+    return response.choices[0].message.content
+
+def parse_structured(raw, schema, repair=None):
+    """
+    Parse agent output into a schema instance, repairing it if needed.
+
+    Args:
+        raw (str): The agent's message content.
+        schema (type): IdeaResult, ResearchResult or ArticleResult.
+        repair (callable): Optional repair(raw, schema, error) returning new
+            text, tried once when local parsing fails.
+
+    Returns:
+        The schema instance.
+
+    Raises:
+        StructuredOutputError: If the output cannot be parsed even after repair.
+    """
+    try:
+        return validate(loads_tolerant(raw), schema)
+    except StructuredOutputError as e:
+        if repair is None:
+            raise
+        logger.warning(f"Could not parse {schema.__name__} locally ({e}); requesting a repair...")
+        try:
+            repaired = repair(raw, schema, e)
+        except Exception as repair_error:
+            raise StructuredOutputError(f"{e} (repair failed: {repair_error})")
+        return validate(loads_tolerant(repaired), schema)
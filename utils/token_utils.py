@@ -0,0 +1,38 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to a conservative estimate
+    tiktoken = None
+
+# Characters per token used when tiktoken is unavailable; low on purpose so limits are not exceeded
+FALLBACK_CHARS_PER_TOKEN = 3
+
+_encodings = {}
+
+def _get_encoding(model):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+def count_tokens(text, model="text-embedding-ada-002"):
+    """
+    Count the tokens text uses for the given model.
+
+    Args:
+        text (str): The text to measure.
+        model (str): The OpenAI model whose tokenizer applies.
+
+    Returns:
+        int: Exact count with tiktoken, otherwise an upper-bound estimate.
+    """
+    if not text:
+        return 0
+    if tiktoken is None:
+        return len(text) // FALLBACK_CHARS_PER_TOKEN + 1
+    return len(_get_encoding(model).encode(text, disallowed_special=()))
@@ -0,0 +1,168 @@
+from utils.embedding_codec import decode_embedding
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of vectors before approximate mode builds its inverted lists
+MIN_VECTORS_FOR_APPROXIMATE = 1024
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 40
+
+def to_vector(value):
+    """
+    Convert a stored embedding to a float32 array.
+
+    pgvector columns come back from PostgREST as strings like '[0.1,0.2]',
+    and compact storage formats as '<format>:<base64>' strings; lists are
+    accepted too.
+    """
+    return decode_embedding(value)
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def unit_vectors(embeddings):
+    """Return the embeddings as a float32 matrix of unit-length rows (zero rows stay zero)."""
+    return _normalize(np.asarray(embeddings, dtype=np.float32))
+
+class VectorIndex:
+    """
+    In-memory cosine-similarity index over normalized embeddings.
+
+    Vectors live in one preallocated float32 matrix. Exact search is a single
+    matrix-vector product followed by a partial sort. In approximate mode,
+    an inverted-file index built with k-means restricts each search to the
+    n_probe closest clusters once the index holds enough vectors.
+    """
+
+    def __init__(self, approximate=False, n_lists=None, n_probe=8, seed=0):
+        self.approximate = approximate
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.last_synced_id = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._ids = []
+        self._id_set = set()
+        self._size = 0
+        self._centroids = None
+        self._assignments = None
+        self._trained_size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, ids, vectors):
+        """
+        Add vectors to the index, skipping ids it already holds.
+
+        Args:
+            ids (list): Identifier for each vector (e.g. the database row ID).
+            vectors (list): Embeddings as lists, strings or arrays.
+        """
+        with self._lock:
+            new = [(row_id, to_vector(vector)) for row_id, vector in zip(ids, vectors) if row_id not in self._id_set]
+            if not new:
+                return
+            block = _normalize(np.stack([vector for _, vector in new]))
+            self._reserve(self._size + len(block), block.shape[1])
+            self._matrix[self._size:self._size + len(block)] = block
+            self._size += len(block)
+            for row_id, _ in new:
+                self._ids.append(row_id)
+                self._id_set.add(row_id)
+
+            if self.approximate:
+                if self._size >= max(MIN_VECTORS_FOR_APPROXIMATE, 2 * self._trained_size):
+                    self._train()
+                elif self._centroids is not None:
+                    self._assignments = np.concatenate([self._assignments, np.argmax(block @ self._centroids.T, axis=1)])
+
+    def _reserve(self, size, dim):
+        if self._matrix is None:
+            self._matrix = np.empty((max(size, 64), dim), dtype=np.float32)
+        elif size > len(self._matrix):
+            grown = np.empty((max(size, 2 * len(self._matrix)), dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def _train(self):
+        """Build the inverted-file lists with a few rounds of spherical k-means."""
+        data = self._matrix[:self._size]
+        n_lists = self.n_lists or max(1, int(np.sqrt(self._size)))
+        sample_size = min(self._size, n_lists * KMEANS_SAMPLES_PER_LIST)
+        sample = data[self._rng.choice(self._size, sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            filled = np.bincount(assignments, minlength=n_lists) > 0
+            centroids[filled] = _normalize(sums[filled])
+        self._centroids = centroids
+        self._assignments = np.argmax(data @ centroids.T, axis=1)
+        self._trained_size = self._size
+        logger.info(f"Built {n_lists} inverted lists over {self._size} vectors.")
+
+    def search(self, vector, k=5):
+        """
+        Find the stored vectors most similar to the query.
+
+        Args:
+            vector: The query embedding.
+            k (int): Number of results.
+
+        Returns:
+            list: (id, cosine similarity) tuples, most similar first.
+        """
+        with self._lock:
+            if self._size == 0:
+                return []
+            query = _normalize(to_vector(vector))
+            data = self._matrix[:self._size]
+            if self.approximate and self._centroids is not None:
+                probes = np.argsort(self._centroids @ query)[-self.n_probe:]
+                candidates = np.flatnonzero(np.isin(self._assignments, probes))
+                scores = data[candidates] @ query
+            else:
+                candidates = None
+                scores = data @ query
+
+            k = min(k, len(scores))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            positions = candidates[top] if candidates is not None else top
+            return [(self._ids[position], float(scores[index])) for position, index in zip(positions, top)]
+
+    def sync(self, fetch_page, page_size=1000):
+        """
+        Pull rows added since the last sync into the index.
+
+        Args:
+            fetch_page (callable): fetch_page(last_id, page_size) returning rows
+                with 'id' and 'embedding', ordered by ID.
+            page_size (int): Rows requested per page.
+
+        Returns:
+            int: Number of rows fetched.
+        """
+        with self._lock:
+            fetched = 0
+            while True:
+                rows = fetch_page(self.last_synced_id, page_size)
+                if not rows:
+                    break
+                embedded = [row for row in rows if row.get("embedding")]
+                self.add([row["id"] for row in embedded], [row["embedding"] for row in embedded])
+                self.last_synced_id = max(self.last_synced_id, max(row["id"] for row in rows))
+                fetched += len(rows)
+                if len(rows) < page_size:
+                    break
+            return fetched